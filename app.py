@@ -4,557 +4,2130 @@ Barnacle Films Inc. - Main Flask Application
 Production Management System for Independent Filmmaking
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file
-from flask_sqlalchemy import SQLAlchemy
+from flask import (Flask, Blueprint, current_app, render_template, stream_template, request, redirect, url_for,
+                   flash, session, jsonify, send_file, abort, Response)
+from werkzeug.local import LocalProxy
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 import os
+import sys
 import json
+import mimetypes
+import hashlib
+import weakref
+import click
+import sqlalchemy.orm
+from functools import partial
 from config import config
 
-# Initialize Flask app
-app = Flask(__name__)
-app.config.from_object(config['development'])
+from models import (db, User, CallSheet, BlogPost, Document, DocumentTag, Contact, Scene, Character,
+                    SceneCharacter, Announcement, NotificationDelivery, Shot, ChangeEvent, Job)
 
-# Initialize database
-db = SQLAlchemy(app)
+# Views, error handlers and CLI commands are registered here; create_app() builds an app around them
+bp = Blueprint('main', __name__, cli_group=None)
 
-# Define models here to avoid circular imports
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+# Import utilities
+from utils import allowed_file, format_countdown, parse_shot_records, file_sha256, has_preview, classify_document, DOCUMENT_TYPES, DOCUMENT_TAGS, parse_characters
+from uploads import ChunkedUpload, UploadError
+from downloads import send_document_file
+from pdf_pages import (PageRenderCache, RenderUnavailable, RenderTimeout, UnreadablePDF, RENDER_WIDTHS, RENDER_FORMATS,
+                       snap_width)
+from thumbnails import ThumbnailGenerator
+from search import install_search_index, rebuild_search_index, search
+from migrations import migrate, current_version, MIGRATIONS
+from query_plans import capture_selects, full_scans
+from events import watch_models, ChangeFeed, StreamSlots, event_stream, change_stamps
+from fragment_cache import FragmentCache, MemoryBackend, DiskBackend
+from pagination import keyset_page
+from list_rows import list_row, load_rows
+from stripboard import Strip, plan, parse_duration
+from call_sheet_pdfs import CallSheetPDFs
+from startup_bench import measure as measure_startup
+from request_profiler import RequestProfiler
+from synthetic_data import generate_production, DEFAULT_COUNTS
+from benchmark import (run_client, run_http, report as benchmark_report, dumps as dump_report, git_commit,
+                       compare as compare_reports)
+from static_assets import StaticAssets
+from compression import (ResponseCompressor, COMPRESSIBLE as COMPRESSIBLE_TYPES, available_encodings,
+                         matching_etag, measure as measure_compression)
+from jobs import JobQueue, JobWorker, PRIORITIES
+from notifications import SMTPPool, LocalSMTPServer, DeliveryFailed, compose, fan_out, sms_address
+from offline import short_hash, file_digest, release_digest, manifest_version, mentions
+from weather import WeatherService, CircuitBreaker, FakeWeatherProvider, OpenMeteoProvider
 
-class User(db.Model):
-    """User model for role-based access"""
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
-    role = db.Column(db.String(20), default='crew')  # director, cast, crew, admin
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_login = db.Column(db.DateTime)
-    
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-    
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
-
-class CallSheet(db.Model):
-    """Call sheet model for production scheduling"""
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    date = db.Column(db.Date, nullable=False)
-    location = db.Column(db.String(200), nullable=False)
-    call_time = db.Column(db.String(20), nullable=False)
-    wrap_time = db.Column(db.String(20), nullable=False)
-    weather_contingency = db.Column(db.Text)
-    cast_notes = db.Column(db.Text)
-    crew_notes = db.Column(db.Text)
-    special_notes = db.Column(db.Text)
-    scenes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
-    def __repr__(self):
-        return f'<CallSheet {self.title} - {self.date}>'
-
-class BlogPost(db.Model):
-    """Blog post model for public site content"""
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    slug = db.Column(db.String(200), unique=True, nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    excerpt = db.Column(db.Text)
-    featured_image = db.Column(db.String(200))
-    published = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
-    def __repr__(self):
-        return f'<BlogPost {self.title}>'
-
-class Document(db.Model):
-    """Document model for file uploads"""
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    filename = db.Column(db.String(200), nullable=False)
-    filepath = db.Column(db.String(300), nullable=False)
-    document_type = db.Column(db.String(50), nullable=False)  # script, sides, dailies, photo, document
-    file_size = db.Column(db.Integer)
-    mime_type = db.Column(db.String(100))
-    description = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    created_by = db.Column(db.String(100))
-    
-    def __repr__(self):
-        return f'<Document {self.title}>'
-
-class Contact(db.Model):
-    """Contact model for cast, crew, and vendor directory"""
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    role = db.Column(db.String(100), nullable=False)
-    phone = db.Column(db.String(20))
-    email = db.Column(db.String(120))
-    emergency_contact = db.Column(db.Boolean, default=False)
-    department = db.Column(db.String(50))  # cast, camera, sound, production, etc.
-    notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    def __repr__(self):
-        return f'<Contact {self.name} - {self.role}>'
-
-class Scene(db.Model):
-    """Scene model for master scene breakdown"""
-    id = db.Column(db.Integer, primary_key=True)
-    scene_number = db.Column(db.Integer, nullable=False, unique=True)
-    title = db.Column(db.String(200), nullable=False)
-    location = db.Column(db.String(200), nullable=False)
-    time_of_day = db.Column(db.String(50), nullable=False)  # DAY, NIGHT, DAWN, DUSK
-    scene_type = db.Column(db.String(50), nullable=False)  # INT, EXT, INT/EXT
-    description = db.Column(db.Text)
-    characters = db.Column(db.Text)  # JSON string of character names
-    estimated_duration = db.Column(db.String(20))  # e.g., "2-3 minutes"
-    status = db.Column(db.String(20), default='planned')  # planned, shot, in_progress, completed
-    call_sheet_id = db.Column(db.Integer, db.ForeignKey('call_sheet.id'), nullable=True)
-    shot_count = db.Column(db.Integer, default=0)
-    notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
-    def __repr__(self):
-        return f'<Scene {self.scene_number}: {self.title}>'
-
-class Announcement(db.Model):
-    """Announcement model for crew communications"""
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    content = db.Column(db.Text, nullable=False)
-    priority = db.Column(db.String(20), default='normal')  # low, normal, high, urgent
-    target_audience = db.Column(db.String(50), default='all')  # all, cast, crew, specific department
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime)
-    created_by = db.Column(db.String(100))
-    
-    def __repr__(self):
-        return f'<Announcement {self.title}>'
-
-# Import forms
-from forms import ContactForm, CrewLoginForm, CallSheetForm, BlogPostForm
+# Per-app services, built by create_app(); none starts a pool, thread or connection before first use
+page_renders = LocalProxy(lambda: current_app.extensions['page_renders'])
+call_sheet_pdfs = LocalProxy(lambda: current_app.extensions['call_sheet_pdfs'])
+thumbnails = LocalProxy(lambda: current_app.extensions['thumbnails'])
+fragment_cache = LocalProxy(lambda: current_app.extensions['fragment_cache'])
+change_feed = LocalProxy(lambda: current_app.extensions['change_feed'])
+stream_slots = LocalProxy(lambda: current_app.extensions['stream_slots'])
+weather_service = LocalProxy(lambda: current_app.extensions['weather_service'])
+job_queue = LocalProxy(lambda: current_app.extensions['jobs'])
+smtp_pool = LocalProxy(lambda: current_app.extensions['smtp_pool'])
+watch_models(ChangeEvent, {CallSheet: 'call_sheet', Scene: 'scene', Shot: 'shot', Contact: 'contact',
+                           Announcement: 'announcement', Document: 'document', BlogPost: 'blog_post'},
+             on_commit=lambda kinds: fragment_cache.invalidate(kinds))
 
-# Import utilities
-from utils import allowed_file, get_weather_data, format_countdown
+def cached_page(kinds, render, *key_parts):
+    """Rendered page for this request, reused until one of kinds changes"""
+    # Pending flash messages are rendered into the page, so those responses are never cached
+    if current_app.config['FRAGMENT_CACHE_BACKEND'] == 'none' or session.get('_flashes'):
+        return render()
+    key = '|'.join((request.full_path,) + tuple(str(part) for part in key_parts))
+    return fragment_cache.fetch(request.endpoint, kinds, key, render)
+
+def streamed_page(template, **context):
+    """Page sent as Jinja renders it (and compressed as it goes) instead of once it is complete"""
+    # Showing flash messages removes them from the session, whose cookie must go out with the headers
+    if session.get('_flashes'):
+        return render_template(template, **context)
+    return stream_template(template, **context)
+
+# List rows: only the columns list pages show, full entities stay on the detail pages
+SceneRow = list_row('SceneRow', (
+    Scene.id, Scene.scene_number, Scene.title, Scene.location, Scene.time_of_day, Scene.scene_type,
+    Scene.description, Scene.characters, Scene.estimated_duration, Scene.status, Scene.call_sheet_id,
+    Scene.shot_count))
+CallSheetRow = list_row('CallSheetRow', (
+    CallSheet.id, CallSheet.title, CallSheet.date, CallSheet.location, CallSheet.call_time, CallSheet.wrap_time),
+    previews={'notes_preview': (CallSheet.special_notes, 101)})  # cards show 100 characters, then "..."
+ScheduleRow = list_row('ScheduleRow', (
+    CallSheet.id, CallSheet.title, CallSheet.date, CallSheet.location, CallSheet.call_time, CallSheet.wrap_time,
+    CallSheet.scenes, CallSheet.special_notes, CallSheet.weather_contingency))
+DocumentRow = list_row('DocumentRow', (
+    Document.id, Document.title, Document.filename, Document.filepath, Document.document_type,
+    Document.file_size, Document.mime_type, Document.thumbnail_path, Document.description,
+    Document.created_at, Document.created_by),
+    hidden=('filepath',))  # storage path, kept out of the JSON like Document.to_dict
+
+def scene_rows():
+    """Every scene as a SceneRow, in scene number order"""
+    return load_rows(SceneRow, db.session.query(*SceneRow.columns).order_by(Scene.scene_number))
+
+# Weather
+def upcoming_shoot_locations(app):
+    """Locations to keep warm in the weather cache: the default plus every shoot in the next 7 days"""
+    with app.app_context():
+        today = datetime.now().date()
+        rows = db.session.execute(db.select(CallSheet.location).distinct().where(
+            CallSheet.date >= today, CallSheet.date <= today + timedelta(days=7)
+        )).scalars().all()
+        db.session.remove()
+    return [app.config['WEATHER_DEFAULT_LOCATION']] + rows
+
+# Shot list helpers
+def sync_shot_counts(scene_ids):
+    """Recompute the denormalized Scene.shot_count from the shot table"""
+    if not scene_ids:
+        return
+    shot_total = db.select(db.func.count(Shot.id)).where(Shot.scene_id == Scene.id).scalar_subquery()
+    db.session.execute(
+        db.update(Scene).where(Scene.id.in_(scene_ids)).values(shot_count=shot_total),
+        execution_options={'synchronize_session': False}
+    )
+    for scene in Scene.query.filter(Scene.id.in_(scene_ids)):
+        db.session.expire(scene, ['shot_count'])
+
+def import_shots(records, scene=None, replace=False):
+    """Bulk upsert shot records keyed on (scene, shot_number) and return how many were written.
+
+    Records carry a scene_number unless a target scene is given. With replace=True
+    every existing shot of the affected scenes is dropped first.
+    """
+    if scene is not None:
+        scenes = {scene.scene_number: scene}
+    else:
+        numbers = {record.get('scene_number') for record in records}
+        scenes = {s.scene_number: s for s in Scene.query.filter(Scene.scene_number.in_(numbers))}
+        missing = sorted(str(n) for n in numbers - set(scenes))
+        if missing:
+            raise ValueError(f"Unknown scene number(s): {', '.join(missing)}")
+
+    scene_ids = [s.id for s in scenes.values()]
+    if replace:
+        Shot.query.filter(Shot.scene_id.in_(scene_ids)).delete(synchronize_session=False)
+        existing = {}
+    else:
+        existing = {(shot.scene_id, shot.shot_number): shot
+                    for shot in Shot.query.filter(Shot.scene_id.in_(scene_ids))}
+
+    for record in records:
+        target = scene or scenes[record['scene_number']]
+        fields = {k: v for k, v in record.items() if k != 'scene_number'}
+        key = (target.id, fields['shot_number'])
+        shot = existing.get(key)
+        if shot is None:
+            shot = existing[key] = Shot(scene_id=target.id, **fields)
+            db.session.add(shot)
+        else:
+            for field, value in fields.items():
+                setattr(shot, field, value)
+
+    db.session.flush()
+    sync_shot_counts(scene_ids)
+    db.session.commit()
+    return len(records)
+
+# Scene characters
+def cast_scenes(scenes):
+    """Bring the SceneCharacter rows of scenes in line with their characters text, adding new characters"""
+    wanted = {scene: parse_characters(scene.characters) for scene in scenes}
+    keys = {name.casefold() for names in wanted.values() for name in names}
+    characters = {character.name.casefold(): character for character in
+                  Character.query.filter(db.func.lower(Character.name).in_(keys))} if keys else {}
+    
+    for scene, names in wanted.items():
+        scene_keys = {name.casefold() for name in names}
+        for link in list(scene.cast):
+            if link.character.name.casefold() not in scene_keys:
+                scene.cast.remove(link)
+        existing = {link.character.name.casefold() for link in scene.cast}
+        for name in names:
+            if name.casefold() in existing:
+                continue
+            character = characters.get(name.casefold())
+            if character is None:
+                character = characters[name.casefold()] = Character(name=name)
+            scene.cast.append(SceneCharacter(character=character))
+
+@db.event.listens_for(db.session, 'before_flush')
+def cast_changed_scenes(session, flush_context, instances):
+    # Scene.characters stays the editable text; scene_character follows it on every flush
+    scenes = [obj for obj in session.new if isinstance(obj, Scene)]
+    scenes += [obj for obj in session.dirty
+               if isinstance(obj, Scene) and db.inspect(obj).attrs.characters.history.has_changes()]
+    if scenes:
+        with session.no_autoflush:
+            cast_scenes(scenes)
+
+def character_days():
+    """Every character with its scene count and first and last scheduled shoot day, in one grouped join"""
+    return (db.session.query(Character.id, Character.name,
+                             db.func.count(SceneCharacter.scene_id).label('scene_count'),
+                             db.func.min(CallSheet.date).label('first_day'),
+                             db.func.max(CallSheet.date).label('last_day'))
+            .outerjoin(SceneCharacter, SceneCharacter.character_id == Character.id)
+            .outerjoin(Scene, Scene.id == SceneCharacter.scene_id)
+            .outerjoin(CallSheet, CallSheet.id == Scene.call_sheet_id)
+            .group_by(Character.id, Character.name)
+            .order_by(Character.name)
+            .all())
+
+def scenes_with_character(character_id):
+    """Scenes a character appears in with their shoot dates, through ix_scene_character_character"""
+    return (db.session.query(Scene.id, Scene.scene_number, Scene.title, Scene.status,
+                             Scene.call_sheet_id, CallSheet.date)
+            .join(SceneCharacter, SceneCharacter.scene_id == Scene.id)
+            .outerjoin(CallSheet, CallSheet.id == Scene.call_sheet_id)
+            .filter(SceneCharacter.character_id == character_id)
+            .order_by(Scene.scene_number)
+            .all())
+
+def call_sheet_characters(sheet_id):
+    """Characters needed on a call sheet, with how many of its scenes each is in"""
+    return (db.session.query(Character.id, Character.name, db.func.count(Scene.id).label('scene_count'))
+            .join(SceneCharacter, SceneCharacter.character_id == Character.id)
+            .join(Scene, Scene.id == SceneCharacter.scene_id)
+            .filter(Scene.call_sheet_id == sheet_id)
+            .group_by(Character.id, Character.name)
+            .order_by(Character.name)
+            .all())
+
+# Stripboard
+def scene_strips():
+    """Strips for every scene the stripboard may place: not shot yet and not on a hand-made call sheet"""
+    rows = (db.session.query(Scene.id, Scene.scene_number, Scene.location, Scene.time_of_day,
+                             Scene.scene_type, Scene.estimated_duration)
+            .outerjoin(CallSheet, CallSheet.id == Scene.call_sheet_id)
+            .filter(db.or_(Scene.call_sheet_id.is_(None), CallSheet.draft.is_(True)),
+                    db.or_(Scene.status.is_(None), Scene.status.notin_(('shot', 'completed'))))
+            .order_by(Scene.scene_number)
+            .all())
+    cast = {}
+    for scene_id, name in db.session.query(SceneCharacter.scene_id, Character.name).join(Character):
+        cast.setdefault(scene_id, []).append(name)
+    
+    pace = current_app.config['SCHEDULE_HOURS_PER_SCREEN_MINUTE']
+    return [Strip(row.id, row.location, parse_duration(row.estimated_duration) * pace,
+                  row.time_of_day, row.scene_type, cast.get(row.id, ()), label=str(row.scene_number))
+            for row in rows]
+
+def shoot_dates(start):
+    """Shoot weekdays from start on, skipping dates that already have a hand-made call sheet"""
+    taken = set(db.session.scalars(db.select(CallSheet.date).where(
+        CallSheet.date >= start, db.or_(CallSheet.draft.is_(None), CallSheet.draft.is_(False)))))
+    day = start
+    while True:
+        if day.weekday() in current_app.config['SCHEDULE_SHOOT_WEEKDAYS'] and day not in taken:
+            yield day
+        day += timedelta(days=1)
+
+def clock_after(call_time, hours):
+    """Wall clock time a number of hours after a call time such as 7:00 AM"""
+    wrap = datetime.strptime(call_time, '%I:%M %p') + timedelta(hours=hours)
+    return wrap.strftime('%I:%M %p').lstrip('0')
+
+def write_draft_call_sheets(stripboard, start):
+    """Replace the draft call sheets with one per planned day from start on, and point their scenes at them"""
+    drafts = db.select(CallSheet.id).where(CallSheet.draft.is_(True))
+    Scene.query.filter(Scene.call_sheet_id.in_(drafts)).update({'call_sheet_id': None}, synchronize_session=False)
+    CallSheet.query.filter(CallSheet.draft.is_(True)).delete(synchronize_session=False)
+    
+    call_sheets = []
+    for day, date in zip(stripboard.days, shoot_dates(start)):
+        call_time = current_app.config['SCHEDULE_NIGHT_CALL' if day.night else 'SCHEDULE_DAY_CALL']
+        call_sheet = CallSheet(
+            title=f'Draft Day {day.number} - {day.locations[0]}',
+            date=date,
+            location=' / '.join(day.locations),
+            call_time=call_time,
+            wrap_time=clock_after(call_time, day.hours + 1),  # plus the meal break
+            scenes=', '.join(f'Sc. {strip.label}' for strip in day.strips),
+            cast_notes=', '.join(day.cast),
+            special_notes=f'Draft from the stripboard: {day.hours:g} hours, {len(day.locations) - 1} company move(s)',
+            draft=True
+        )
+        db.session.add(call_sheet)
+        call_sheets.append((call_sheet, [strip.id for strip in day.strips]))
+    db.session.flush()
+    
+    for call_sheet, scene_ids in call_sheets:
+        Scene.query.filter(Scene.id.in_(scene_ids)).update({'call_sheet_id': call_sheet.id}, synchronize_session=False)
+    db.session.commit()
+    return [call_sheet for call_sheet, _ in call_sheets]
+
+def plan_request():
+    """Keyword arguments for plan() from a JSON body; raises ValueError"""
+    data = request.get_json(silent=True) or {}
+    try:
+        day_hours = float(data.get('day_hours', current_app.config['SCHEDULE_DAY_HOURS']))
+        seconds = float(data.get('seconds', current_app.config['SCHEDULE_SEARCH_SECONDS']))
+    except (TypeError, ValueError):
+        raise ValueError('day_hours and seconds must be numbers')
+    if day_hours <= 0:
+        raise ValueError('day_hours must be positive')
+    
+    days = data.get('days')
+    if days is not None and not (isinstance(days, list) and all(
+            isinstance(day, list) and all(isinstance(id, int) for id in day) for day in days)):
+        raise ValueError('days must be a list of lists of scene ids')
+    return {
+        'day_hours': day_hours,
+        'initial': days,
+        'time_limit': min(max(seconds, 0), current_app.config['SCHEDULE_MAX_SEARCH_SECONDS'])
+    }
+
+# Call sheet PDFs
+def call_sheet_pdf_html(call_sheets):
+    """Printable HTML for each call sheet; scenes, cast and contacts take one query each for the whole batch"""
+    sheet_ids = [sheet.id for sheet in call_sheets]
+    scenes = {sheet_id: [] for sheet_id in sheet_ids}
+    for scene in load_rows(SceneRow, db.session.query(*SceneRow.columns)
+                           .filter(Scene.call_sheet_id.in_(sheet_ids))
+                           .order_by(Scene.scene_number)):
+        scenes[scene.call_sheet_id].append(scene)
+    
+    cast = {}
+    for scene_id, name in (db.session.query(SceneCharacter.scene_id, Character.name)
+                           .join(Character, Character.id == SceneCharacter.character_id)
+                           .join(Scene, Scene.id == SceneCharacter.scene_id)
+                           .filter(Scene.call_sheet_id.in_(sheet_ids))
+                           .order_by(Character.name)):
+        cast.setdefault(scene_id, []).append(name)
+    
+    contacts = (Contact.query
+                .filter(db.or_(Contact.emergency_contact.is_(True), Contact.department == 'cast'))
+                .order_by(Contact.name)
+                .all())
+    return [render_template('crew/callsheet_pdf.html', call_sheet=sheet, scenes=scenes[sheet.id],
+                            cast=cast, contacts=contacts)
+            for sheet in call_sheets]
+
+def call_sheets_between(start, end):
+    """Call sheets dated start to end inclusive, in shooting order"""
+    return (CallSheet.query
+            .filter(CallSheet.date >= start, CallSheet.date <= end)
+            .order_by(CallSheet.date, CallSheet.id)
+            .all())
+
+def call_sheet_range_args():
+    """(start, end) dates from ?start=&end= (YYYY-MM-DD, end defaults to a week on); raises ValueError"""
+    try:
+        start = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+        end = (datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end')
+               else start + timedelta(days=6))
+    except ValueError:
+        raise ValueError('start and end must be dates (YYYY-MM-DD)')
+    if end < start:
+        raise ValueError('end must not be before start')
+    if (end - start).days >= current_app.config['CALL_SHEET_PDF_MAX_DAYS']:
+        raise ValueError(f"A PDF covers at most {current_app.config['CALL_SHEET_PDF_MAX_DAYS']} days")
+    return start, end
+
+def send_call_sheet_pdf(path, filename):
+    """Send a cached call sheet PDF; its file name is its content hash, so that is the ETag"""
+    response = send_file(path, mimetype='application/pdf', download_name=filename,
+                         as_attachment=bool(request.args.get('download')),
+                         etag=os.path.splitext(os.path.basename(path))[0])
+    response.cache_control.private = True
+    return response
+
+# Crew notifications: an announcement is committed with the change it is about, then delivered by a job
+def notify_crew(message, priority='normal', audience='all', title=None, created_by=None):
+    """Record an announcement (low, normal, high or urgent) and queue its delivery; returns the Announcement"""
+    announcement = Announcement(title=(title or message)[:200], content=message, priority=priority,
+                                target_audience=audience, created_by=created_by)
+    db.session.add(announcement)
+    db.session.flush()
+    queue_announcement(announcement)
+    return announcement
+
+def queue_announcement(announcement):
+    """Queue delivery of a flushed announcement, as urgently as the announcement itself"""
+    return job_queue.enqueue('announcement', {'announcement_id': announcement.id},
+                             priority=announcement.priority if announcement.priority in PRIORITIES else 'normal')
+
+def announcement_recipients(audience):
+    """(contact id, email, phone) of every contact in an audience, in one query.
+
+    audience is 'all', 'crew' (everyone but the cast) or a comma-separated
+    list of departments, which is looked up through ix_contact_department.
+    """
+    query = (db.session.query(Contact.id, Contact.email, Contact.phone)
+             .filter(db.or_(Contact.email.isnot(None), Contact.phone.isnot(None))))
+    audience = (audience or 'all').strip().lower()
+    if audience == 'crew':
+        query = query.filter(db.or_(Contact.department.is_(None), Contact.department != 'cast'))
+    elif audience != 'all':
+        query = query.filter(Contact.department.in_([d.strip() for d in audience.split(',') if d.strip()]))
+    return query.all()
+
+def announcement_job(announcement_id):
+    """Deliver an announcement to its audience; run again, it only sends to the addresses that failed"""
+    announcement = db.session.get(Announcement, announcement_id)
+    if announcement is None or (announcement.expires_at and announcement.expires_at < datetime.utcnow()):
+        return
+    config = current_app.config
+    texts = announcement.priority in config['NOTIFY_SMS_PRIORITIES']
+    # One delivery per address, however many contacts share it
+    wanted = {}
+    for contact_id, email, phone in announcement_recipients(announcement.target_audience):
+        if email and '@' in email:
+            wanted.setdefault(('email', email.strip().lower()), contact_id)
+        address = texts and sms_address(phone, config['SMS_GATEWAY_DOMAIN'])
+        if address:
+            wanted.setdefault(('sms', address), contact_id)
+    
+    deliveries = NotificationDelivery.query.filter_by(announcement_id=announcement.id)
+    deliveries.filter_by(status='failed').delete(synchronize_session=False)
+    done = {tuple(row) for row in
+            deliveries.with_entities(NotificationDelivery.channel, NotificationDelivery.address)}
+    pending = {key: contact_id for key, contact_id in wanted.items() if key not in done}
+    
+    def record(key, status, error=None):
+        return {'announcement_id': announcement.id, 'contact_id': pending[key], 'channel': key[0],
+                'address': key[1], 'status': status, 'error': error, 'sent_at': datetime.utcnow()}
+    
+    rows = []
+    if announcement.priority != 'urgent' and pending:
+        # Nobody gets more than NOTIFY_RECIPIENT_LIMIT routine announcements a window; urgent ones always go
+        since = datetime.utcnow() - timedelta(seconds=config['NOTIFY_RECIPIENT_WINDOW'])
+        recent = dict(db.session.query(NotificationDelivery.address, db.func.count())
+                      .filter(NotificationDelivery.address.in_({address for _, address in pending}),
+                              NotificationDelivery.sent_at >= since, NotificationDelivery.status == 'sent')
+                      .group_by(NotificationDelivery.address))
+        for key in [key for key in pending if recent.get(key[1], 0) >= config['NOTIFY_RECIPIENT_LIMIT']]:
+            rows.append(record(key, 'limited'))
+            del pending[key]
+    if rows:
+        db.session.execute(db.insert(NotificationDelivery), rows)
+    db.session.commit()
+    
+    sender = config['MAIL_SENDER']
+    sends = [(channel, compose(sender, announcement.title, announcement.content, channel),
+              [address for key_channel, address in pending if key_channel == channel])
+             for channel in ('email', 'sms')]
+    counts = dict.fromkeys(('sent', 'failed'), 0)
+    retryable = 0
+    for channel, batch, refused, error in fan_out(smtp_pool, [send for send in sends if send[2]],
+                                                  config['NOTIFY_BATCH_SIZE']):
+        rows = []
+        for address in batch:
+            if error is not None:
+                rows.append(record((channel, address), 'failed', f'{type(error).__name__}: {error}'))
+                retryable += 1
+            elif address in refused:
+                code, reply = refused[address]
+                reply = reply.decode('utf-8', 'replace') if isinstance(reply, bytes) else reply
+                rows.append(record((channel, address), 'failed', f'{code} {reply}'))
+                retryable += 400 <= code < 500  # a 5xx refusal would only be refused again
+            else:
+                rows.append(record((channel, address), 'sent'))
+            counts[rows[-1]['status']] += 1
+        # Recorded batch by batch, so a worker that dies part way resends as little as possible
+        db.session.execute(db.insert(NotificationDelivery), rows)
+        db.session.commit()
+    current_app.logger.info('Announcement %s: %s sent, %s failed', announcement.id, counts['sent'], counts['failed'])
+    if retryable:
+        raise DeliveryFailed(f"{retryable} of {len(pending)} deliveries failed for now; only failed ones are retried")
+
+# Call sheet fields the whole crew is told about when they change on a published sheet
+CALL_SHEET_NOTICE_FIELDS = ('date', 'call_time', 'location')
+
+@db.event.listens_for(db.session, 'before_flush')
+def announce_call_sheet_changes(session, flush_context, instances):
+    changed = [sheet for sheet in session.dirty
+               if isinstance(sheet, CallSheet) and not sheet.draft
+               and any(db.inspect(sheet).attrs[field].history.has_changes() for field in CALL_SHEET_NOTICE_FIELDS)]
+    for sheet in changed:
+        announcement = Announcement(
+            title=f"Call sheet changed: {sheet.title}"[:200],
+            content=f"{sheet.title} on {sheet.date.strftime('%A, %B %d')}: call {sheet.call_time} at {sheet.location}.",
+            priority='urgent', target_audience='all', created_by='Call sheets')
+        session.add(announcement)
+        session.info.setdefault('unqueued_announcements', []).append(announcement)
+
+@db.event.listens_for(db.session, 'after_flush_postexec')
+def queue_call_sheet_announcements(session, flush_context):
+    # Their ids exist once the flush has inserted them; the jobs go in with the same commit
+    for announcement in session.info.pop('unqueued_announcements', []):
+        if db.inspect(announcement).persistent:
+            queue_announcement(announcement)
+
+# Background jobs (flask run-jobs); enqueued jobs are committed with the caller's transaction
+
+def thumbnail_job(document_id):
+    """Hash a document and render its thumbnail or poster frame"""
+    document = db.session.get(Document, document_id)
+    if document is None:
+        return
+    path = os.path.join(current_app.static_folder, document.filepath)
+    content_hash, thumb_path = thumbnails.submit(path).result()
+    document.content_hash = content_hash
+    if thumb_path:
+        document.thumbnail_path = os.path.relpath(thumb_path, current_app.static_folder).replace(os.sep, '/')
+    db.session.commit()
+
+def render_pages_job(document_id):
+    """Render a PDF's pages at the size the viewer shows first, and its first page for storyboard cards"""
+    document = db.session.get(Document, document_id)
+    if document is None or not os.path.isfile(os.path.join(current_app.static_folder, document.filepath)):
+        return
+    path = document_file(document)
+    try:
+        pages = len(page_renders.page_sizes(path, document.content_hash))
+    except UnreadablePDF:
+        return  # the viewer shows the original file; trying again would not help
+    for page, width in [(1, RENDER_WIDTHS[0])] + [(page, RENDER_WIDTHS[1]) for page in range(1, pages + 1)]:
+        page_renders.page(path, document.content_hash, page, width, 'webp')
+
+def call_sheet_export_job(start, end):
+    """Typeset and merge the call sheets from start to end (ISO dates) for /crew/callsheets.pdf"""
+    call_sheets = call_sheets_between(datetime.strptime(start, '%Y-%m-%d').date(),
+                                      datetime.strptime(end, '%Y-%m-%d').date())
+    if call_sheets:
+        call_sheet_pdfs.combine(call_sheet_pdfs.render_many(call_sheet_pdf_html(call_sheets)))
+
+JOB_HANDLERS = {
+    'thumbnail': thumbnail_job,
+    'render_pages': render_pages_job,
+    'call_sheet_export': call_sheet_export_job,
+    'announcement': announcement_job,
+}
 
 # Routes for Public Site
-@app.route('/')
+@bp.route('/')
 def index():
     """Homepage with hero section and latest blog posts"""
     recent_posts = BlogPost.query.filter_by(published=True).order_by(BlogPost.created_at.desc()).limit(3).all()
     return render_template('public/index.html', posts=recent_posts)
 
-@app.route('/about')
+@bp.route('/about')
 def about():
     """About page with studio mission and director bio"""
     return render_template('public/about.html')
 
-@app.route('/projects')
+@bp.route('/projects')
 def projects():
     """Projects showcase page"""
     return render_template('public/projects.html')
 
-@app.route('/blog')
+@bp.route('/blog')
 def blog():
     """Blog listing page"""
-    posts = BlogPost.query.filter_by(published=True).order_by(BlogPost.created_at.desc()).all()
-    return render_template('public/blog.html', posts=posts)
+    try:
+        posts, next_cursor = posts_page(*list_page_args())
+    except ValueError:
+        abort(400)
+    return render_template('public/blog.html', posts=posts,
+                           **next_page_links(next_cursor, 'main.blog', 'main.api_blog'))
 
-@app.route('/blog/<int:post_id>')
+@bp.route('/blog/<int:post_id>')
 def blog_post(post_id):
     """Individual blog post page"""
     post = BlogPost.query.get_or_404(post_id)
     return render_template('public/post.html', post=post)
 
-@app.route('/contact')
+@bp.route('/contact')
 def contact():
     """Contact page"""
     return render_template('public/contact.html')
 
 # Crew Portal Routes
-@app.route('/crew/login', methods=['GET', 'POST'])
+@bp.route('/crew/login', methods=['GET', 'POST'])
 def crew_login():
     """Crew portal login"""
     if session.get('crew_logged_in'):
-        return redirect(url_for('crew_dashboard'))
+        return redirect(url_for('main.crew_dashboard'))
     
+    from forms import CrewLoginForm  # Flask-WTF is only needed here, so it stays out of startup
     form = CrewLoginForm()
     if form.validate_on_submit():
-        if form.password.data == app.config['CREW_PASSWORD']:
+        if form.password.data == current_app.config['CREW_PASSWORD']:
             session['crew_logged_in'] = True
             session.permanent = True
             flash('Welcome to the crew portal!', 'success')
-            return redirect(url_for('crew_dashboard'))
+            return redirect(url_for('main.crew_dashboard'))
         else:
             flash('Invalid password. Please try again.', 'error')
     
     return render_template('crew/login.html', form=form)
 
-@app.route('/crew/logout')
+@bp.route('/crew/logout')
 def crew_logout():
     """Crew portal logout"""
     session.pop('crew_logged_in', None)
     flash('You have been logged out.', 'info')
-    return redirect(url_for('crew_login'))
+    return redirect(url_for('main.crew_login'))
 
-@app.route('/crew/dashboard')
+@bp.route('/crew/dashboard')
 def crew_dashboard():
     """Crew dashboard with today's overview"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
-    # Get today's call sheet
     today = datetime.now().date()
-    todays_call_sheet = CallSheet.query.filter_by(date=today).first()
-    
-    # Get upcoming call sheets (next 7 days)
-    upcoming_call_sheets = CallSheet.query.filter(
-        CallSheet.date > today,
-        CallSheet.date <= today + timedelta(days=7)
-    ).order_by(CallSheet.date).all()
-    
-    # Get weather data
-    weather = get_weather_data()
-    
-    # Get recent announcements
-    recent_posts = BlogPost.query.filter_by(published=True).order_by(BlogPost.created_at.desc()).limit(3).all()
+    todays_call_sheet, upcoming_call_sheets, recent_posts = dashboard_data(today)
     
     return render_template('crew/dashboard.html', 
                          call_sheet=todays_call_sheet,
                          upcoming_call_sheets=upcoming_call_sheets,
-                         weather=weather,
                          posts=recent_posts,
                          today=datetime.now())
 
-@app.route('/crew/callsheets')
+@bp.route('/crew/callsheets')
 def crew_callsheets():
     """Call sheets management"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
-    call_sheets = CallSheet.query.order_by(CallSheet.date.desc()).all()
-    return render_template('crew/callsheets.html', call_sheets=call_sheets)
+    try:
+        call_sheets, next_cursor = call_sheets_page(*list_page_args())
+    except ValueError:
+        abort(400)
+    return streamed_page('crew/callsheets.html', call_sheets=call_sheets,
+                         **next_page_links(next_cursor, 'main.crew_callsheets', 'main.api_callsheets'))
 
-@app.route('/crew/callsheets/<int:sheet_id>')
+@bp.route('/crew/callsheets/<int:sheet_id>')
 def crew_callsheet_detail(sheet_id):
     """Individual call sheet view"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
+    
+    call_sheet = CallSheet.query.get_or_404(sheet_id)
+    return streamed_page('crew/callsheet_detail.html', call_sheet=call_sheet)
+
+@bp.route('/crew/callsheets/<int:sheet_id>.pdf')
+def crew_callsheet_pdf(sheet_id):
+    """Printable PDF of one call sheet (?download=1 to save it)"""
+    if not session.get('crew_logged_in'):
+        return redirect(url_for('main.crew_login'))
     
     call_sheet = CallSheet.query.get_or_404(sheet_id)
-    return render_template('crew/callsheet_detail.html', call_sheet=call_sheet)
+    try:
+        path = call_sheet_pdfs.render(call_sheet_pdf_html([call_sheet])[0])
+    except RenderUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    except RenderTimeout as e:
+        return jsonify({'error': str(e)}), 503
+    return send_call_sheet_pdf(path, f'call-sheet-{call_sheet.date.isoformat()}.pdf')
 
-@app.route('/crew/scripts')
+@bp.route('/crew/callsheets.pdf')
+def crew_callsheets_pdf():
+    """Every call sheet from ?start= to ?end= in one PDF, typeset by a background job when any has changed"""
+    if not session.get('crew_logged_in'):
+        return redirect(url_for('main.crew_login'))
+    
+    try:
+        start, end = call_sheet_range_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    call_sheets = call_sheets_between(start, end)
+    if not call_sheets:
+        abort(404)
+    
+    htmls = call_sheet_pdf_html(call_sheets)
+    missing = call_sheet_pdfs.missing(htmls)
+    if missing:
+        if not call_sheet_pdfs.available():
+            return jsonify({'error': 'PDF rendering requires PyMuPDF'}), 501
+        # Typesetting a week takes seconds; the page waits on the job queue and reloads itself
+        job = job_queue.enqueue('call_sheet_export', {'start': start.isoformat(), 'end': end.isoformat()},
+                                priority='high', dedupe_key=f'call_sheet_export:{start}:{end}')
+        db.session.commit()
+        return (render_template('crew/callsheets_pdf_pending.html', start=start, end=end,
+                                total=len(htmls), missing=missing, error=job.last_error),
+                202, {'Refresh': '3', 'Retry-After': '3', 'Cache-Control': 'no-store'})
+    
+    try:
+        path = call_sheet_pdfs.combine(call_sheet_pdfs.render_many(htmls))
+    except RenderUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    except RenderTimeout as e:
+        return jsonify({'error': str(e)}), 503
+    return send_call_sheet_pdf(path, f'call-sheets-{start.isoformat()}-to-{end.isoformat()}.pdf')
+
+@bp.route('/crew/scripts')
 def crew_scripts():
     """Scripts and sides page"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
-    scripts = Document.query.filter_by(document_type='script').order_by(Document.created_at.desc()).all()
-    sides = Document.query.filter_by(document_type='sides').order_by(Document.created_at.desc()).all()
+    scripts = documents_tagged('script').all()
+    sides = documents_tagged('sides').all()
     
     return render_template('crew/scripts.html', scripts=scripts, sides=sides)
 
-@app.route('/crew/shotlist')
+@bp.route('/crew/shotlist')
 def crew_shotlist():
     """Shot list page"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
     # Get all scenes ordered by scene number for shot list index
-    scenes = Scene.query.order_by(Scene.scene_number).all()
-    
-    return render_template('crew/shotlist.html', scenes=scenes)
+    return cached_page(('scene',), lambda: render_template(
+        'crew/shotlist.html', scenes=scene_rows()))
 
-@app.route('/crew/scenes')
+@bp.route('/crew/scenes')
 def crew_scenes():
     """Master scenes list page"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
     # Get all scenes ordered by scene number
-    scenes = Scene.query.order_by(Scene.scene_number).all()
-    
-    return render_template('crew/scenes.html', scenes=scenes)
+    return cached_page(('scene',), lambda: render_template(
+        'crew/scenes.html', scenes=scene_rows()))
 
-@app.route('/crew/scenes/<int:scene_id>')
+@bp.route('/crew/scenes/<int:scene_id>')
 def crew_scene_detail(scene_id):
     """Individual scene detail page"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
     scene = Scene.query.get_or_404(scene_id)
     
-    return render_template('crew/scene_detail.html', scene=scene)
+    return streamed_page('crew/scene_detail.html', scene=scene)
 
-@app.route('/crew/scenes/<int:scene_id>/shots')
+@bp.route('/crew/scenes/<int:scene_id>/shots')
 def crew_scene_shots(scene_id):
     """Individual scene shot list page"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
     scene = Scene.query.get_or_404(scene_id)
+    shots = Shot.query.filter_by(scene_id=scene.id).order_by(Shot.shot_number).all()
     
-    return render_template('crew/scene_shots.html', scene=scene)
+    return streamed_page('crew/scene_shots.html', scene=scene, shots=shots)
 
-@app.route('/crew/storyboards')
+@bp.route('/crew/storyboards')
 def crew_storyboards():
     """Crew storyboards page"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
-    # Get storyboards and visual references from database
-    storyboards = Document.query.filter(
-        (Document.document_type == 'document') & 
-        (Document.title.contains('Storyboard'))
-    ).order_by(Document.created_at.desc()).all()
-    
-    visual_refs = Document.query.filter(
-        (Document.document_type == 'photo') | 
-        (Document.document_type == 'document')
-    ).filter(
-        (Document.title.contains('Location')) |
-        (Document.title.contains('Character')) |
-        (Document.title.contains('Reference'))
-    ).order_by(Document.created_at.desc()).all()
+    # Get storyboards and visual references (location, character and reference tags)
+    storyboards = load_rows(DocumentRow, documents_tagged('storyboard', db.session.query(*DocumentRow.columns)))
+    visual_refs = load_rows(DocumentRow, documents_tagged('visual_reference', db.session.query(*DocumentRow.columns)))
     
     return render_template('crew/storyboards.html', storyboards=storyboards, visual_refs=visual_refs)
 
-@app.route('/crew/schedule')
+@bp.route('/crew/schedule')
 def crew_schedule():
     """Production schedule calendar"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
-    call_sheets = CallSheet.query.order_by(CallSheet.date).all()
+    # Past/upcoming styling depends on the date, so it is part of the key
     today = datetime.now().date()
-    return render_template('crew/schedule.html', call_sheets=call_sheets, today=today)
+    return cached_page(('call_sheet',), lambda: render_template(
+        'crew/schedule.html', today=today,
+        call_sheets=load_rows(ScheduleRow, db.session.query(*ScheduleRow.columns).order_by(CallSheet.date))), today)
 
-@app.route('/crew/dailies')
+@bp.route('/crew/dailies')
 def crew_dailies():
     """Daily footage review"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
-    dailies = Document.query.filter_by(document_type='dailies').order_by(Document.created_at.desc()).all()
-    return render_template('crew/dailies.html', dailies=dailies)
+    try:
+        dailies, next_cursor = documents_page('dailies', *list_page_args())
+    except ValueError:
+        abort(400)
+    return render_template('crew/dailies.html', dailies=dailies,
+                           **next_page_links(next_cursor, 'main.crew_dailies', 'main.api_documents',
+                                             api_args={'tag': 'dailies', 'view': 'dailies'}))
 
-@app.route('/crew/gallery')
+@bp.route('/crew/gallery')
 def crew_gallery():
     """Photo gallery"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
-    photos = Document.query.filter_by(document_type='photo').order_by(Document.created_at.desc()).all()
-    return render_template('crew/gallery.html', photos=photos)
+    try:
+        photos, next_cursor = documents_page('photo', *list_page_args())
+    except ValueError:
+        abort(400)
+    return render_template('crew/gallery.html', photos=photos,
+                           **next_page_links(next_cursor, 'main.crew_gallery', 'main.api_documents',
+                                             api_args={'tag': 'photo', 'view': 'gallery'}))
 
-@app.route('/crew/contacts')
+@bp.route('/crew/contacts')
 def crew_contacts():
     """Contact directory"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
-    contacts = Contact.query.order_by(Contact.name).all()
-    return render_template('crew/contacts.html', contacts=contacts)
+    return cached_page(('contact',), lambda: render_template(
+        'crew/contacts.html', contacts=Contact.query.order_by(Contact.name).all()))
 
-@app.route('/crew/documents')
+@bp.route('/crew/documents')
 def crew_documents():
     """Document management"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
-    documents = Document.query.order_by(Document.created_at.desc()).all()
-    return render_template('crew/documents.html', documents=documents)
+    tag = request.args.get('tag') or None
+    if tag is not None and tag not in DOCUMENT_TAGS:
+        abort(404)
+    try:
+        documents, next_cursor = documents_page(tag, *list_page_args())
+    except ValueError:
+        abort(400)
+    return render_template('crew/documents.html', documents=documents, tag=tag,
+                           **next_page_links(next_cursor, 'main.crew_documents', 'main.api_documents', tag=tag))
 
-@app.route('/crew/access')
+@bp.route('/crew/access')
 def crew_access():
     """Crew access information page"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
     return render_template('crew/crew_access.html')
 
 # API Routes
-@app.route('/api/weather')
+@bp.route('/api/weather')
 def api_weather():
     """Weather API endpoint"""
-    weather = get_weather_data()
+    location = request.args.get('location') or current_app.config['WEATHER_DEFAULT_LOCATION']
+    weather = weather_service.current(location, wait=current_app.config['WEATHER_WAIT_SECONDS'])
+    if weather is None:
+        return jsonify({'error': 'Weather unavailable', 'location': location}), 503
     return jsonify(weather)
 
-@app.route('/api/countdown')
-def api_countdown():
-    """Countdown to next shoot API"""
+def next_shoot_countdown():
     next_shoot = CallSheet.query.filter(CallSheet.date >= datetime.now().date()).order_by(CallSheet.date).first()
     if next_shoot:
-        return jsonify({
+        return {
             'target_date': next_shoot.date.isoformat(),
             'countdown': format_countdown(next_shoot.date)
+        }
+    return {'countdown': 'No upcoming shoots'}
+
+@bp.route('/api/countdown')
+def api_countdown():
+    """Countdown to next shoot API"""
+    return jsonify(next_shoot_countdown())
+
+@bp.route('/api/announcements', methods=['POST'])
+def api_announcements():
+    """Post an announcement (JSON title, content, priority, target_audience, expires_at); delivered by a job"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    title = str(data.get('title') or '').strip()
+    content = str(data.get('content') or '').strip() or title
+    priority = data.get('priority', 'normal')
+    if not title:
+        return jsonify({'error': 'title is required'}), 400
+    if priority not in PRIORITIES:
+        return jsonify({'error': f'priority must be one of {", ".join(PRIORITIES)}'}), 400
+    try:
+        expires_at = datetime.fromisoformat(data['expires_at']) if data.get('expires_at') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'expires_at must be an ISO date and time'}), 400
+    
+    announcement = notify_crew(content, priority, str(data.get('target_audience') or 'all'), title,
+                               created_by='Crew Portal')
+    announcement.expires_at = expires_at
+    db.session.commit()
+    return jsonify(announcement.to_dict()), 201
+
+@bp.route('/api/announcements/<int:announcement_id>')
+def api_announcement(announcement_id):
+    """An announcement with its deliveries counted by channel and status"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    announcement = Announcement.query.get_or_404(announcement_id)
+    deliveries = {}
+    for channel, status, count in (db.session.query(NotificationDelivery.channel, NotificationDelivery.status,
+                                                    db.func.count())
+                                   .filter(NotificationDelivery.announcement_id == announcement_id)
+                                   .group_by(NotificationDelivery.channel, NotificationDelivery.status)):
+        deliveries.setdefault(channel, {})[status] = count
+    return jsonify({**announcement.to_dict(), 'deliveries': deliveries})
+
+# Dashboard data
+DASHBOARD_KINDS = ('call_sheet', 'blog_post')
+DASHBOARD_PAYLOAD_VERSION = 1  # bump when the /api/dashboard payload changes shape
+
+def dashboard_data(today):
+    """Today's call sheet, call sheets for the next 7 days and the latest published posts"""
+    todays_call_sheet = CallSheet.query.filter_by(date=today).first()
+    upcoming_call_sheets = CallSheet.query.filter(
+        CallSheet.date > today,
+        CallSheet.date <= today + timedelta(days=7)
+    ).order_by(CallSheet.date).all()
+    recent_posts = BlogPost.query.filter_by(published=True).order_by(BlogPost.created_at.desc()).limit(3).all()
+    return todays_call_sheet, upcoming_call_sheets, recent_posts
+
+def dashboard_etag(today):
+    """ETag of the /api/dashboard payload, built from change stamps without loading any rows"""
+    stamps = change_stamps(db.session, ChangeEvent, DASHBOARD_KINDS)
+    weather_stamp = weather_service.stamp(current_app.config['WEATHER_DEFAULT_LOCATION'])
+    parts = [str(DASHBOARD_PAYLOAD_VERSION), today.isoformat(), weather_stamp]
+    parts += [f'{kind}={stamps[kind]}' for kind in DASHBOARD_KINDS]
+    return hashlib.sha1(':'.join(parts).encode()).hexdigest()
+
+@bp.route('/api/dashboard')
+def api_dashboard():
+    """Everything the crew dashboard shows in one response; unchanged data revalidates to a 304"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    today = datetime.now().date()
+    etag = dashboard_etag(today)
+    matched = matching_etag(etag)
+    if matched:
+        response = Response(status=304)
+    else:
+        todays_call_sheet, upcoming_call_sheets, recent_posts = dashboard_data(today)
+        response = jsonify({
+            'today': today.isoformat(),
+            'call_sheet': todays_call_sheet.to_dict() if todays_call_sheet else None,
+            'upcoming_call_sheets': [sheet.to_dict() for sheet in upcoming_call_sheets],
+            'countdown': next_shoot_countdown(),
+            'weather': weather_service.current(current_app.config['WEATHER_DEFAULT_LOCATION']),
+            'posts': [post.to_dict() for post in recent_posts]
         })
-    return jsonify({'countdown': 'No upcoming shoots'})
+    response.set_etag(matched or etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route('/api/stream')
+def api_stream():
+    """Server-Sent Events: weather and countdown on connect, then call sheet, scene,
+    announcement and document changes as they are committed"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+
+    last_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+
+    snapshot = [('countdown', next_shoot_countdown())]
+    weather = weather_service.current(current_app.config['WEATHER_DEFAULT_LOCATION'])
+    if weather is not None:
+        snapshot.append(('weather', weather))
+    # The stream outlives this request's context, so it gets the feed itself rather than the proxy
+    stream = event_stream(change_feed._get_current_object(), last_id, snapshot,
+                          duration=current_app.config['SSE_STREAM_SECONDS'],
+                          keepalive=current_app.config['SSE_KEEPALIVE_SECONDS'],
+                          retry_ms=current_app.config['SSE_RETRY_MS'])
+    stream = stream_slots.hold(stream)
+    if stream is None:
+        # Every stream thread of this worker is taken; the page polls instead of queueing requests behind streams
+        response = jsonify({'error': 'Too many open streams'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(current_app.config['SSE_STREAM_SECONDS'])
+        return response
+    # Keep proxies (nginx, Render) from buffering the stream
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Offline crew portal
+# Pages the service worker keeps, with the kinds of change that alter them
+OFFLINE_PAGES = {'main.crew_dashboard': DASHBOARD_KINDS, 'main.crew_schedule': ('call_sheet',),
+                 'main.crew_contacts': ('contact',), 'main.crew_scripts': ('document',), 'main.crew_offline': ()}
+OFFLINE_ASSETS = ('css/main.css', 'css/crew.css', 'js/main.js', 'js/crew.js', 'favicon/favicon.svg',
+                  'favicon/favicon.ico')
+OFFLINE_MANIFEST_VERSION = 1  # bump when what a manifest entry covers changes
+
+def offline_documents(call_sheets):
+    """The current script and the sides naming a scene or character on call_sheets, within the size budget"""
+    scenes = db.session.execute(
+        db.select(Scene.scene_number, Character.name)
+        .outerjoin(SceneCharacter, SceneCharacter.scene_id == Scene.id)
+        .outerjoin(Character, Character.id == SceneCharacter.character_id)
+        .where(Scene.call_sheet_id.in_([sheet.id for sheet in call_sheets]))
+    ).all()
+    needed = mentions({number for number, _ in scenes}, {name for _, name in scenes if name})
+    columns = db.session.query(Document.id, Document.title, Document.description, Document.file_size,
+                               Document.content_hash, Document.created_at)
+    documents = documents_tagged('script', columns).limit(1).all()
+    documents += [document for document in
+                  documents_tagged('sides', columns).limit(current_app.config['OFFLINE_SIDES_SCAN'])
+                  if needed(document.title) or needed(document.description)]
+    
+    kept, total = [], 0
+    for document in documents:
+        total += document.file_size or 0
+        if total > current_app.config['OFFLINE_MAX_BYTES']:
+            break
+        kept.append(document)
+    return kept
+
+def offline_manifest(today):
+    """{url: content hash} of everything the crew portal should keep for use without signal"""
+    release = release_digest(os.path.join(current_app.root_path, current_app.template_folder),
+                             os.path.join(current_app.static_folder, 'css'),
+                             os.path.join(current_app.static_folder, 'js'))
+    kinds = ('call_sheet', 'scene', 'contact', 'document', 'blog_post')
+    stamps = change_stamps(db.session, ChangeEvent, kinds)
+    
+    def page_hash(page_kinds):
+        return short_hash(OFFLINE_MANIFEST_VERSION, release, today, *(stamps[kind] for kind in page_kinds))
+    
+    entries = {url_for(endpoint): page_hash(page_kinds) for endpoint, page_kinds in OFFLINE_PAGES.items()}
+    for filename in OFFLINE_ASSETS:
+        entries[url_for('static', filename=filename)] = file_digest(os.path.join(current_app.static_folder,
+                                                                                 filename))
+    
+    call_sheets = CallSheet.query.filter(
+        CallSheet.date >= today,
+        CallSheet.date <= today + timedelta(days=current_app.config['OFFLINE_DAYS_AHEAD'])
+    ).order_by(CallSheet.date).all()
+    for sheet in call_sheets:
+        entries[url_for('main.crew_callsheet_detail', sheet_id=sheet.id)] = page_hash(('call_sheet', 'scene'))
+        entries[url_for('main.crew_callsheet_pdf', sheet_id=sheet.id)] = page_hash(('call_sheet', 'scene',
+                                                                                    'contact'))
+    for document in offline_documents(call_sheets):
+        entries[url_for('main.download_document', doc_id=document.id)] = (
+            document.content_hash or short_hash(document.id, document.file_size, document.created_at))
+    return entries
+
+# Static assets
+def send_static(app, filename):
+    """The static view: built assets in the best encoding the client accepts, other files as Flask sends them"""
+    response = app.extensions['static_assets'].send(filename)
+    return response if response is not None else app.send_static_file(filename)
+
+@bp.app_url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """Point url_for('static', filename=...) at the built copy of a stylesheet or script"""
+    assets = current_app.extensions.get('static_assets')
+    if endpoint == 'static' and assets is not None and 'filename' in values:
+        values['filename'] = assets.url_filename(values['filename'])
+
+@bp.route('/sw.js')
+def service_worker():
+    """The crew portal's service worker, served from the root so it can cover every page"""
+    response = current_app.send_static_file('js/service-worker.js')
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route('/crew/offline')
+def crew_offline():
+    """Shown by the service worker for pages it has not kept"""
+    if not session.get('crew_logged_in'):
+        return redirect(url_for('main.crew_login'))
+    
+    return render_template('crew/offline.html')
+
+@bp.route('/api/offline/manifest')
+def api_offline_manifest():
+    """What the service worker keeps offline, as {url: content hash}; ?since=<version> answers 304 when
+    nothing changed, otherwise the worker fetches just the entries whose hash differs from its copy"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    entries = offline_manifest(datetime.now().date())
+    version = manifest_version(entries)
+    matched = matching_etag(version)
+    if request.args.get('since') == version or matched:
+        response = Response(status=304)
+    else:
+        response = jsonify({'version': version, 'entries': entries})
+    response.set_etag(matched or version)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# Document tags
+def tag_document(document):
+    """Bring a document's tags in line with its title, filename and type"""
+    if document.created_at is None:
+        document.created_at = datetime.utcnow()
+    wanted = classify_document(document.title, document.filename, document.document_type)
+    for tag in list(document.tags):
+        if tag.tag in wanted:
+            tag.created_at = document.created_at
+        else:
+            document.tags.remove(tag)
+    existing = {tag.tag for tag in document.tags}
+    document.tags.extend(DocumentTag(tag=tag, created_at=document.created_at) for tag in sorted(wanted - existing))
+
+def documents_tagged(tag, query=None):
+    """Documents (or the columns query selects from them) carrying tag, newest first,
+    read in order from the (tag, created_at) index"""
+    return ((Document.query if query is None else query)
+            .join(DocumentTag, DocumentTag.document_id == Document.id)
+            .filter(DocumentTag.tag == tag)
+            .order_by(DocumentTag.created_at.desc(), DocumentTag.document_id.desc()))
+
+def backfill_document_tags(retag=False, batch_size=1000):
+    """Tag every untagged document (every document with retag) in batches; returns how many were tagged"""
+    last_id = 0
+    tagged = 0
+    while True:
+        query = Document.query.options(db.selectinload(Document.tags)).filter(Document.id > last_id)
+        if not retag:
+            query = query.filter(~Document.tags.any())
+        batch = query.order_by(Document.id).limit(batch_size).all()
+        if not batch:
+            return tagged
+        for document in batch:
+            tag_document(document)
+        db.session.commit()
+        last_id = batch[-1].id
+        tagged += len(batch)
+
+# Paginated lists
+DOCUMENT_LIST_VIEWS = {
+    'documents': 'crew/_document_cards.html',
+    'dailies': 'crew/_daily_cards.html',
+    'gallery': 'crew/_photo_items.html',
+}
+
+def list_page_args():
+    """(cursor, limit) from the query string, limit clamped to LIST_MAX_PAGE_SIZE"""
+    limit = request.args.get('limit', current_app.config['LIST_PAGE_SIZE'], type=int)
+    return request.args.get('cursor') or None, min(max(limit, 1), current_app.config['LIST_MAX_PAGE_SIZE'])
+
+def documents_page(tag=None, cursor=None, limit=None):
+    """Newest documents (carrying tag, if given) after cursor as DocumentRows; raises ValueError for a bad cursor"""
+    limit = limit or current_app.config['LIST_PAGE_SIZE']
+    query = db.session.query(*DocumentRow.columns)
+    key = lambda document: (document.created_at, document.id)
+    if tag:
+        rows, next_cursor = keyset_page(documents_tagged(tag, query), (DocumentTag.created_at, DocumentTag.document_id),
+                                        key, cursor, limit)
+    else:
+        rows, next_cursor = keyset_page(query, (Document.created_at, Document.id), key, cursor, limit)
+    return load_rows(DocumentRow, rows), next_cursor
+
+def call_sheets_page(cursor=None, limit=None):
+    """Call sheets latest date first after cursor as CallSheetRows; raises ValueError for a bad cursor"""
+    rows, next_cursor = keyset_page(db.session.query(*CallSheetRow.columns), (CallSheet.date, CallSheet.id),
+                                    lambda sheet: (sheet.date, sheet.id), cursor, limit or current_app.config['LIST_PAGE_SIZE'])
+    return load_rows(CallSheetRow, rows), next_cursor
+
+def posts_page(cursor=None, limit=None):
+    """Newest published blog posts after cursor; raises ValueError for a bad cursor"""
+    return keyset_page(BlogPost.query.filter_by(published=True), (BlogPost.created_at, BlogPost.id),
+                       lambda post: (post.created_at, post.id), cursor, limit or current_app.config['LIST_PAGE_SIZE'])
+
+def next_page_links(next_cursor, page_endpoint, api_endpoint, api_args=None, **args):
+    """Template variables for the next page: the plain page URL (no-JS fallback) and the API URL.
+
+    args go on both URLs, api_args only on the API one.
+    """
+    if not next_cursor:
+        return {'next_cursor': None}
+    return {
+        'next_cursor': next_cursor,
+        'next_page_url': url_for(page_endpoint, cursor=next_cursor, **args),
+        'next_api_url': url_for(api_endpoint, cursor=next_cursor, html=1, **args, **(api_args or {}))
+    }
+
+def list_response(items, next_cursor, partial):
+    """JSON page of a list; with ?html=1 also the rendered cards to append to the page"""
+    data = {'items': [item.to_dict() for item in items], 'next_cursor': next_cursor}
+    if request.args.get('html'):
+        data['html'] = render_template(partial, items=items)
+    return jsonify(data)
+
+@bp.route('/api/documents')
+def api_documents():
+    """Documents newest first, one keyset page at a time (?tag=, ?view= picks the cards for html)"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    tag = request.args.get('tag') or None
+    view = request.args.get('view', 'documents')
+    if tag is not None and tag not in DOCUMENT_TAGS:
+        return jsonify({'error': f'Unknown tag {tag!r}'}), 400
+    if view not in DOCUMENT_LIST_VIEWS:
+        return jsonify({'error': f'Unknown view {view!r}'}), 400
+    
+    try:
+        documents, next_cursor = documents_page(tag, *list_page_args())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return list_response(documents, next_cursor, DOCUMENT_LIST_VIEWS[view])
+
+@bp.route('/api/callsheets')
+def api_callsheets():
+    """Call sheets latest date first, one keyset page at a time"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    try:
+        call_sheets, next_cursor = call_sheets_page(*list_page_args())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return list_response(call_sheets, next_cursor, 'crew/_call_sheet_cards.html')
+
+@bp.route('/api/blog')
+def api_blog():
+    """Published blog posts newest first, one keyset page at a time"""
+    try:
+        posts, next_cursor = posts_page(*list_page_args())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return list_response(posts, next_cursor, 'public/_post_cards.html')
+
+# Upload helpers
+def upload_session_root():
+    return os.path.join(current_app.root_path, current_app.config['UPLOAD_SESSION_FOLDER'])
+
+def upload_destination(document_type, filename, prefix):
+    """Absolute path for a new upload plus the filepath stored on Document (relative to static/)"""
+    folder = os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'], document_type)
+    destination = os.path.join(folder, f'{prefix}_{filename}')
+    return destination, os.path.relpath(destination, current_app.static_folder).replace(os.sep, '/')
+
+def create_uploaded_document(title, filename, filepath, document_type, description=None):
+    """Record a finished upload as a Document"""
+    full_path = os.path.join(current_app.static_folder, filepath)
+    document = Document(
+        title=title or filename,
+        filename=filename,
+        filepath=filepath,
+        document_type=document_type,
+        file_size=os.path.getsize(full_path),
+        mime_type=mimetypes.guess_type(filename)[0],
+        description=description,
+        created_by='Crew Portal'
+    )
+    tag_document(document)
+    db.session.add(document)
+    db.session.flush()
+    
+    # Committed together with the document, so no upload is left without its thumbnail and page images
+    if has_preview(filename):
+        job_queue.enqueue('thumbnail', {'document_id': document.id}, dedupe_key=f'thumbnail:{document.id}')
+    if filename.lower().endswith('.pdf'):
+        job_queue.enqueue('render_pages', {'document_id': document.id}, priority='low',
+                          dedupe_key=f'render_pages:{document.id}')
+    if document_type in ('script', 'sides'):
+        notify_crew(f"New {document_type}: {document.title}")
+    db.session.commit()
+    return document
+
+@bp.app_errorhandler(UploadError)
+def upload_error(error):
+    return jsonify({'success': False, 'error': error.message}), error.status
+
+@bp.route('/upload', methods=['POST'])
+def upload_document():
+    """Single-request upload for files below MAX_CONTENT_LENGTH"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'success': False, 'error': 'Crew login required'}), 401
+    
+    file = request.files.get('file')
+    filename = secure_filename(file.filename) if file else ''
+    document_type = request.form.get('type', 'document')
+    if not filename or not allowed_file(filename):
+        raise UploadError('File type not allowed')
+    if document_type not in DOCUMENT_TYPES:
+        raise UploadError('Unknown document type')
+    
+    destination, filepath = upload_destination(document_type, filename, os.urandom(4).hex())
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    file.save(destination)
+    document = create_uploaded_document(request.form.get('title'), filename, filepath,
+                                        document_type, request.form.get('description'))
+    return jsonify({'success': True, 'document_id': document.id})
+
+@bp.route('/api/uploads', methods=['POST'])
+def api_upload_create():
+    """Start a chunked, resumable upload session"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'success': False, 'error': 'Crew login required'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+    document_type = data.get('type', 'document')
+    if not filename or not allowed_file(filename):
+        raise UploadError('File type not allowed')
+    if document_type not in DOCUMENT_TYPES:
+        raise UploadError('Unknown document type')
+    if not isinstance(size, int) or not 0 < size <= current_app.config['MAX_UPLOAD_SIZE']:
+        raise UploadError('Invalid file size', 413 if isinstance(size, int) and size > 0 else 400)
+    
+    upload = ChunkedUpload.create(
+        upload_session_root(), filename, size, current_app.config['UPLOAD_CHUNK_SIZE'],
+        title=data.get('title'), document_type=document_type, description=data.get('description')
+    )
+    return jsonify(upload.status()), 201
+
+@bp.route('/api/uploads/<upload_id>', methods=['GET', 'DELETE'])
+def api_upload_status(upload_id):
+    """Chunks received so far (to resume), or DELETE to abandon the upload"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'success': False, 'error': 'Crew login required'}), 401
+    
+    upload = ChunkedUpload.load(upload_session_root(), upload_id)
+    if request.method == 'DELETE':
+        upload.discard()
+        return jsonify({'success': True})
+    return jsonify(upload.status())
+
+@bp.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def api_upload_chunk(upload_id, index):
+    """Receive one chunk; the body is streamed to disk, never held in memory"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'success': False, 'error': 'Crew login required'}), 401
+    
+    upload = ChunkedUpload.load(upload_session_root(), upload_id)
+    upload.write_chunk(index, request.stream, request.headers.get('X-Chunk-SHA256'))
+    return jsonify({'success': True, 'index': index})
+
+@bp.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def api_upload_complete(upload_id):
+    """Assemble a fully received upload and create its Document"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'success': False, 'error': 'Crew login required'}), 401
+    
+    upload = ChunkedUpload.load(upload_session_root(), upload_id)
+    meta = upload.meta
+    destination, filepath = upload_destination(meta['document_type'], meta['filename'], upload_id[:8])
+    upload.assemble(destination)
+    document = create_uploaded_document(meta['title'], meta['filename'], filepath,
+                                        meta['document_type'], meta['description'])
+    return jsonify({'success': True, 'document_id': document.id}), 201
+
+SEARCH_RESULT_URLS = {
+    'scene': lambda ref_id: url_for('main.crew_scene_detail', scene_id=ref_id),
+    'call_sheet': lambda ref_id: url_for('main.crew_callsheet_detail', sheet_id=ref_id),
+    'contact': lambda ref_id: url_for('main.crew_contacts') + f'#contact-{ref_id}',
+    'document': lambda ref_id: url_for('main.view_document', doc_id=ref_id),
+}
+
+@bp.route('/api/search')
+def api_search():
+    """Ranked full-text search across scenes, call sheets, contacts and documents"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    kinds = request.args.getlist('kind')
+    
+    total, results = search(db.session.connection(), query, kinds,
+                            limit=per_page, offset=(page - 1) * per_page) if query else (0, [])
+    for result in results:
+        result['url'] = SEARCH_RESULT_URLS[result['kind']](result['id'])
+    
+    return jsonify({
+        'query': query,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'results': results
+    })
+
+@bp.route('/api/characters')
+def api_characters():
+    """Every character with scene count and first and last shoot day"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    return jsonify({'characters': [{
+        'id': row.id,
+        'name': row.name,
+        'scene_count': row.scene_count,
+        'first_day': row.first_day.isoformat() if row.first_day else None,
+        'last_day': row.last_day.isoformat() if row.last_day else None
+    } for row in character_days()]})
+
+@bp.route('/api/characters/<int:character_id>/scenes')
+def api_character_scenes(character_id):
+    """Scenes a character appears in, in scene order, with their shoot dates"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    character = Character.query.get_or_404(character_id)
+    scenes = scenes_with_character(character.id)
+    dates = [scene.date for scene in scenes if scene.date]
+    return jsonify({
+        'character': {'id': character.id, 'name': character.name},
+        'first_day': min(dates).isoformat() if dates else None,
+        'last_day': max(dates).isoformat() if dates else None,
+        'scenes': [{
+            'id': scene.id,
+            'scene_number': scene.scene_number,
+            'title': scene.title,
+            'status': scene.status,
+            'call_sheet_id': scene.call_sheet_id,
+            'date': scene.date.isoformat() if scene.date else None,
+            'url': url_for('main.crew_scene_detail', scene_id=scene.id)
+        } for scene in scenes]
+    })
+
+@bp.route('/api/callsheets/<int:sheet_id>/characters')
+def api_call_sheet_characters(sheet_id):
+    """Characters the scenes on a call sheet need"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    call_sheet = CallSheet.query.get_or_404(sheet_id)
+    return jsonify({
+        'call_sheet': {'id': call_sheet.id, 'title': call_sheet.title, 'date': call_sheet.date.isoformat()},
+        'characters': [{'id': row.id, 'name': row.name, 'scene_count': row.scene_count}
+                       for row in call_sheet_characters(call_sheet.id)]
+    })
+
+@bp.route('/api/schedule/plan', methods=['POST'])
+def api_schedule_plan():
+    """Stripboard of the unscheduled scenes; post a plan's days back to keep improving it"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    try:
+        options = plan_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(plan(scene_strips(), **options).to_dict())
+
+@bp.route('/api/schedule/drafts', methods=['POST'])
+def api_schedule_drafts():
+    """Write a plan (the posted days as they are, or a fresh one) as draft call sheets from start_date on"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        options = plan_request()
+        start = datetime.strptime(data['start_date'], '%Y-%m-%d').date() if data.get('start_date') else datetime.now().date()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if options['initial'] is not None and 'seconds' not in data:
+        options['time_limit'] = 0
+    
+    stripboard = plan(scene_strips(), **options)
+    call_sheets = write_draft_call_sheets(stripboard, start)
+    return jsonify({'summary': stripboard.summary(),
+                    'call_sheets': [call_sheet.to_dict() for call_sheet in call_sheets]}), 201
+
+@bp.route('/api/scenes/<int:scene_id>/shots', methods=['GET', 'POST'])
+def api_scene_shots(scene_id):
+    """Paginated shot list for a scene; POST a JSON array or CSV body to bulk-import"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    scene = Scene.query.get_or_404(scene_id)
+    
+    if request.method == 'POST':
+        fmt = 'csv' if request.mimetype == 'text/csv' else 'json'
+        try:
+            records = parse_shot_records(request.get_data(), fmt)
+            imported = import_shots(records, scene=scene, replace=request.args.get('replace') == '1')
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'imported': imported, 'shot_count': scene.shot_count}), 201
+    
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 50, type=int), 200)
+    shots = Shot.query.filter_by(scene_id=scene.id).order_by(Shot.shot_number).paginate(
+        page=page, per_page=per_page, error_out=False)
+    return jsonify({
+        'scene_id': scene.id,
+        'scene_number': scene.scene_number,
+        'page': shots.page,
+        'per_page': shots.per_page,
+        'pages': shots.pages,
+        'total': shots.total,
+        'shots': [shot.to_dict() for shot in shots.items]
+    })
 
 
 # Error handlers
-@app.route('/favicon.ico')
+@bp.route('/favicon.ico')
 def favicon():
-    return app.send_static_file('favicon/favicon.ico')
+    return current_app.send_static_file('favicon/favicon.ico')
 
-@app.route('/view/<int:doc_id>')
+@bp.route('/view/<int:doc_id>')
 def view_document(doc_id):
     """View document in PDF viewer"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
     document = Document.query.get_or_404(doc_id)
     return render_template('crew/document_viewer.html', document=document)
 
-@app.route('/download/<int:doc_id>')
+def document_file(document):
+    """Absolute path of a document's file, hashing it if it has never been hashed or its size changed"""
+    path = os.path.join(current_app.static_folder, document.filepath)
+    if not os.path.isfile(path):
+        abort(404)
+    
+    size = os.path.getsize(path)
+    if document.content_hash is None or document.file_size != size:
+        document.content_hash = file_sha256(path)
+        document.file_size = size
+        db.session.commit()
+    return path
+
+@bp.route('/download/<int:doc_id>')
 def download_document(doc_id):
-    """Download document file"""
+    """Download document file (?inline=1 to display it in the browser)"""
     if not session.get('crew_logged_in'):
-        return redirect(url_for('crew_login'))
+        return redirect(url_for('main.crew_login'))
     
     document = Document.query.get_or_404(doc_id)
-    return send_file(f'static/{document.filepath}', as_attachment=True, download_name=document.filename)
+    path = document_file(document)
+    return send_document_file(path, document.content_hash,
+                              mimetype=document.mime_type,
+                              download_name=document.filename,
+                              as_attachment=not request.args.get('inline'))
+
+def pdf_document_file(doc_id):
+    document = Document.query.get_or_404(doc_id)
+    if not document.filepath.lower().endswith('.pdf'):
+        abort(404)
+    return document, document_file(document)
+
+@bp.route('/api/documents/<int:doc_id>/pages')
+def api_document_pages(doc_id):
+    """Page count and sizes for the page-image viewer"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    document, path = pdf_document_file(doc_id)
+    try:
+        sizes = page_renders.page_sizes(path, document.content_hash)
+    except RenderUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    except RenderTimeout as e:
+        return jsonify({'error': str(e)}), 503
+    except UnreadablePDF:
+        # The viewer falls back to the original file
+        return jsonify({'error': 'Not a readable PDF'}), 422
+    
+    return jsonify({
+        'document_id': document.id,
+        'version': document.content_hash[:12],
+        'page_count': len(sizes),
+        'widths': RENDER_WIDTHS,
+        'pages': [{'number': i, 'width': w, 'height': h} for i, (w, h) in enumerate(sizes, start=1)]
+    })
 
-@app.errorhandler(404)
+@bp.route('/api/documents/<int:doc_id>/pages/<int:page>')
+def api_document_page(doc_id, page):
+    """One rendered PDF page (?width=480|960|1600&format=webp|png&v=<version>)"""
+    if not session.get('crew_logged_in'):
+        return jsonify({'error': 'Crew login required'}), 401
+    
+    document, path = pdf_document_file(doc_id)
+    width = snap_width(request.args.get('width', 960, type=int))
+    fmt = request.args.get('format')
+    if fmt not in RENDER_FORMATS:
+        fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'png'
+    
+    try:
+        if not 1 <= page <= len(page_renders.page_sizes(path, document.content_hash)):
+            abort(404)
+        image_path = page_renders.page(path, document.content_hash, page, width, fmt)
+    except RenderUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    except RenderTimeout as e:
+        return jsonify({'error': str(e)}), 503
+    except UnreadablePDF:
+        return jsonify({'error': 'Not a readable PDF'}), 422
+    
+    response = send_file(image_path, mimetype=RENDER_FORMATS[fmt],
+                         etag=f'{document.content_hash}-{page}-{width}.{fmt}')
+    response.cache_control.private = True
+    response.vary.add('Accept')
+    if request.args.get('v') == document.content_hash[:12]:
+        # Versioned URLs change whenever the file does, so they never need revalidating
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = 365 * 24 * 3600
+        response.cache_control.immutable = True
+    return response
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return render_template('errors/500.html'), 500
 
-# Initialize database
-def create_tables():
-    """Create database tables and initial data"""
-    with app.app_context():
-        db.create_all()
+# Sample data
+def seed_database():
+    """Load the September 21st call sheet, sample documents and shot lists, skipping any already there"""
+    # Create initial call sheet for September 21st
+    if not CallSheet.query.filter_by(date=datetime(2025, 9, 21).date()).first():
+        call_sheet = CallSheet(
+            title="Creatures in the Tall Grass - Equipment Test",
+            date=datetime(2025, 9, 21).date(),
+            location="Bole's Residency",
+            call_time="1:00 PM",
+            wrap_time="5:00 PM",
+            weather_contingency="Indoor/Outdoor options available",
+            cast_notes="Mac (Father), Dallas (Son) - Character chemistry tests",
+            crew_notes="Director, Camera Op, Script Supervisor",
+            special_notes="RED KOMODO vs BMPCC4K comparison",
+            scenes="Equipment tests and character chemistry"
+        )
+        db.session.add(call_sheet)
+        db.session.commit()
+
+    # Create real scripts and storyboards
+    if not Document.query.filter_by(document_type='script').first():
+        # Real Main Script
+        main_script = Document(
+            title="Creatures in the Tall Grass - Script",
+            filename="printed-4-25_[4-04-25][creatures-in-the-tallgrass]-B.pdf",
+            document_type='script',
+            filepath='documents/scripts/printed-4-25_[4-04-25][creatures-in-the-tallgrass]-B.pdf',
+            description='Complete feature script - A Father. A Son. A Marsh That Remembers Everything.',
+            created_by='Director'
+        )
+        db.session.add(main_script)
+
+        # Sides for September 21st
+        sides_921 = Document(
+            title="Sides - September 21st",
+            filename="sides_sept_21.pdf",
+            document_type='sides',
+            filepath='documents/sides/sides_sept_21.pdf',
+            description='Daily sides for equipment test day - Mac and Dallas scenes',
+            created_by='Script Supervisor'
+        )
+        db.session.add(sides_921)
+
+        # Real Storyboards
+        storyboard_dev = Document(
+            title="Storyboard - Development",
+            filename="Storyboard - Development.pdf",
+            document_type='document',
+            filepath='documents/storyboards/Storyboard - Development.pdf',
+            description='Complete visual storyboards for BARNACLE development and production planning',
+            created_by='Director'
+        )
+        db.session.add(storyboard_dev)
+
+        # Production Documents
+        production_bible = Document(
+            title="BARNACLE - Production Bible",
+            filename="barnacle_production_bible.pdf",
+            document_type='document',
+            filepath='documents/production/barnacle_production_bible.pdf',
+            description='Complete production guide with character backgrounds, locations, and technical specs',
+            created_by='Producer'
+        )
+        db.session.add(production_bible)
+
+        # Location Scouting
+        location_photos = Document(
+            title="Location Scouting Photos",
+            filename="location_scouting_photos.pdf",
+            document_type='photo',
+            filepath='documents/locations/location_scouting_photos.pdf',
+            description='Reference photos from Bole\'s Residency and surrounding marsh areas',
+            created_by='Location Manager'
+        )
+        db.session.add(location_photos)
+
+        # Character References
+        character_refs = Document(
+            title="Character Reference Guide",
+            filename="character_reference_guide.pdf",
+            document_type='document',
+            filepath='documents/characters/character_reference_guide.pdf',
+            description='Character descriptions, motivations, and relationship dynamics',
+            created_by='Director'
+        )
+        db.session.add(character_refs)
+
+        db.session.commit()
+
+    # Classify documents added before tagging existed
+    backfill_document_tags()
+
+    # Load the broken-down shot lists for scenes that exist
+    if not Shot.query.first():
+        with open(os.path.join(current_app.root_path, 'data', 'shot_lists.json'), encoding='utf-8') as f:
+            records = parse_shot_records(f.read())
+        known = {number for (number,) in db.session.query(Scene.scene_number)}
+        records = [record for record in records if record['scene_number'] in known]
+        if records:
+            import_shots(records)
+
+@bp.cli.command('seed')
+def seed_command():
+    """Load the sample call sheet, documents and shot lists (run db-upgrade first)"""
+    seed_database()
+    click.echo("✓ Sample data loaded")
+
+@bp.cli.command('generate-thumbnails')
+@click.option('--force', is_flag=True, help='Regenerate thumbnails that are already recorded')
+def generate_thumbnails_command(force):
+    """Backfill thumbnails and poster frames for existing documents"""
+    query = Document.query
+    if not force:
+        query = query.filter(Document.thumbnail_path.is_(None))
+    
+    documents = {}
+    for document in query:
+        path = os.path.join(current_app.static_folder, document.filepath)
+        if has_preview(document.filepath) and os.path.isfile(path):
+            documents[path] = document
+    
+    generated = failed = 0
+    for path, result, error in thumbnails.run_batch(documents):
+        document = documents[path]
+        if error is not None:
+            failed += 1
+            click.echo(f"❌ {document.title}: {error}")
+            continue
+        content_hash, thumb_path = result
+        document.content_hash = content_hash
+        document.file_size = os.path.getsize(path)
+        if thumb_path:
+            document.thumbnail_path = os.path.relpath(thumb_path, current_app.static_folder).replace(os.sep, '/')
+            generated += 1
+    db.session.commit()
+    click.echo(f"✓ Generated {generated} thumbnails ({failed} failed, {len(documents)} candidates)")
+
+@bp.cli.command('db-upgrade')
+@click.option('--target', type=int, help='Stop after this migration version')
+def db_upgrade_command(target):
+    """Apply pending schema migrations"""
+    applied = migrate(db.engine, target)
+    for version, description in applied:
+        click.echo(f"✓ {version}: {description}")
+    with db.engine.connect() as connection:
+        click.echo(f"✓ Schema at version {current_version(connection)} ({len(applied)} applied)")
+
+@bp.cli.command('db-version')
+def db_version_command():
+    """Show the applied and latest schema migration versions"""
+    with db.engine.connect() as connection:
+        click.echo(f"Schema at version {current_version(connection)} of {MIGRATIONS[-1][0]}")
+
+# Sample ids for route arguments when exercising every route
+QUERY_PLAN_SAMPLES = {'sheet_id': CallSheet, 'scene_id': Scene, 'doc_id': Document, 'post_id': BlogPost,
+                      'character_id': Character, 'announcement_id': Announcement}
+QUERY_PLAN_SKIP = {'static', 'main.api_stream', 'main.crew_logout', 'main.debug_logout', 'main.favicon'}
+
+def sample_route_urls(per_route=1, skip=QUERY_PLAN_SKIP, query_args=None):
+    """({rule: [url, ...]}, [rules without sample data]) for every GET route
+
+    Routes with arguments get up to per_route urls, with ids spread evenly
+    over each table. query_args maps endpoints to lists of query strings
+    (as dicts) to cycle through as well.
+    """
+    query_args = query_args or {}
+    samples = {}
+    for name, model in QUERY_PLAN_SAMPLES.items():
+        ids = db.session.scalars(db.select(model.id).order_by(model.id)).all()
+        samples[name] = ids[::max(1, len(ids) // per_route)][:per_route]
+    samples['page'] = [1]
+    
+    urls, skipped = {}, []
+    for rule in current_app.url_map.iter_rules():
+        if 'GET' not in rule.methods or rule.endpoint in skip:
+            continue
+        if any(not samples.get(argument) for argument in rule.arguments):
+            skipped.append(rule.rule)
+            continue
+        queries = query_args.get(rule.endpoint, [{}])
+        count = max([len(queries)] + [len(samples[argument]) for argument in rule.arguments])
+        with current_app.test_request_context():
+            urls[rule.rule] = [url_for(rule.endpoint, **queries[i % len(queries)],
+                                       **{argument: samples[argument][i % len(samples[argument])]
+                                          for argument in rule.arguments})
+                               for i in range(count)]
+    return urls, skipped
+
+def route_query_plans():
+    """Run every GET route once and EXPLAIN what it queried; returns ({statement: [tables scanned]}, skipped rules)"""
+    urls, skipped = sample_route_urls()
+    client = current_app.test_client()
+    with client.session_transaction() as crew_session:
+        crew_session['crew_logged_in'] = True
+        crew_session['debug_logged_in'] = True
+    
+    with capture_selects(db.engine) as statements:
+        for route_urls in urls.values():
+            client.get(route_urls[0])
+    
+    with db.engine.connect() as connection:
+        return {statement: full_scans(connection, statement, parameters)
+                for statement, parameters in statements.items()}, skipped
+
+@bp.cli.command('check-query-plans')
+def check_query_plans_command():
+    """EXPLAIN every query the GET routes run and fail on full table scans"""
+    plans, skipped = route_query_plans()
+    for rule in skipped:
+        click.echo(f"- Skipped {rule} (no sample data)")
+    failures = {statement: tables for statement, tables in plans.items() if tables}
+    for statement, tables in failures.items():
+        click.echo(f"❌ Full scan of {', '.join(tables)}:\n    {' '.join(statement.split())}")
+    click.echo(f"✓ {len(plans) - len(failures)} of {len(plans)} queries use indexes")
+    if failures:
+        raise SystemExit(1)
+
+@bp.cli.command('tag-documents')
+@click.option('--retag', is_flag=True, help='Reclassify documents that already have tags')
+def tag_documents_command(retag):
+    """Classify documents into tags (untagged ones only by default)"""
+    tagged = backfill_document_tags(retag=retag)
+    click.echo(f"✓ Tagged {tagged} document(s)")
+
+@bp.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Re-read every scene, call sheet, contact and document into the search index"""
+    with db.engine.begin() as connection:
+        if not install_search_index(connection):
+            rebuild_search_index(connection)
+    click.echo("✓ Search index rebuilt")
+
+@bp.cli.command('plan-schedule')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='First shoot date (default today)')
+@click.option('--seconds', type=float, help='Search time budget')
+@click.option('--write', is_flag=True, help='Replace the draft call sheets with the plan')
+def plan_schedule_command(start, seconds, write):
+    """Plan unscheduled scenes into shoot days on a stripboard"""
+    stripboard = plan(scene_strips(), current_app.config['SCHEDULE_DAY_HOURS'],
+                      time_limit=seconds if seconds is not None else current_app.config['SCHEDULE_SEARCH_SECONDS'])
+    for day in stripboard.days:
+        click.echo(f"Day {day.number}: {day.hours:g}h {'night' if day.night else 'day'} "
+                   f"{' / '.join(day.locations)} - Sc. {', '.join(strip.label for strip in day.strips)}")
+    summary = stripboard.summary()
+    click.echo(f"✓ {summary['days']} days, {summary['company_moves']} company moves, "
+               f"{summary['cast_days']} cast days ({stripboard.iterations} moves tried)")
+    if write:
+        call_sheets = write_draft_call_sheets(stripboard, (start or datetime.now()).date())
+        click.echo(f"✓ Wrote {len(call_sheets)} draft call sheets")
+
+@bp.cli.command('export-call-sheets')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='First date (default today)')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), help='Last date (default a week after start)')
+@click.option('--output', type=click.Path(dir_okay=False), help='Copy the combined PDF here')
+def export_call_sheets_command(start, end, output):
+    """Typeset the call sheets in a date range, reusing every unchanged one"""
+    import shutil
+    import time
+    
+    start = (start or datetime.now()).date()
+    end = end.date() if end else start + timedelta(days=6)
+    call_sheets = call_sheets_between(start, end)
+    if not call_sheets:
+        click.echo("No call sheets in that range")
+        return
+    
+    began = time.perf_counter()
+    with current_app.test_request_context():
+        htmls = call_sheet_pdf_html(call_sheets)
+    cached = len(htmls) - call_sheet_pdfs.missing(htmls)
+    path = call_sheet_pdfs.combine(call_sheet_pdfs.render_many(htmls))
+    click.echo(f"✓ {len(call_sheets)} call sheets ({len(call_sheets) - cached} typeset, {cached} cached) "
+               f"in {time.perf_counter() - began:.2f}s")
+    if output:
+        shutil.copyfile(path, output)
+        click.echo(f"✓ Wrote {output}")
+
+@bp.cli.command('run-jobs')
+@click.option('--concurrency', type=int, help='Jobs run at once [default: JOB_CONCURRENCY]')
+@click.option('--kind', 'kinds', multiple=True, type=click.Choice(sorted(JOB_HANDLERS)),
+              help='Only run jobs of this kind (repeatable)')
+@click.option('--burst', is_flag=True, help='Exit once no job is due instead of waiting for more')
+def run_jobs_command(concurrency, kinds, burst):
+    """Run background jobs until stopped; SIGTERM lets the running jobs finish first"""
+    import signal
+    
+    worker = JobWorker(current_app._get_current_object(), job_queue._get_current_object(),
+                       concurrency or current_app.config['JOB_CONCURRENCY'], kinds,
+                       current_app.config['JOB_POLL_SECONDS'])
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    click.echo(f"✓ Worker {worker.worker_id} running {worker.concurrency} jobs at a time"
+               f"{' (' + ', '.join(kinds) + ')' if kinds else ''}")
+    counts = worker.run(burst)
+    click.echo(f"✓ {counts['done']} done, {counts['retried']} to retry, {counts['failed']} failed")
+
+@bp.cli.command('smtp-sink')
+@click.option('--port', type=int, help='Port to listen on [default: MAIL_PORT]')
+@click.option('--refuse', multiple=True, help='Reject this recipient address (repeatable)')
+def smtp_sink_command(port, refuse):
+    """Run a local SMTP stand-in that prints every message instead of delivering it"""
+    def show(sender, recipients, message):
+        click.echo(f"{datetime.now():%H:%M:%S} {sender} -> {len(recipients)} recipient"
+                   f"{'s' if len(recipients) != 1 else ''}: {message['Subject'] or message.get_payload().strip()}")
+    
+    server = LocalSMTPServer(port=port or current_app.config['MAIL_PORT'], refuse=refuse, on_message=show)
+    click.echo(f"✓ SMTP stand-in on 127.0.0.1:{server.port}; Ctrl+C stops it")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+@bp.cli.command('bench-notifications')
+@click.option('--recipients', default=80, show_default=True, help='Addresses to notify')
+@click.option('--delay', default=0.02, show_default=True,
+              help="Seconds the stand-in server takes per SMTP command, as a provider's round trip would")
+def bench_notifications_command(recipients, delay):
+    """Time one announcement to many addresses: a message per address in turn, then pooled batches"""
+    import time
+    
+    config = current_app.config
+    addresses = [f'crew{n}@example.com' for n in range(recipients)]
+    message = compose(config['MAIL_SENDER'], 'Call time moved to 6:00 AM', 'Tomorrow: call 6:00 AM at basecamp.')
+    server = LocalSMTPServer(delay=delay).start()
+    try:
+        started = time.perf_counter()
+        serial = SMTPPool('127.0.0.1', server.port, size=1)
+        for address in addresses:
+            serial.send(message, [address])
+        serial.close()
+        serial_seconds = time.perf_counter() - started
         
-        # Create initial call sheet for September 21st
-        if not CallSheet.query.filter_by(date=datetime(2025, 9, 21).date()).first():
-            call_sheet = CallSheet(
-                title="Creatures in the Tall Grass - Equipment Test",
-                date=datetime(2025, 9, 21).date(),
-                location="Bole's Residency",
-                call_time="1:00 PM",
-                wrap_time="5:00 PM",
-                weather_contingency="Indoor/Outdoor options available",
-                cast_notes="Mac (Father), Dallas (Son) - Character chemistry tests",
-                crew_notes="Director, Camera Op, Script Supervisor",
-                special_notes="RED KOMODO vs BMPCC4K comparison",
-                scenes="Equipment tests and character chemistry"
-            )
-            db.session.add(call_sheet)
-            db.session.commit()
-
-        # Create real scripts and storyboards
-        if not Document.query.filter_by(document_type='script').first():
-            # Real Main Script
-            main_script = Document(
-                title="Creatures in the Tall Grass - Script",
-                filename="printed-4-25_[4-04-25][creatures-in-the-tallgrass]-B.pdf",
-                document_type='script',
-                filepath='documents/scripts/printed-4-25_[4-04-25][creatures-in-the-tallgrass]-B.pdf',
-                description='Complete feature script - A Father. A Son. A Marsh That Remembers Everything.',
-                created_by='Director'
-            )
-            db.session.add(main_script)
-
-            # Sides for September 21st
-            sides_921 = Document(
-                title="Sides - September 21st",
-                filename="sides_sept_21.pdf",
-                document_type='sides',
-                filepath='documents/sides/sides_sept_21.pdf',
-                description='Daily sides for equipment test day - Mac and Dallas scenes',
-                created_by='Script Supervisor'
-            )
-            db.session.add(sides_921)
-
-            # Real Storyboards
-            storyboard_dev = Document(
-                title="Storyboard - Development",
-                filename="Storyboard - Development.pdf",
-                document_type='document',
-                filepath='documents/storyboards/Storyboard - Development.pdf',
-                description='Complete visual storyboards for BARNACLE development and production planning',
-                created_by='Director'
-            )
-            db.session.add(storyboard_dev)
-
-            # Production Documents
-            production_bible = Document(
-                title="BARNACLE - Production Bible",
-                filename="barnacle_production_bible.pdf",
-                document_type='document',
-                filepath='documents/production/barnacle_production_bible.pdf',
-                description='Complete production guide with character backgrounds, locations, and technical specs',
-                created_by='Producer'
-            )
-            db.session.add(production_bible)
-
-            # Location Scouting
-            location_photos = Document(
-                title="Location Scouting Photos",
-                filename="location_scouting_photos.pdf",
-                document_type='photo',
-                filepath='documents/locations/location_scouting_photos.pdf',
-                description='Reference photos from Bole\'s Residency and surrounding marsh areas',
-                created_by='Location Manager'
-            )
-            db.session.add(location_photos)
-
-            # Character References
-            character_refs = Document(
-                title="Character Reference Guide",
-                filename="character_reference_guide.pdf",
-                document_type='document',
-                filepath='documents/characters/character_reference_guide.pdf',
-                description='Character descriptions, motivations, and relationship dynamics',
-                created_by='Director'
-            )
-            db.session.add(character_refs)
-
-            db.session.commit()
+        started = time.perf_counter()
+        pool = SMTPPool('127.0.0.1', server.port, size=config['NOTIFY_SMTP_CONNECTIONS'])
+        sent = sum(len(batch) - len(refused)
+                   for _, batch, refused, error in fan_out(pool, [('email', message, addresses)],
+                                                           config['NOTIFY_BATCH_SIZE'])
+                   if error is None)
+        pool.close()
+        batched_seconds = time.perf_counter() - started
+    finally:
+        server.stop()
+    click.echo(f"One at a time: {recipients} messages in {serial_seconds:.2f}s")
+    click.echo(f"Batched over {config['NOTIFY_SMTP_CONNECTIONS']} connections "
+               f"({config['NOTIFY_BATCH_SIZE']} per message): {sent} recipients in {batched_seconds:.2f}s")
 
-def find_available_port(start_port=5000, max_attempts=10):
-    """Find an available port starting from start_port"""
-    import socket
+@bp.cli.command('bench-startup')
+@click.option('--runs', default=5, show_default=True, help='Cold starts to take the median of')
+@click.option('--path', default='/', show_default=True, help='URL of the first request')
+@click.option('--record', type=click.Path(dir_okay=False), help='Append the result to this JSON lines file')
+def bench_startup_command(runs, path, record):
+    """Time importing app, create_app() and the first request of a fresh worker"""
+    result = measure_startup(current_app.root_path, path, runs)
+    click.echo(f"Import {result['import_ms']:.0f}ms, create_app {result['create_app_ms']:.0f}ms, "
+               f"first request {result['first_request_ms']:.0f}ms (then {result['second_request_ms']:.1f}ms), "
+               f"HTTP {result['status']}")
+    if record:
+        with open(record, 'a') as f:
+            f.write(json.dumps({'recorded_at': datetime.utcnow().isoformat(), 'path': path, 'runs': runs,
+                                **result}) + '\n')
+        click.echo(f"✓ Recorded in {record}")
+
+@bp.cli.command('build-assets')
+@click.option('--clean', is_flag=True, help='Delete built files the manifest no longer names')
+def build_assets_command(clean):
+    """Minify, fingerprint and pre-compress static/css and static/js (startup builds whatever changed too)"""
+    assets = StaticAssets(current_app.static_folder, current_app.config['ASSET_FOLDER'],
+                          current_app.config['ASSET_MAX_AGE'])
+    built = assets.build()
+    click.echo(f"✓ Built {built} assets ({len(assets.assets) - built} already current) in "
+               f"{os.path.join(current_app.static_folder, current_app.config['ASSET_FOLDER'])}")
+    if clean:
+        click.echo(f"✓ Removed {assets.clean()} old built files")
+
+@bp.cli.command('bench-compression')
+@click.option('--gzip-levels', default='1,4,6,9', show_default=True, help='Comma-separated gzip levels to try')
+@click.option('--brotli-qualities', default='1,4,5,9', show_default=True, help='Comma-separated brotli qualities to try')
+@click.option('--iterations', default=3, show_default=True, help='Compressions of each page per setting')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write per-route results here as JSON')
+def bench_compression_command(gzip_levels, brotli_qualities, iterations, output):
+    """CPU per request against bytes saved for each compression setting, over every compressible GET route"""
+    urls, _ = sample_route_urls(1, QUERY_PLAN_SKIP | {'main.debug_console', 'main.debug_profiles'})
+    client = current_app.test_client()
+    with client.session_transaction() as crew_session:
+        crew_session['crew_logged_in'] = True
     
-    for port in range(start_port, start_port + max_attempts):
+    # Bodies as the routes produce them, chunk by chunk for streamed pages
+    pages = {}
+    for rule, route_urls in urls.items():
+        response = client.get(route_urls[0], headers={'Accept-Encoding': 'identity'}, buffered=False)
+        chunks = list(response.iter_encoded())
+        response.close()
+        if response.status_code == 200 and response.mimetype in COMPRESSIBLE_TYPES:
+            pages[rule] = chunks
+    
+    settings = [('gzip', int(level)) for level in gzip_levels.split(',')]
+    if 'br' in available_encodings():
+        settings += [('br', int(quality)) for quality in brotli_qualities.split(',')]
+    flush_bytes = current_app.config['COMPRESS_FLUSH_BYTES']
+    raw_total = sum(len(chunk) for chunks in pages.values() for chunk in chunks)
+    results = {}
+    click.echo(f"{len(pages)} pages, {raw_total / 1024:.0f} KB uncompressed, "
+               f"{raw_total / 1024 / max(len(pages), 1):.1f} KB per request")
+    for encoding, level in settings:
+        per_route = {rule: measure_compression(chunks, encoding, level, flush_bytes, iterations)
+                     for rule, chunks in pages.items()}
+        size = sum(size for size, _ in per_route.values())
+        cpu_ms = sum(ms for _, ms in per_route.values())
+        results[f'{encoding}-{level}'] = {
+            'bytes': size, 'saved': round(1 - size / raw_total, 4) if raw_total else 0,
+            'cpu_ms_per_request': round(cpu_ms / max(len(pages), 1), 3),
+            'routes': {rule: {'bytes': size, 'cpu_ms': round(ms, 3)} for rule, (size, ms) in per_route.items()},
+        }
+        click.echo(f"{encoding:>5} {level:>2}: {size / 1024:7.0f} KB ({1 - size / raw_total:.1%} saved), "
+                   f"{cpu_ms / max(len(pages), 1):.3f} ms CPU per request, "
+                   f"{(raw_total - size) / 1024 / max(cpu_ms, 0.001):.0f} KB saved per CPU ms")
+    if output:
+        with open(output, 'w') as f:
+            f.write(dump_report({'raw_bytes': raw_total, 'flush_bytes': flush_bytes, 'settings': results}))
+        click.echo(f"✓ Wrote {output}")
+
+@bp.cli.command('generate-production')
+@click.option('--seed', default=1, show_default=True, help='Random seed; the same seed and start give the same rows')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), help='First shoot week (default eight weeks ago)')
+@click.option('--scale', default=1.0, show_default=True, help='Multiplier for every count, e.g. 0.1 for a quick run')
+@click.option('--yes', is_flag=True, help='Do not ask before writing')
+def generate_production_command(seed, start, scale, yes):
+    """Bulk-load a synthetic feature-sized production (run db-upgrade first, ideally with FLASK_CONFIG=benchmark)"""
+    counts = ', '.join(f"{round(n * scale)} {name.replace('_', ' ')}" for name, n in DEFAULT_COUNTS.items())
+    if not yes:
+        click.confirm(f"Add {counts} to {db.engine.url.render_as_string(hide_password=True)}?", abort=True)
+    models = {model.__tablename__: model for model in (CallSheet, Character, Scene, SceneCharacter, Shot, Document,
+                                                       DocumentTag, Contact, Announcement, BlogPost)}
+    written = generate_production(db.session, models, seed=seed, start=start.date() if start else None, scale=scale)
+    click.echo("✓ Wrote " + ", ".join(f"{n} {table}" for table, n in written.items()))
+
+@bp.cli.command('benchmark')
+@click.option('--mode', type=click.Choice(['client', 'http']), default='client', show_default=True,
+              help='Test client in this process, or HTTP against a local gunicorn')
+@click.option('--iterations', default=20, show_default=True, help='Timed requests per route')
+@click.option('--warmup', default=2, show_default=True, help='Untimed requests per route (per worker over HTTP)')
+@click.option('--samples', default=5, show_default=True, help='Different ids cycled through on routes with arguments')
+@click.option('--workers', default=2, show_default=True, help='Gunicorn workers (http mode)')
+@click.option('--concurrency', default=8, show_default=True, help='Concurrent connections (http mode)')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the JSON report here instead of stdout')
+def benchmark_command(mode, iterations, warmup, samples, workers, concurrency, output):
+    """Time every GET route, logged in as crew: latency percentiles, queries per request and peak memory"""
+    weeks = db.session.scalars(db.select(CallSheet.date).order_by(CallSheet.date)).all()[::7][:samples]
+    query_args = {'main.api_search': [{'q': q} for q in ('marsh', 'storm boat', 'location', 'Mac', 'dawn')[:samples]],
+                  'main.crew_callsheets_pdf': [{'start': week.isoformat()} for week in weeks]}
+    urls, skipped = sample_route_urls(samples, QUERY_PLAN_SKIP | {'main.debug_console', 'main.debug_profiles'},
+                                      query_args)
+    dataset = {model.__tablename__: db.session.scalar(db.select(db.func.count()).select_from(model))
+               for model in (CallSheet, Scene, Shot, Character, Document, DocumentTag, Contact, Announcement,
+                             BlogPost)}
+    db.session.remove()
+    login = {'crew_logged_in': True}
+    
+    if mode == 'client':
+        samples_by_route, peak_rss_kb = run_client(current_app, db.engine, urls, iterations, warmup, login)
+        elapsed = None
+    else:
+        cookie = current_app.session_interface.get_signing_serializer(current_app).dumps(login)
+        headers = {'Cookie': f"{current_app.config['SESSION_COOKIE_NAME']}={cookie}"}
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.bind(('0.0.0.0', port))
-                return port
-        except OSError:
+            samples_by_route, peak_rss_kb, elapsed = run_http(current_app.root_path, urls, iterations, warmup,
+                                                              workers, concurrency, headers)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+    
+    meta = {
+        'mode': mode, 'iterations': iterations, 'warmup': warmup, 'samples': samples,
+        'workers': workers if mode == 'http' else None, 'concurrency': concurrency if mode == 'http' else None,
+        'commit': git_commit(current_app.root_path), 'python': sys.version.split()[0],
+        'database': db.engine.dialect.name, 'dataset': dataset, 'skipped_routes': sorted(skipped),
+    }
+    result = benchmark_report(samples_by_route, meta, peak_rss_kb, elapsed)
+    if output:
+        with open(output, 'w') as f:
+            f.write(dump_report(result))
+        summary = result['summary']
+        click.echo(f"✓ {summary['requests']} requests over {len(urls)} routes: p50 {summary['p50_ms']}ms, "
+                   f"p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms, "
+                   f"{summary['queries_per_request']} queries per request, peak RSS {summary['peak_rss_kb']} KB, "
+                   f"{summary['errors']} errors. Wrote {output}")
+    else:
+        click.echo(dump_report(result), nl=False)
+
+@bp.cli.command('benchmark-compare')
+@click.argument('old', type=click.File())
+@click.argument('new', type=click.File())
+@click.option('--threshold', default=20.0, show_default=True, help='Percent slower p50/p95 that counts as a regression')
+def benchmark_compare_command(old, new, threshold):
+    """Compare two benchmark reports; fails if a route got slower or runs more queries"""
+    old, new = json.load(old), json.load(new)
+    for setting in ('mode', 'workers', 'concurrency', 'database', 'dataset'):
+        if old['meta'].get(setting) != new['meta'].get(setting):
+            click.echo(f"- {setting} differs: {old['meta'].get(setting)} before, {new['meta'].get(setting)} after")
+    rows = compare_reports(old, new, threshold)
+    regressions = 0
+    for route, metric, before, after, change, regressed in rows:
+        if change is None:
+            click.echo(f"- {route}: {before} before, {after} after")
             continue
-    return None
+        regressions += regressed
+        click.echo(f"{'❌' if regressed else ' '} {route} {metric}: {before} -> {after} ({change:+.0f}%)")
+    click.echo(f"✓ {len({row[0] for row in rows})} routes compared, {regressions} regressions")
+    if regressions:
+        raise SystemExit(1)
+
+@bp.cli.command('import-shots')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--replace', is_flag=True, help='Drop existing shots of the imported scenes first')
+def import_shots_command(path, replace):
+    """Bulk-import a JSON or CSV shot list (rows keyed by scene_number)"""
+    fmt = 'csv' if path.lower().endswith('.csv') else 'json'
+    with open(path, 'rb') as f:
+        records = parse_shot_records(f.read(), fmt)
+    count = import_shots(records, replace=replace)
+    click.echo(f"✓ Imported {count} shots")
 
-if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        # Create initial call sheet for September 21st
-        create_tables()
-    
 # Debug Console Routes
-@app.route('/debug', methods=['GET', 'POST'])
+@bp.route('/debug', methods=['GET', 'POST'])
 def debug_console():
     """Debug console with password protection"""
     if request.method == 'POST':
         password = request.form.get('password')
-        if password == app.config['CREW_PASSWORD']:
+        if password == current_app.config['CREW_PASSWORD']:
             session['debug_logged_in'] = True
-            return redirect(url_for('debug_console'))
+            return redirect(url_for('main.debug_console'))
         else:
             flash('Invalid password. Access denied.', 'error')
     
@@ -566,20 +2139,181 @@ def debug_console():
     call_sheets = CallSheet.query.count()
     contacts = Contact.query.count()
     documents = Document.query.count()
+    profiler = current_app.extensions.get('request_profiler')
     
     return render_template('debug/console.html', 
                          scenes=scenes, 
                          call_sheets=call_sheets, 
                          contacts=contacts, 
-                         documents=documents)
+                         documents=documents,
+                         now=datetime.now(),
+                         profiler=profiler,
+                         profiles=profiler.recent(50) if profiler else [],
+                         route_profiles=profiler.routes() if profiler else [],
+                         jobs=job_queue.stats(),
+                         worker_pid=os.getpid())
+
+@bp.route('/debug/profiles')
+def debug_profiles():
+    """This worker's request profiles as JSON, newest first (?limit=)"""
+    if not session.get('debug_logged_in'):
+        return jsonify({'error': 'Debug login required'}), 401
+    
+    profiler = current_app.extensions.get('request_profiler')
+    if profiler is None:
+        return jsonify({'error': 'Request profiling is off (set PROFILE_REQUESTS=1)'}), 404
+    return jsonify({
+        'worker_pid': os.getpid(),
+        'routes': profiler.routes(),
+        'requests': profiler.recent(request.args.get('limit', type=int))
+    })
+
+@bp.route('/debug/profiles/clear', methods=['POST'])
+def debug_profiles_clear():
+    """Empty this worker's profile buffer, e.g. before reproducing a slow page"""
+    if not session.get('debug_logged_in'):
+        return redirect(url_for('main.debug_console'))
+    
+    profiler = current_app.extensions.get('request_profiler')
+    if profiler is not None:
+        profiler.clear()
+        flash('Request profiles cleared.', 'info')
+    return redirect(url_for('main.debug_console'))
 
-@app.route('/debug/logout')
+@bp.route('/debug/jobs/<int:job_id>/retry', methods=['POST'])
+def debug_job_retry(job_id):
+    """Queue a failed job again with a fresh set of attempts"""
+    if not session.get('debug_logged_in'):
+        return redirect(url_for('main.debug_console'))
+    
+    if job_queue.retry(job_id):
+        flash(f'Job {job_id} queued again.', 'info')
+    return redirect(url_for('main.debug_console'))
+
+@bp.route('/debug/logout')
 def debug_logout():
     """Debug console logout"""
     session.pop('debug_logged_in', None)
     flash('Debug session ended.', 'info')
-    return redirect(url_for('debug_console'))
+    return redirect(url_for('main.debug_console'))
 
+def find_available_port(start_port=5000, max_attempts=10):
+    """Find an available port starting from start_port"""
+    import socket
+    
+    for port in range(start_port, start_port + max_attempts):
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.bind(('0.0.0.0', port))
+                return port
+        except OSError:
+            continue
+    return None
+
+# Application factory
+def create_app(config_name=None, **settings):
+    """Build the app: config (FLASK_CONFIG, default development) with any settings given over it, database,
+    services and every view on bp"""
+    app = Flask(__name__)
+    app.config.from_object(config[config_name or os.environ.get('FLASK_CONFIG', 'default')])
+    app.config.update(settings)
+    db.init_app(app)
+    app.register_blueprint(bp)
+    
+    app.extensions['page_renders'] = PageRenderCache(os.path.join(app.root_path, app.config['PAGE_CACHE_FOLDER']),
+                                                     app.config['PAGE_CACHE_MAX_BYTES'],
+                                                     app.config['PDF_RENDER_WORKERS'])
+    app.extensions['call_sheet_pdfs'] = CallSheetPDFs(os.path.join(app.root_path, app.config['CALL_SHEET_PDF_FOLDER']),
+                                                      app.config['CALL_SHEET_PDF_MAX_BYTES'],
+                                                      app.config['CALL_SHEET_PDF_WORKERS'])
+    app.extensions['thumbnails'] = ThumbnailGenerator(os.path.join(app.static_folder, 'thumbnails'),
+                                                      app.config['THUMBNAIL_SIZE'],
+                                                      app.config['THUMBNAIL_WORKERS'])
+    if app.config['ASSET_FINGERPRINTS']:
+        # Only sources changed since the last build (flask build-assets) are rebuilt
+        assets = StaticAssets(app.static_folder, app.config['ASSET_FOLDER'], app.config['ASSET_MAX_AGE'])
+        assets.build()
+        app.extensions['static_assets'] = assets
+        app.view_functions['static'] = partial(send_static, app)
+    if app.config['FRAGMENT_CACHE_BACKEND'] == 'disk':
+        fragment_backend = DiskBackend(os.path.join(app.root_path, app.config['FRAGMENT_CACHE_FOLDER']),
+                                       app.config['FRAGMENT_CACHE_MAX_BYTES'])
+    else:
+        fragment_backend = MemoryBackend(app.config['FRAGMENT_CACHE_MAX_BYTES'])
+    app.extensions['fragment_cache'] = FragmentCache(fragment_backend,
+                                                     lambda kinds: change_stamps(db.session, ChangeEvent, kinds))
+    app.extensions['change_feed'] = ChangeFeed(app, db, ChangeEvent, app.config['CHANGE_FEED_INTERVAL'])
+    app.extensions['stream_slots'] = StreamSlots(app.config['SSE_MAX_STREAMS'])
+    app.extensions['jobs'] = JobQueue(db, Job, JOB_HANDLERS, app.config['JOB_LEASE_SECONDS'],
+                                      app.config['JOB_RETRY_SECONDS'], app.config['JOB_MAX_RETRY_SECONDS'],
+                                      timedelta(days=app.config['JOB_RETENTION_DAYS']))
+    # Connections open on the first announcement, so only the job worker ever holds any
+    app.extensions['smtp_pool'] = SMTPPool(app.config['MAIL_SERVER'], app.config['MAIL_PORT'],
+                                           app.config['MAIL_USERNAME'], app.config['MAIL_PASSWORD'],
+                                           app.config['MAIL_USE_TLS'], app.config['NOTIFY_SMTP_CONNECTIONS'],
+                                           rate=app.config['NOTIFY_RATE'])
+    
+    if app.config['WEATHER_PROVIDER'] == 'open-meteo':
+        weather_provider = OpenMeteoProvider(app.config['WEATHER_DEFAULT_COORDINATES'], app.config['WEATHER_COORDINATES'])
+    else:
+        weather_provider = FakeWeatherProvider()
+    app.extensions['weather_service'] = WeatherService(
+        weather_provider,
+        ttl=app.config['WEATHER_TTL_SECONDS'],
+        max_stale=app.config['WEATHER_MAX_STALE_SECONDS'],
+        breaker=CircuitBreaker(app.config['WEATHER_FAILURE_THRESHOLD'], app.config['WEATHER_RETRY_SECONDS']),
+        upcoming_locations=partial(upcoming_shoot_locations, app),
+        logger=app.logger)
+    
+    if app.config['COMPRESS_RESPONSES']:
+        compressor = ResponseCompressor(app.config['COMPRESS_MIN_SIZE'], app.config['COMPRESS_GZIP_LEVEL'],
+                                        app.config['COMPRESS_BROTLI_QUALITY'], app.config['COMPRESS_FLUSH_BYTES'])
+        compressor.install(app)
+        app.extensions['compression'] = compressor
+    
+    if app.config['PROFILE_REQUESTS']:
+        profiler = RequestProfiler(app.config['PROFILE_BUFFER_SIZE'], app.config['PROFILE_SAMPLE_RATE'],
+                                   app.config['PROFILE_SLOW_STATEMENTS'], app.config['PROFILE_REPEAT_THRESHOLD'],
+                                   server_timing=app.config['PROFILE_SERVER_TIMING'])
+        with app.app_context():
+            profiler.install(app, db.engine)
+        app.extensions['request_profiler'] = profiler
+    
+    # A preloading server forks its workers from this process; each must open its own connections
+    forked_apps.add(app)
+    return app
+
+# Apps whose engines a forked child must not share; weak, so apps built by tests and commands can go away
+forked_apps = weakref.WeakSet()
+
+def dispose_engines(app):
+    """Forget pooled connections inherited from the parent process without closing them under it"""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+def dispose_forked_engines():
+    for app in list(forked_apps):
+        dispose_engines(app)
+
+# Registered once: fork hooks can never be removed
+os.register_at_fork(after_in_child=dispose_forked_engines)
+
+def warm_up(app):
+    """One-time work every worker would otherwise repeat on its first requests, done before forking"""
+    import forms  # noqa: F401 - lazily imported by crew_login
+    
+    sqlalchemy.orm.configure_mappers()
+    for name in app.jinja_env.list_templates(extensions=('html',)):
+        app.jinja_env.get_template(name)
+
+if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        # Migrate and create initial call sheet for September 21st
+        migrate(db.engine)
+        seed_database()
+    
     # Try to find an available port
     port = find_available_port(5000, 20)  # Try ports 5000-5019
     if port:
@@ -587,6 +2321,10 @@ def debug_logout():
         print(f"🌐 Access at: http://localhost:{port}")
         print(f"🔑 Crew Portal: http://localhost:{port}/crew/login")
         print(f"🐛 Debug Console: http://localhost:{port}/debug")
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            # Background jobs run in the reloaded server process, and restart with it
+            import threading
+            threading.Thread(target=JobWorker(app, app.extensions['jobs'], 1).run, name='job-worker', daemon=True).start()
         app.run(debug=True, host='0.0.0.0', port=port)
     else:
         print("❌ No available ports found. Please free up a port and try again.")
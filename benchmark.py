@@ -0,0 +1,301 @@
+"""
+Load tests for Barnacle Films Inc.
+
+Requests every GET route a number of times and reports per-route latency
+percentiles, SQL statements per request and peak memory. Two ways to
+drive it:
+
+- client: in this process through the Flask test client, one request at
+  a time; the statements are counted on the engine directly.
+- http: against a real gunicorn started from gunicorn.conf.py with the
+  given number of workers, from concurrent keep-alive connections; the
+  statement counts come from the request profiler's Server-Timing header
+  and memory is the high-water mark of the master and each worker.
+
+Reports are JSON with sorted keys and no timestamps, so runs on two
+commits can be diffed or compared with compare().
+"""
+
+import http.client
+import json
+import math
+import os
+import random
+import re
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+
+PERCENTILES = (50, 95, 99)
+_SERVER_TIMING_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples):
+    """Stats for a list of (status, milliseconds, statements) samples; statements may be None"""
+    times = sorted(ms for _, ms, _ in samples)
+    counted = [statements for _, _, statements in samples if statements is not None]
+    stats = {f'p{p}_ms': round(percentile(times, p), 2) for p in PERCENTILES}
+    stats.update({
+        'requests': len(samples),
+        'statuses': {str(status): n for status, n in sorted(Counter(status for status, _, _ in samples).items())},
+        'mean_ms': round(sum(times) / len(times), 2),
+        'max_ms': round(times[-1], 2),
+        'queries_per_request': round(sum(counted) / len(counted), 2) if counted else None,
+    })
+    return stats
+
+
+def report(samples_by_route, meta, peak_rss_kb, elapsed=None):
+    """The JSON-ready report: meta, per-route stats and the totals over every route"""
+    all_samples = [sample for samples in samples_by_route.values() for sample in samples]
+    summary = summarize(all_samples)
+    summary['errors'] = sum(1 for status, _, _ in all_samples if not 200 <= status < 400)
+    if isinstance(peak_rss_kb, dict):
+        summary['peak_rss_kb'] = sum(kb for kb in peak_rss_kb.values() if kb)
+    else:
+        summary['peak_rss_kb'] = peak_rss_kb
+    if elapsed:
+        summary['throughput_rps'] = round(len(all_samples) / elapsed, 1)
+    return {
+        'meta': dict(meta, peak_rss_kb=peak_rss_kb),
+        'summary': summary,
+        'routes': {route: summarize(samples) for route, samples in samples_by_route.items()},
+    }
+
+
+def dumps(result):
+    return json.dumps(result, indent=2, sort_keys=True) + '\n'
+
+
+def git_commit(root):
+    """HEAD's hash, with +dirty when the tree has uncommitted changes"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}+dirty' if dirty else commit
+
+
+def run_client(app, engine, urls, iterations=20, warmup=2, login=None):
+    """Time urls ({route: [url, ...]}) in this process; returns ({route: samples}, peak RSS in KB)
+
+    login is a dict copied into the client's session first. Only statements
+    run on this thread are counted, not those of background pollers.
+    """
+    client = app.test_client()
+    if login:
+        with client.session_transaction() as session:
+            session.update(login)
+
+    thread = threading.get_ident()
+    count = [0]
+
+    def count_statement(*args):
+        if threading.get_ident() == thread:
+            count[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    samples_by_route = {}
+    try:
+        for route, route_urls in urls.items():
+            for i in range(warmup):
+                client.get(route_urls[i % len(route_urls)]).close()
+            samples = samples_by_route[route] = []
+            for i in range(iterations):
+                before = count[0]
+                started = time.perf_counter()
+                response = client.get(route_urls[i % len(route_urls)])
+                response.get_data()
+                elapsed = (time.perf_counter() - started) * 1000
+                response.close()
+                samples.append((response.status_code, elapsed, count[0] - before))
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_statement)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return samples_by_route, peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_server(port, server, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            return False
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def _children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def _peak_rss_kb(pid):
+    """VmHWM of a process from /proc, or None where that is not available"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+class _Client(threading.Thread):
+    """One keep-alive connection working through the shared job list"""
+
+    def __init__(self, port, headers, jobs, lock, results):
+        super().__init__(daemon=True)
+        self.port = port
+        self.headers = headers
+        self.jobs = jobs
+        self.lock = lock
+        self.results = results
+        self.connection = None
+
+    def request(self, url):
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+            try:
+                started = time.perf_counter()
+                self.connection.request('GET', url, headers=self.headers)
+                response = self.connection.getresponse()
+                response.read()
+                elapsed = (time.perf_counter() - started) * 1000
+            except (http.client.HTTPException, OSError):
+                # The server may close an idle keep-alive connection; retry once on a new one
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    return 0, 0.0, None
+                continue
+            if response.getheader('Connection', '').lower() == 'close':
+                self.connection.close()
+                self.connection = None
+            match = _SERVER_TIMING_QUERIES.search(response.getheader('Server-Timing', ''))
+            return response.status, elapsed, int(match.group(1)) if match else None
+
+    def run(self):
+        while True:
+            with self.lock:
+                if not self.jobs:
+                    break
+                route, url, timed = self.jobs.pop()
+            sample = self.request(url)
+            if timed:
+                self.results.append((route, sample))
+        if self.connection is not None:
+            self.connection.close()
+
+
+def _drive(port, headers, jobs, concurrency):
+    lock = threading.Lock()
+    results = []
+    clients = [_Client(port, headers, jobs, lock, results) for _ in range(concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    return results
+
+
+def run_http(root, urls, iterations=20, warmup=2, workers=2, concurrency=8, headers=None, seed=0,
+             startup_timeout=60):
+    """Time urls against a gunicorn started from root's gunicorn.conf.py
+
+    Returns ({route: samples}, {process: peak RSS in KB}, seconds the timed
+    requests took). Each url is requested warmup times per worker before
+    timing starts; the timed requests are shuffled with seed so every
+    client sees a mix of routes.
+    """
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), PROFILE_REQUESTS='1',
+               PROFILE_SAMPLE_RATE='1', PROFILE_SERVER_TIMING='1', RUN_JOBS='0')
+    headers = dict(headers or {})
+    with tempfile.TemporaryFile() as log:
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                                  cwd=root, env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            if not _wait_for_server(port, server, startup_timeout):
+                log.seek(0)
+                lines = log.read().decode('utf-8', 'replace').strip().splitlines()
+                raise RuntimeError(f"gunicorn did not start: {lines[-1] if lines else 'no output'}")
+
+            warm = [(route, url, False) for route, route_urls in urls.items()
+                    for url in route_urls for _ in range(warmup * workers)]
+            _drive(port, headers, warm, concurrency)
+
+            timed = [(route, route_urls[i % len(route_urls)], True)
+                     for route, route_urls in urls.items() for i in range(iterations)]
+            random.Random(seed).shuffle(timed)
+            started = time.perf_counter()
+            results = _drive(port, headers, timed, concurrency)
+            elapsed = time.perf_counter() - started
+
+            peak = {'master': _peak_rss_kb(server.pid)}
+            for n, pid in enumerate(sorted(_children(server.pid)), 1):
+                peak[f'worker_{n}'] = _peak_rss_kb(pid)
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+    samples_by_route = {route: [] for route in urls}
+    for route, sample in results:
+        samples_by_route[route].append(sample)
+    return samples_by_route, peak, elapsed
+
+
+def compare(old, new, threshold=20.0):
+    """Rows of (route, metric, old, new, percent change, regressed) for two reports
+
+    A route regresses when its p50 or p95 is more than threshold percent
+    slower, or it runs more statements per request than before.
+    """
+    rows = []
+    for route in sorted(set(old['routes']) | set(new['routes'])):
+        before, after = old['routes'].get(route), new['routes'].get(route)
+        if before is None or after is None:
+            rows.append((route, 'route', 'missing' if before is None else 'present',
+                         'missing' if after is None else 'present', None, False))
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'queries_per_request'):
+            a, b = before.get(metric), after.get(metric)
+            if a is None or b is None:
+                continue
+            change = (b - a) / a * 100 if a else (0.0 if a == b else math.inf)
+            regressed = b > a if metric == 'queries_per_request' else change > threshold
+            rows.append((route, metric, a, b, change, regressed))
+    return rows
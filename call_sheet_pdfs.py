@@ -0,0 +1,118 @@
+"""
+Call sheet PDFs for Barnacle Films Inc.
+
+Sheets are laid out as HTML (crew/callsheet_pdf.html) and typeset with
+PyMuPDF on the page renderer's kind of process pool. Each PDF is stored
+under the SHA-256 of its HTML, which covers the sheet, its scenes, the
+contacts and the layout itself, so a sheet is only typeset again after
+one of those changes. Date ranges typeset their missing sheets in
+parallel and are merged into one PDF, cached under its sheets' hashes.
+"""
+
+import hashlib
+import io
+import os
+from concurrent.futures import wait
+
+from pdf_pages import PageRenderCache, RenderTimeout
+
+PAPER_SIZE = 'letter'
+MARGIN = 36  # points, half an inch
+
+
+def _typeset(html, out_path):
+    """Lay out one call sheet's HTML as a PDF at out_path (runs in a pool process)"""
+    import pymupdf
+
+    buffer = io.BytesIO()
+    story = pymupdf.Story(html=html)
+    writer = pymupdf.DocumentWriter(buffer)
+    mediabox = pymupdf.paper_rect(PAPER_SIZE)
+    where = mediabox + (MARGIN, MARGIN, -MARGIN, -MARGIN)
+    more = True
+    while more:
+        device = writer.begin_page(mediabox)
+        more, _ = story.place(where)
+        story.draw(device)
+        writer.end_page()
+    writer.close()
+
+    # Story embeds whole fonts; keeping only the glyphs used takes a sheet from ~90KB to ~25KB
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    with pymupdf.open(stream=buffer.getvalue(), filetype='pdf') as pdf:
+        pdf.subset_fonts()
+        pdf.save(tmp_path, garbage=3, deflate=True)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _merge(pdf_paths, out_path):
+    """Concatenate PDFs into out_path (runs in a pool process)"""
+    import pymupdf
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    with pymupdf.open() as merged:
+        for path in pdf_paths:
+            with pymupdf.open(path) as pdf:
+                merged.insert_pdf(pdf)
+        merged.save(tmp_path, garbage=3, deflate=True)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class CallSheetPDFs(PageRenderCache):
+    """Disk cache of typeset call sheets, keyed by the hash of their HTML"""
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], f'{digest}.pdf')
+
+    def path_for(self, html):
+        """Where the PDF of this HTML is (or will be) cached"""
+        return self._path(hashlib.sha256(html.encode('utf-8')).hexdigest())
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def missing(self, htmls):
+        """How many of these sheets have not been typeset yet"""
+        return sum(not os.path.exists(self.path_for(html)) for html in htmls)
+
+    def render(self, html, timeout=60):
+        """Path of the PDF for one sheet's HTML, typesetting it on a cache miss"""
+        return self.render_many([html], timeout)[0]
+
+    def render_many(self, htmls, timeout=120):
+        """Paths of the PDFs for several sheets, typesetting every cache miss at once"""
+        paths, futures = [], []
+        for html in htmls:
+            path = self.path_for(html)
+            if not self._touch(path):
+                futures.append(self._submit(path, _typeset, html, path))
+            paths.append(path)
+
+        if futures:
+            _, pending = wait(futures, timeout=timeout)
+            if pending:
+                raise RenderTimeout(f'{len(pending)} of {len(futures)} call sheets not typeset after {timeout}s')
+            for future in futures:
+                future.result()
+            self.maybe_evict()
+        return paths
+
+    def combine(self, pdf_paths, timeout=60):
+        """One PDF of pdf_paths in order; the member files' names are their content hashes"""
+        if len(pdf_paths) == 1:
+            return pdf_paths[0]
+        names = '\n'.join(os.path.basename(path) for path in pdf_paths)
+        out_path = self._path(hashlib.sha256(names.encode('utf-8')).hexdigest())
+        if not self._touch(out_path):
+            self._run(out_path, _merge, list(pdf_paths), out_path, timeout=timeout)
+            self.maybe_evict()
+        return out_path
@@ -0,0 +1,145 @@
+"""
+Response compression for Barnacle Films Inc.
+
+HTML and JSON responses are compressed with brotli or gzip, whichever of
+the two the client accepts (brotli first). Pages rendered with
+stream_template are compressed chunk by chunk as Jinja yields them and
+flushed every flush_bytes of input, so the browser starts on the <head>
+while the rest of the page renders. Buffered responses under min_size go
+out as they are; so do files (which the server sends with sendfile),
+already encoded responses and the event stream. A compressed
+response's ETag gets the encoding appended; routes answering
+If-None-Match themselves compare with matching_etag().
+
+Dynamic content is compressed on every request, so levels are chosen for
+CPU per byte saved, not the smallest output: see measure() and
+flask bench-compression.
+"""
+
+import importlib.util
+import time
+import zlib
+
+from flask import request
+
+ENCODINGS = ('br', 'gzip')  # every Content-Encoding produced here, preferred first
+COMPRESSIBLE = {'text/html', 'text/plain', 'text/css', 'text/csv', 'text/xml', 'text/javascript',
+                'application/json', 'application/javascript', 'application/xml', 'image/svg+xml'}
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, quality):
+        import brotli
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+def available_encodings():
+    """Content-Encodings that can be produced here, preferred first"""
+    return ENCODINGS if importlib.util.find_spec('brotli') else ('gzip',)
+
+
+def matching_etag(etag):
+    """The tag in If-None-Match naming etag in any encoding a response may have gone out in, or None.
+
+    A compressed response's ETag has the encoding appended (see
+    ResponseCompressor), so a 304 has to answer with the tag the client
+    holds, not the route's own.
+    """
+    for tag in (etag, *(f'{etag}-{encoding}' for encoding in ENCODINGS)):
+        if request.if_none_match.contains(tag):
+            return tag
+    return None
+
+
+def compress_chunks(chunks, encoding, level, flush_bytes):
+    """Compress an iterable of byte strings, flushing whenever flush_bytes have gone in since the last flush"""
+    compressor = _Brotli(level) if encoding == 'br' else _Gzip(level)
+    pending = 0
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_bytes:
+            out += compressor.flush()
+            pending = 0
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+def measure(chunks, encoding, level, flush_bytes, iterations=10):
+    """(compressed size, CPU milliseconds per compression) of chunks"""
+    started = time.process_time()
+    for _ in range(iterations):
+        size = sum(len(out) for out in compress_chunks(chunks, encoding, level, flush_bytes))
+    return size, (time.process_time() - started) * 1000 / iterations
+
+
+class ResponseCompressor:
+    """after_request hook compressing the responses worth compressing"""
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=4, flush_bytes=16 * 1024):
+        self.min_size = min_size
+        self.levels = {'gzip': gzip_level, 'br': brotli_quality}
+        self.flush_bytes = flush_bytes
+        self.encodings = available_encodings()
+
+    def install(self, app):
+        app.after_request(self.compress)
+
+    def compress(self, response):
+        if (request.method == 'HEAD' or response.status_code in (204, 206, 304) or response.status_code < 200
+                or response.direct_passthrough or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE or response.cache_control.no_transform):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = next((e for e in self.encodings if request.accept_encodings[e]), None)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            # The length is unknown until the page has rendered, so streamed pages are always compressed
+            response.response = self._stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(b''.join(compress_chunks([data], encoding, self.levels[encoding], len(data) + 1)))
+        response.content_encoding = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            # Each encoding is a representation of its own, so a strong validator must differ between them
+            response.set_etag(f'{etag}-{encoding}', weak)
+        return response
+
+    def _stream(self, source, encoding):
+        chunks = (chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in source)
+        try:
+            yield from compress_chunks(chunks, encoding, self.levels[encoding], self.flush_bytes)
+        finally:
+            # Closing the original iterable ends the streamed template's request context, even on a disconnect
+            if hasattr(source, 'close'):
+                source.close()
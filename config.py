@@ -12,6 +12,115 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov'}
     
+    # Chunked uploads - large files arrive in pieces below MAX_CONTENT_LENGTH
+    UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB per chunk
+    MAX_UPLOAD_SIZE = 50 * 1024 * 1024 * 1024  # 50GB per file
+    UPLOAD_SESSION_FOLDER = 'instance/upload_sessions'
+    
+    # Static asset pipeline: minified, content-hashed and pre-compressed copies of static/css and static/js,
+    # served as immutable; ASSET_FINGERPRINTS=0 serves the sources as they are while editing them
+    ASSET_FINGERPRINTS = os.environ.get('ASSET_FINGERPRINTS', '1') == '1'
+    ASSET_FOLDER = 'dist'
+    ASSET_MAX_AGE = 365 * 24 * 3600
+    
+    # HTML and JSON response compression (brotli, else gzip); streamed pages are compressed as they render
+    COMPRESS_RESPONSES = True
+    COMPRESS_MIN_SIZE = 1024  # buffered responses smaller than this go out as they are
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+    COMPRESS_FLUSH_BYTES = 16 * 1024  # input between flushes of a streamed page
+    
+    # Rendered PDF page images
+    PAGE_CACHE_FOLDER = 'instance/page_cache'
+    PAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512MB on disk
+    PDF_RENDER_WORKERS = 2
+    
+    # Call sheet PDFs, cached by the hash of their content; a range export typesets on all workers at once
+    CALL_SHEET_PDF_FOLDER = 'instance/call_sheet_pdfs'
+    CALL_SHEET_PDF_MAX_BYTES = 128 * 1024 * 1024
+    CALL_SHEET_PDF_WORKERS = 4
+    CALL_SHEET_PDF_MAX_DAYS = 62
+    
+    # Thumbnails and video poster frames (fit within this box, 2x the gallery card size)
+    THUMBNAIL_SIZE = (600, 400)
+    THUMBNAIL_WORKERS = 2
+    
+    # Background jobs: gunicorn.conf.py starts flask run-jobs next to the web workers (RUN_JOBS=0 to run it yourself)
+    JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', 2))  # jobs one run-jobs process runs at once
+    JOB_POLL_SECONDS = 1.0  # how often an idle worker looks for due jobs
+    JOB_LEASE_SECONDS = 600  # a job running this long is presumed lost with its worker and run again
+    JOB_RETRY_SECONDS = 30  # wait before the first retry, doubled for each one after
+    JOB_MAX_RETRY_SECONDS = 3600
+    JOB_RETENTION_DAYS = 7  # finished jobs stay on /debug this long
+    
+    # Crew notifications: announcements by email, and by SMS through an email-to-SMS gateway, over pooled SMTP;
+    # flask smtp-sink runs a local stand-in on the default localhost:1025
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'localhost')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 1025))
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS') == '1'
+    MAIL_SENDER = os.environ.get('MAIL_SENDER', 'Barnacle Films <crew@barnaclefilms.com>')
+    SMS_GATEWAY_DOMAIN = os.environ.get('SMS_GATEWAY_DOMAIN')  # texts go to <phone digits>@this; none without it
+    NOTIFY_SMS_PRIORITIES = ('high', 'urgent')  # lower priorities are only emailed
+    NOTIFY_SMTP_CONNECTIONS = 4  # per process, kept open between announcements
+    NOTIFY_BATCH_SIZE = 50  # envelope recipients per message
+    NOTIFY_RATE = 50  # recipients per second across the connections, under the provider's limit
+    NOTIFY_RECIPIENT_LIMIT = 10  # non-urgent announcements one address gets per window; the rest are skipped
+    NOTIFY_RECIPIENT_WINDOW = 3600
+    
+    # Weather: 'fake' (fixed conditions) or 'open-meteo' (needs WEATHER_LATITUDE/WEATHER_LONGITUDE)
+    WEATHER_PROVIDER = os.environ.get('WEATHER_PROVIDER', 'fake')
+    WEATHER_DEFAULT_LOCATION = "Bole's Residency"
+    WEATHER_DEFAULT_COORDINATES = (os.environ.get('WEATHER_LATITUDE'), os.environ.get('WEATHER_LONGITUDE'))
+    WEATHER_COORDINATES = {}  # location name -> (latitude, longitude) for shoots away from the default
+    WEATHER_TTL_SECONDS = 600
+    WEATHER_MAX_STALE_SECONDS = 6 * 3600  # how long the last good data is served while the provider is down
+    WEATHER_FAILURE_THRESHOLD = 3  # consecutive failures before the provider is left alone
+    WEATHER_RETRY_SECONDS = 60
+    WEATHER_WAIT_SECONDS = 2  # /api/weather waits this long on a cold cache; the dashboard never waits
+    
+    # Rendered crew page cache: 'memory' (per-worker LRU), 'disk' (shared by all workers) or 'none'
+    FRAGMENT_CACHE_BACKEND = os.environ.get('FRAGMENT_CACHE_BACKEND', 'memory')
+    FRAGMENT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    FRAGMENT_CACHE_FOLDER = 'instance/fragment_cache'
+
+    # Keyset-paginated lists (documents, dailies, gallery, call sheets, blog)
+    LIST_PAGE_SIZE = 24
+    LIST_MAX_PAGE_SIZE = 100
+
+    # Stripboard scheduling: shoot hours per minute of screen time is the crew's pace
+    SCHEDULE_DAY_HOURS = 10
+    SCHEDULE_HOURS_PER_SCREEN_MINUTE = 2.0
+    SCHEDULE_SEARCH_SECONDS = 1.5
+    SCHEDULE_MAX_SEARCH_SECONDS = 5
+    SCHEDULE_SHOOT_WEEKDAYS = (0, 1, 2, 3, 4, 5)  # Monday to Saturday
+    SCHEDULE_DAY_CALL = '7:00 AM'
+    SCHEDULE_NIGHT_CALL = '6:00 PM'
+    
+    # Push channel (/api/stream): streams are recycled every SSE_STREAM_SECONDS, which also
+    # refreshes the weather and countdown snapshot sent on connect. Each open stream holds a gunicorn
+    # thread, so a worker serves at most SSE_MAX_STREAMS tabs (gunicorn.conf.py adds threads for them);
+    # tabs beyond that get a 503 and poll instead
+    SSE_STREAM_SECONDS = 60
+    SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 64))
+    SSE_KEEPALIVE_SECONDS = 15
+    SSE_RETRY_MS = 3000
+    CHANGE_FEED_INTERVAL = 1.0  # seconds between change_event polls per worker
+    
+    # Offline crew portal: what the service worker keeps for shoots without signal
+    OFFLINE_DAYS_AHEAD = 1  # today's call sheet and the next day's
+    OFFLINE_SIDES_SCAN = 200  # newest sides checked against the scheduled scenes
+    OFFLINE_MAX_BYTES = 300 * 1024 * 1024  # documents kept, the script first, then sides newest first
+    
+    # Per-request profiling on the /debug console (each worker keeps its own buffer); off unless PROFILE_REQUESTS=1
+    PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS') == '1'
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 1.0))
+    PROFILE_BUFFER_SIZE = 200
+    PROFILE_SLOW_STATEMENTS = 5
+    PROFILE_REPEAT_THRESHOLD = 5  # runs of one query shape in a request before it is flagged as N+1
+    PROFILE_SERVER_TIMING = os.environ.get('PROFILE_SERVER_TIMING') == '1'  # per-request totals in a Server-Timing header
+    
     # Session settings
     PERMANENT_SESSION_LIFETIME = timedelta(hours=8)
     
@@ -32,10 +141,15 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///barnacle_films_test.db'
 
+class BenchmarkConfig(Config):
+    # Scratch database for flask generate-production and flask benchmark
+    SQLALCHEMY_DATABASE_URI = os.environ.get('BENCHMARK_DATABASE_URL') or 'sqlite:///barnacle_films_bench.db'
+
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
     'testing': TestingConfig,
+    'benchmark': BenchmarkConfig,
     'default': DevelopmentConfig
 }
 
@@ -0,0 +1,140 @@
+"""
+Conditional and ranged file responses for Barnacle Films Inc.
+
+Documents are served with a strong ETag taken from their content hash,
+answer If-None-Match/If-Modified-Since with 304 and honour single and
+multiple byte ranges. Whole files and single ranges go out through the
+server's wsgi.file_wrapper so gunicorn can hand them to the kernel with
+sendfile; multi-range responses are streamed as multipart/byteranges.
+"""
+
+import os
+
+from flask import request, send_file, Response
+from werkzeug.http import parse_range_header, parse_if_range_header
+from werkzeug.wsgi import wrap_file
+
+MAX_RANGES = 32  # more than this and the whole file is cheaper to send
+READ_SIZE = 64 * 1024
+
+
+class FileSection:
+    """Read-only view of one byte range of a file.
+
+    It still exposes fileno() and leaves the descriptor positioned at the
+    start of the range, which is all gunicorn needs to sendfile() exactly
+    Content-Length bytes; other servers fall back to the bounded read().
+    """
+
+    def __init__(self, f, start, length):
+        f.seek(start)
+        self._file = f
+        self._remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size) if size else b''
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+
+def resolve_ranges(header, size):
+    """Sorted, merged (start, end) byte ranges requested by a Range header.
+
+    Returns None when the header should be ignored (absent, malformed or
+    too fragmented) and an empty list when no range is satisfiable.
+    """
+    parsed = parse_range_header(header)
+    if parsed is None or parsed.units != 'bytes' or len(parsed.ranges) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for start, stop in sorted(parsed.ranges, key=lambda r: r[0] if r[0] >= 0 else size + r[0]):
+        if start < 0:
+            start, stop = max(size + start, 0), size
+        else:
+            stop = size if stop is None else min(stop, size)
+        if start >= stop:
+            continue
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], stop)
+        else:
+            ranges.append([start, stop])
+    return [tuple(r) for r in ranges]
+
+
+def _if_range_matches(etag, last_modified):
+    if_range = parse_if_range_header(request.headers.get('If-Range'))
+    if if_range.etag is not None:
+        return if_range.etag == etag
+    if if_range.date is not None:
+        return last_modified is not None and if_range.date == last_modified
+    return True
+
+
+def _iter_byteranges(path, ranges, part_headers, closing):
+    with open(path, 'rb') as f:
+        for (start, end), header in zip(ranges, part_headers):
+            yield header
+            f.seek(start)
+            remaining = end - start
+            while remaining:
+                data = f.read(min(READ_SIZE, remaining))
+                if not data:
+                    return
+                remaining -= len(data)
+                yield data
+        yield closing
+
+
+def send_document_file(path, etag, mimetype=None, download_name=None, as_attachment=True):
+    """Send a file with a strong ETag, 304 handling and byte-range support"""
+    response = send_file(path, mimetype=mimetype, as_attachment=as_attachment,
+                         download_name=download_name, etag=etag, conditional=False)
+    response.cache_control.private = True
+    response.make_conditional(request.environ)
+    response.accept_ranges = 'bytes'
+
+    if response.status_code != 200 or 'Range' not in request.headers:
+        if response.status_code != 200:
+            response.response.close()
+            response.response = []
+        return response
+
+    size = os.path.getsize(path)
+    ranges = resolve_ranges(request.headers['Range'], size)
+    if ranges is None or not _if_range_matches(etag, response.last_modified):
+        return response
+
+    response.response.close()
+    if not ranges:
+        return Response(status=416, headers={'Content-Range': f'bytes */{size}'})
+
+    response.status_code = 206
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response.response = wrap_file(request.environ, FileSection(open(path, 'rb'), start, end - start))
+        response.content_length = end - start
+        response.headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+        return response
+
+    boundary = os.urandom(12).hex()
+    part_headers = []
+    for start, end in ranges:
+        separator = '\r\n' if part_headers else ''
+        part_headers.append((f'{separator}--{boundary}\r\n'
+                             f'Content-Type: {response.mimetype}\r\n'
+                             f'Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n').encode('latin-1'))
+    closing = f'\r\n--{boundary}--\r\n'.encode('latin-1')
+    response.response = _iter_byteranges(path, ranges, part_headers, closing)
+    response.content_length = (sum(len(h) for h in part_headers) + len(closing)
+                               + sum(end - start for start, end in ranges))
+    response.headers['Content-Type'] = f'multipart/byteranges; boundary={boundary}'
+    return response
@@ -0,0 +1,260 @@
+"""
+Change events for the Barnacle Films crew portal.
+
+Every flush that touches a watched model writes a row to change_event in
+the same transaction, so an event exists exactly when its change was
+committed. Each worker process runs one ChangeFeed thread that polls the
+table (only while someone is listening) and wakes its Server-Sent Events
+streams; clients resume from the last event id they saw. The latest event
+id of each kind doubles as a cheap change stamp for ETags.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, select, delete, func
+from sqlalchemy.orm import Session
+
+BUFFER_SIZE = 1000
+RETENTION = timedelta(days=1)
+
+
+def watch_models(change_event, kinds, on_commit=None):
+    """Record inserts, updates and deletes of the models in kinds ({Model: kind}) as change events.
+
+    on_commit, if given, is called with the set of kinds each committed
+    transaction changed.
+    """
+
+    def record(session, rows):
+        session.connection().execute(insert(change_event.__table__), rows)
+        session.info.setdefault('changed_kinds', set()).update(row['kind'] for row in rows)
+
+    @event.listens_for(Session, 'after_flush')
+    def record_changes(session, flush_context):
+        rows = []
+        for action, objects in (('create', session.new), ('update', session.dirty), ('delete', session.deleted)):
+            for obj in objects:
+                kind = kinds.get(type(obj))
+                if kind is None or (action == 'update' and not session.is_modified(obj, include_collections=False)):
+                    continue
+                rows.append({'kind': kind, 'action': action, 'ref_id': obj.id, 'created_at': datetime.utcnow()})
+        if rows:
+            record(session, rows)
+
+    @event.listens_for(Session, 'do_orm_execute')
+    def record_bulk_changes(orm_execute_state):
+        # Bulk query.update()/delete() never reach the flush; they are logged without a ref_id
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete) or orm_execute_state.bind_mapper is None:
+            return
+        kind = kinds.get(orm_execute_state.bind_mapper.class_)
+        if kind is not None:
+            action = 'update' if orm_execute_state.is_update else 'delete'
+            record(orm_execute_state.session,
+                   [{'kind': kind, 'action': action, 'ref_id': None, 'created_at': datetime.utcnow()}])
+
+    @event.listens_for(Session, 'after_commit')
+    def notify_commit(session):
+        changed = session.info.pop('changed_kinds', None)
+        if changed and on_commit is not None:
+            on_commit(changed)
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def forget_changes(session, previous_transaction):
+        if not previous_transaction.nested:
+            session.info.pop('changed_kinds', None)
+
+
+def change_stamps(session, change_event, kinds):
+    """Latest change event id of each kind (0 if it never changed); any write to a kind moves its stamp"""
+    rows = session.execute(
+        select(change_event.kind, func.max(change_event.id))
+        .where(change_event.kind.in_(kinds))
+        .group_by(change_event.kind)
+    )
+    stamps = dict.fromkeys(kinds, 0)
+    stamps.update(rows.all())
+    return stamps
+
+
+class ChangeFeed:
+    """Per-process poller that fans new change events out to waiting streams"""
+
+    def __init__(self, app, db, change_event, interval=1.0):
+        self.app = app
+        self.db = db
+        self.model = change_event
+        self.interval = interval
+        self._events = deque(maxlen=BUFFER_SIZE)
+        self._condition = threading.Condition()
+        self._listeners = 0
+        self._last_id = None
+        self._thread = None
+        self._last_prune = 0.0
+
+    def _start(self):
+        if self._thread is None:
+            with self.app.app_context():
+                self._last_id = self.db.session.scalar(select(func.max(self.model.id))) or 0
+                self.db.session.remove()
+            # Started on first use so each gunicorn worker owns its own thread
+            self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._listeners:
+                    self._condition.wait()
+            try:
+                self._poll()
+            except Exception:
+                self.app.logger.exception('Change feed poll failed')
+            time.sleep(self.interval)
+
+    def _poll(self):
+        with self.app.app_context():
+            rows = self.db.session.execute(
+                select(self.model).where(self.model.id > self._last_id).order_by(self.model.id)
+            ).scalars().all()
+            new_events = [row.to_dict() for row in rows]
+
+            if time.monotonic() - self._last_prune > 3600:
+                self._last_prune = time.monotonic()
+                # The newest event of each kind is kept: it is that kind's change stamp
+                newest = select(func.max(self.model.id)).group_by(self.model.kind)
+                self.db.session.execute(delete(self.model).where(
+                    self.model.created_at < datetime.utcnow() - RETENTION,
+                    self.model.id.not_in(newest)
+                ))
+                self.db.session.commit()
+            self.db.session.remove()
+
+        if new_events:
+            with self._condition:
+                self._events.extend(new_events)
+                self._last_id = new_events[-1]['id']
+                self._condition.notify_all()
+
+    @property
+    def last_id(self):
+        with self._condition:
+            self._start()
+            return self._last_id
+
+    def since(self, last_id):
+        """Events after last_id, or None if they are no longer retained (the client should reload)"""
+        with self._condition:
+            self._start()
+            if last_id >= self._last_id:
+                return []
+            if self._events and last_id >= self._events[0]['id'] - 1:
+                return [e for e in self._events if e['id'] > last_id]
+
+        with self.app.app_context():
+            oldest = self.db.session.scalar(select(func.min(self.model.id)))
+            if oldest is None or last_id < oldest - 1:
+                self.db.session.remove()
+                return None
+            rows = self.db.session.execute(
+                select(self.model).where(self.model.id > last_id).order_by(self.model.id).limit(BUFFER_SIZE)
+            ).scalars().all()
+            events = [row.to_dict() for row in rows]
+            self.db.session.remove()
+        return events
+
+    def wait(self, last_id, timeout):
+        """Block until there are events after last_id (returned) or timeout (empty list)"""
+        with self._condition:
+            self._start()
+            self._listeners += 1
+            self._condition.notify_all()
+            try:
+                self._condition.wait_for(lambda: self._last_id > last_id, timeout)
+            finally:
+                self._listeners -= 1
+            if self._last_id <= last_id:
+                return []
+        return self.since(last_id) or []
+
+
+class StreamSlots:
+    """Caps the streams one worker process holds open.
+
+    Each open stream occupies a server thread for as long as it lasts, so
+    without a cap enough open tabs would leave no thread for ordinary
+    requests. A client turned away falls back to polling.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def hold(self, stream):
+        """stream, wrapped to give its slot back when the server closes it; None if every slot is taken"""
+        if not self._slots.acquire(blocking=False):
+            return None
+        return _HeldStream(stream, self._slots.release)
+
+
+class _HeldStream:
+    # A plain iterable rather than a generator, so close() releases the slot even if it was never iterated
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        return iter(self._stream)
+
+    def close(self):
+        release, self._release = self._release, None
+        try:
+            if hasattr(self._stream, 'close'):
+                self._stream.close()
+        finally:
+            if release is not None:
+                release()
+
+
+def _format_event(kind, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {kind}', f'data: {json.dumps(data)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+def event_stream(feed, last_id, snapshot=(), duration=300, keepalive=15, retry_ms=3000):
+    """Server-Sent Events for one client: a snapshot, then change events until duration runs out.
+
+    Streams end on purpose so connections are recycled; EventSource
+    reconnects after retry_ms and sends Last-Event-ID to pick up from there.
+    """
+    yield f'retry: {retry_ms}\n\n'
+    for kind, data in snapshot:
+        yield _format_event(kind, data)
+
+    if last_id is None:
+        last_id = feed.last_id
+        events = []
+    else:
+        events = feed.since(last_id)
+        if events is None:
+            # Too far behind to replay; the client has to reload what it shows
+            last_id = feed.last_id
+            yield _format_event('reset', {}, last_id)
+            events = []
+    yield _format_event('ready', {'last_event_id': last_id}, last_id)
+
+    deadline = time.monotonic() + duration
+    while True:
+        for change in events:
+            last_id = change['id']
+            yield _format_event(change['kind'], change, last_id)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        events = feed.wait(last_id, min(keepalive, remaining))
+        if not events:
+            yield ': keepalive\n\n'
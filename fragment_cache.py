@@ -0,0 +1,160 @@
+"""
+Rendered page cache for Barnacle Films Inc.
+
+Crew list pages are cached as rendered HTML under the page's namespace
+(its endpoint) and a key that includes the change stamps of every kind of
+data the page shows, so an entry can never outlive its data. Commits also
+drop the namespaces that depend on the kinds they changed right away.
+
+Two backends share one interface: MemoryBackend, an LRU bounded by bytes
+and private to each worker, and DiskBackend, a directory every gunicorn
+worker on the host reads and writes.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+EVICT_INTERVAL = 30  # seconds between disk cache size checks
+
+
+class MemoryBackend:
+    """In-process LRU of rendered pages, capped at max_bytes of text"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key):
+        with self._lock:
+            value = self._entries.get((namespace, key))
+            if value is not None:
+                self._entries.move_to_end((namespace, key))
+            return value
+
+    def set(self, namespace, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop((namespace, key), None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[(namespace, key)] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def delete_namespace(self, namespace):
+        with self._lock:
+            for entry in [entry for entry in self._entries if entry[0] == namespace]:
+                self._size -= len(self._entries.pop(entry))
+
+
+class DiskBackend:
+    """Rendered pages stored as files under root/<namespace>/, shared by all workers"""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._last_evict = 0.0
+
+    def _path(self, namespace, key):
+        return os.path.join(self.root, namespace, hashlib.sha1(key.encode()).hexdigest() + '.html')
+
+    def get(self, namespace, key):
+        path = self._path(namespace, key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                value = f.read()
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+
+    def set(self, namespace, key, value):
+        path = self._path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+        self.maybe_evict()
+
+    def delete_namespace(self, namespace):
+        # Rename first so readers never see a half-deleted directory
+        path = os.path.join(self.root, namespace)
+        doomed = f'{path}.{os.getpid()}.{threading.get_ident()}.deleted'
+        try:
+            os.rename(path, doomed)
+        except FileNotFoundError:
+            return
+        shutil.rmtree(doomed, ignore_errors=True)
+
+    def maybe_evict(self):
+        now = time.monotonic()
+        if now - self._last_evict >= EVICT_INTERVAL:
+            self._last_evict = now
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used pages until the cache is back under budget"""
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+
+
+class FragmentCache:
+    """Rendered HTML keyed by namespace, request key and data version"""
+
+    def __init__(self, backend, version):
+        self.backend = backend
+        self.version = version  # callable: kinds -> {kind: change stamp}
+        self._dependents = {}  # kind -> namespaces that render it
+
+    def fetch(self, namespace, kinds, key, render):
+        """Cached HTML for (namespace, key) at the current version of kinds, rendering it on a miss"""
+        for kind in kinds:
+            self._dependents.setdefault(kind, set()).add(namespace)
+        stamps = self.version(kinds)
+        versioned_key = key + '|' + ','.join(f'{kind}={stamps[kind]}' for kind in sorted(kinds))
+
+        html = self.backend.get(namespace, versioned_key)
+        if html is None:
+            html = render()
+            self.backend.set(namespace, versioned_key, html)
+        return html
+
+    def invalidate(self, kinds):
+        """Drop every namespace that depends on one of kinds"""
+        namespaces = set()
+        for kind in kinds:
+            namespaces.update(self._dependents.get(kind, ()))
+        for namespace in namespaces:
+            self.backend.delete_namespace(namespace)
@@ -0,0 +1,53 @@
+"""
+Gunicorn settings for Barnacle Films Inc.
+
+The app is built once in the master (preload_app) and warmed up there, then
+workers are forked from it and share its imported modules, configured
+mappers and compiled templates copy-on-write instead of each loading their
+own. Pools, threads and database connections are only opened in workers.
+
+The master also starts flask run-jobs beside the workers, since jobs read
+uploads and write caches on this machine's disk, and stops it on shutdown
+(RUN_JOBS=0 leaves background jobs to a worker run separately).
+"""
+
+import gc
+import os
+import subprocess
+import sys
+
+from config import Config
+
+wsgi_app = 'app:create_app()'
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+# Every open /api/stream holds one of a worker's threads for up to SSE_STREAM_SECONDS. A worker gets a
+# thread per stream it accepts (SSE_MAX_STREAMS) plus REQUEST_THREADS for everything else, so open tabs
+# never starve page and API requests: capacity is workers * SSE_MAX_STREAMS open tabs, and tabs past
+# that poll. Streams mostly sleep, so a thread each is cheap; raise SSE_MAX_STREAMS or WEB_CONCURRENCY
+# for a bigger crew.
+worker_class = 'gthread'
+threads = Config.SSE_MAX_STREAMS + int(os.environ.get('REQUEST_THREADS', 16))
+preload_app = True
+
+
+def when_ready(server):
+    from app import warm_up
+
+    warm_up(server.app.wsgi())
+    # Nothing loaded so far is ever freed, so the collector need not touch (and copy) those pages
+    gc.freeze()
+
+    if os.environ.get('RUN_JOBS', '1') == '1':
+        server.job_runner = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'run-jobs'])
+
+
+def on_exit(server):
+    job_runner = getattr(server, 'job_runner', None)
+    if job_runner is not None:
+        # SIGTERM lets the running jobs finish; anything cut short is run again once its lease runs out
+        job_runner.terminate()
+        try:
+            job_runner.wait(timeout=server.cfg.graceful_timeout)
+        except subprocess.TimeoutExpired:
+            job_runner.kill()
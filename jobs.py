@@ -0,0 +1,268 @@
+"""
+Background jobs for Barnacle Films Inc.
+
+Slow side effects of a request (thumbnails, rendering PDF pages,
+typesetting call sheet exports, notifying the crew) are added to the job
+table in the same transaction as the change that caused them, so a job
+exists exactly when its change was committed. flask run-jobs runs them
+off the request threads.
+
+A worker claims a job by flipping it from queued to running with a
+conditional UPDATE, so any number of worker processes can share the
+table; on PostgreSQL the candidate rows are also locked with SKIP LOCKED
+so workers never queue up behind each other. A failed job is retried
+with exponential backoff until max_attempts, then kept as failed for the
+/debug console. A job whose worker died is queued again once its lease
+runs out, so a lease must outlast the slowest job.
+"""
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete, func
+
+PRIORITIES = {'urgent': 0, 'high': 1, 'normal': 2, 'low': 3}
+STATUSES = ('queued', 'running', 'done', 'failed')
+ACTIVE = ('queued', 'running')
+
+
+class JobQueue:
+    """The job table: enqueueing, claiming, retrying, and the numbers the /debug console shows"""
+
+    def __init__(self, db, model, handlers, lease_seconds=600, retry_seconds=30, max_retry_seconds=3600,
+                 retention=timedelta(days=7)):
+        self.db = db
+        self.model = model
+        self.handlers = handlers  # kind -> fn(**payload)
+        self.lease = timedelta(seconds=lease_seconds)
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.retention = retention
+
+    def enqueue(self, kind, payload=None, priority='normal', delay=0, max_attempts=5, dedupe_key=None):
+        """Add a job to the current session, to be committed with the caller's changes; returns the Job.
+
+        With a dedupe_key, an existing queued or running job with the same
+        key is returned instead of adding another.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f'Unknown job kind: {kind}')
+        session = self.db.session
+        if dedupe_key is not None:
+            existing = session.scalars(select(self.model)
+                                       .where(self.model.dedupe_key == dedupe_key, self.model.status.in_(ACTIVE))
+                                       .limit(1)).first()
+            if existing is not None:
+                return existing
+
+        job = self.model(kind=kind, payload=json.dumps(payload or {}), status='queued',
+                         priority=PRIORITIES.get(priority, priority), attempts=0, max_attempts=max_attempts,
+                         dedupe_key=dedupe_key, run_at=datetime.utcnow() + timedelta(seconds=delay),
+                         created_at=datetime.utcnow())
+        session.add(job)
+        return job
+
+    def claim(self, worker_id, kinds=None):
+        """Take the most urgent due job (oldest first) for worker_id; returns (id, kind, payload) or None"""
+        model = self.model
+        session = self.db.session
+        now = datetime.utcnow()
+        query = (select(model.id)
+                 .where(model.status == 'queued', model.run_at <= now)
+                 .order_by(model.priority, model.run_at, model.id)
+                 .limit(5)
+                 .with_for_update(skip_locked=True))  # PostgreSQL only; SQLite serializes writers anyway
+        if kinds:
+            query = query.where(model.kind.in_(kinds))
+        try:
+            for job_id in session.scalars(query).all():
+                # Another worker may have taken it since the select; only one UPDATE finds it still queued
+                claimed = session.execute(
+                    update(model)
+                    .where(model.id == job_id, model.status == 'queued')
+                    .values(status='running', locked_by=worker_id, locked_at=now, attempts=model.attempts + 1)
+                    .execution_options(synchronize_session=False))
+                if claimed.rowcount:
+                    kind, payload = session.execute(select(model.kind, model.payload).where(model.id == job_id)).one()
+                    session.commit()
+                    return job_id, kind, json.loads(payload)
+            session.commit()
+            return None
+        except Exception:
+            session.rollback()
+            raise
+
+    def _finish(self, job_id, worker_id, **values):
+        # A worker whose lease ran out no longer owns its job and leaves it to whoever does
+        self.db.session.execute(update(self.model)
+                                .where(self.model.id == job_id, self.model.locked_by == worker_id)
+                                .values(locked_by=None, locked_at=None, **values)
+                                .execution_options(synchronize_session=False))
+        self.db.session.commit()
+
+    def complete(self, job_id, worker_id):
+        self._finish(job_id, worker_id, status='done', last_error=None, finished_at=datetime.utcnow())
+
+    def fail(self, job_id, worker_id, error):
+        """Queue the job again after its backoff, or mark it failed once it is out of attempts"""
+        self.db.session.rollback()
+        attempts, max_attempts = self.db.session.execute(
+            select(self.model.attempts, self.model.max_attempts).where(self.model.id == job_id)).one()
+        if attempts >= max_attempts:
+            self._finish(job_id, worker_id, status='failed', last_error=error, finished_at=datetime.utcnow())
+        else:
+            self._finish(job_id, worker_id, status='queued', last_error=error,
+                         run_at=datetime.utcnow() + timedelta(seconds=self.backoff(attempts)))
+
+    def backoff(self, attempts):
+        """Seconds before retry number attempts: doubling from retry_seconds, jittered so failures spread out"""
+        delay = min(self.max_retry_seconds, self.retry_seconds * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def requeue_stale(self):
+        """Queue again (or fail, if out of attempts) the running jobs whose lease ran out; returns how many"""
+        model = self.model
+        stale = (model.status == 'running', model.locked_at < datetime.utcnow() - self.lease)
+        error = 'Worker stopped before finishing the job'
+        session = self.db.session
+        failed = session.execute(update(model).where(*stale, model.attempts >= model.max_attempts)
+                                 .values(status='failed', locked_by=None, locked_at=None, last_error=error,
+                                         finished_at=datetime.utcnow())
+                                 .execution_options(synchronize_session=False)).rowcount
+        queued = session.execute(update(model).where(*stale)
+                                 .values(status='queued', locked_by=None, locked_at=None, last_error=error,
+                                         run_at=datetime.utcnow())
+                                 .execution_options(synchronize_session=False)).rowcount
+        session.commit()
+        return failed + queued
+
+    def prune(self):
+        """Delete finished jobs older than the retention; returns how many"""
+        removed = self.db.session.execute(
+            delete(self.model).where(self.model.status.in_(('done', 'failed')),
+                                     self.model.finished_at < datetime.utcnow() - self.retention)
+        ).rowcount
+        self.db.session.commit()
+        return removed
+
+    def retry(self, job_id):
+        """Queue a failed job again with a fresh set of attempts; returns whether it was failed"""
+        retried = self.db.session.execute(
+            update(self.model).where(self.model.id == job_id, self.model.status == 'failed')
+            .values(status='queued', attempts=0, run_at=datetime.utcnow(), finished_at=None)
+            .execution_options(synchronize_session=False)).rowcount
+        self.db.session.commit()
+        return bool(retried)
+
+    def stats(self, limit=20):
+        """Counts by kind and status, how long the oldest due job has waited, and the latest jobs of note"""
+        model = self.model
+        session = self.db.session
+        now = datetime.utcnow()
+        counts = {}
+        for kind, status, count in session.execute(
+                select(model.kind, model.status, func.count()).group_by(model.kind, model.status)):
+            counts.setdefault(kind, dict.fromkeys(STATUSES, 0))[status] = count
+        oldest_due = session.scalar(select(func.min(model.run_at))
+                                    .where(model.status == 'queued', model.run_at <= now))
+        return {
+            'counts': dict(sorted(counts.items())),
+            'totals': {status: sum(row[status] for row in counts.values()) for status in STATUSES},
+            'oldest_wait_seconds': round((now - oldest_due).total_seconds(), 1) if oldest_due else 0,
+            'running': session.scalars(select(model).where(model.status == 'running')
+                                       .order_by(model.locked_at).limit(limit)).all(),
+            'problems': session.scalars(select(model)
+                                        .where(model.status.in_(('queued', 'failed')), model.last_error.is_not(None))
+                                        .order_by(model.id.desc()).limit(limit)).all(),
+        }
+
+
+class JobWorker:
+    """Threads that claim and run jobs until stopped; each runs one job at a time"""
+
+    def __init__(self, app, queue, concurrency=2, kinds=None, poll_interval=1.0, maintenance_interval=60):
+        self.app = app
+        self.queue = queue
+        self.concurrency = concurrency
+        self.kinds = kinds
+        self.poll_interval = poll_interval
+        self.maintenance_interval = maintenance_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.counts = {'done': 0, 'retried': 0, 'failed': 0}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._last_maintenance = 0.0
+
+    def stop(self):
+        """Let each thread finish its current job, then exit"""
+        self._stop.set()
+
+    def run(self, burst=False):
+        """Run until stop() is called or, with burst, until no job is due; returns the counts"""
+        threads = [threading.Thread(target=self._loop, args=(f'{self.worker_id}:{n}', burst),
+                                    name=f'job-worker-{n}', daemon=True)
+                   for n in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stop()
+            for thread in threads:
+                thread.join()
+        return self.counts
+
+    def _maintain(self):
+        with self._lock:
+            if time.monotonic() - self._last_maintenance < self.maintenance_interval:
+                return
+            self._last_maintenance = time.monotonic()
+        requeued = self.queue.requeue_stale()
+        if requeued:
+            self.app.logger.warning('Requeued %s jobs whose worker stopped', requeued)
+        self.queue.prune()
+
+    def _loop(self, worker_id, burst):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    self._maintain()
+                    claimed = self.queue.claim(worker_id, self.kinds)
+                    if claimed is not None:
+                        self._execute(worker_id, *claimed)
+                except Exception:
+                    # The database being unreachable, most likely; wait and try again
+                    self.app.logger.exception('Job worker %s failed', worker_id)
+                    claimed = None
+                finally:
+                    self.queue.db.session.remove()
+            if claimed is None:
+                if burst:
+                    return
+                self._stop.wait(self.poll_interval)
+
+    def _execute(self, worker_id, job_id, kind, payload):
+        started = time.perf_counter()
+        try:
+            self.queue.handlers[kind](**payload)
+        except Exception:
+            self.app.logger.exception('Job %s (%s) failed', job_id, kind)
+            self.queue.fail(job_id, worker_id, traceback.format_exc(limit=5)[-4000:])
+            outcome = 'failed' if self._status(job_id) == 'failed' else 'retried'
+        else:
+            self.queue.complete(job_id, worker_id)
+            outcome = 'done'
+        with self._lock:
+            self.counts[outcome] += 1
+        self.app.logger.info('Job %s (%s) %s in %.2fs', job_id, kind, outcome, time.perf_counter() - started)
+
+    def _status(self, job_id):
+        return self.queue.db.session.scalar(select(self.queue.model.status).where(self.queue.model.id == job_id))
@@ -0,0 +1,40 @@
+"""
+Lightweight list rows for Barnacle Films Inc.
+
+List pages show a few short columns of many records. Loading those as ORM
+entities reads every Text column (notes, cast and crew notes, weather
+contingency) and builds an identity-mapped, change-tracked object per
+record. List rows select only the columns a list shows into plain
+namedtuples instead; long text a list only shows the start of is cut
+down in the query itself. Detail pages keep loading full entities.
+"""
+
+from collections import namedtuple
+from datetime import date, datetime
+
+from sqlalchemy import func
+
+
+def _to_dict(row):
+    return {key: value.isoformat() if isinstance(value, (date, datetime)) else value
+            for key, value in row._asdict().items() if key not in row.hidden}
+
+
+def list_row(name, columns, previews=None, hidden=()):
+    """namedtuple class with a field per column and one per preview.
+
+    previews maps a field name to (column, length): the first length
+    characters of that column. hidden fields are left out of to_dict().
+    The class's columns attribute is what to select, in field order.
+    """
+    previews = previews or {}
+    selected = [column.label(column.key) for column in columns]
+    selected += [func.substr(column, 1, length).label(field) for field, (column, length) in previews.items()]
+    base = namedtuple(name, [column.key for column in columns] + list(previews))
+    return type(name, (base,), {'__slots__': (), 'columns': tuple(selected), 'hidden': frozenset(hidden),
+                                 'to_dict': _to_dict})
+
+
+def load_rows(row_class, rows):
+    """Wrap result rows (selected with row_class.columns) in row_class"""
+    return [row_class._make(row) for row in rows]
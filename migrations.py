@@ -0,0 +1,391 @@
+"""
+Schema migrations for Barnacle Films Inc.
+
+Migrations are numbered functions applied in order, each in its own
+transaction, and recorded in schema_migrations. They run the same on the
+SQLite dev database and on PostgreSQL in production.
+
+Databases created before this existed are in an unknown state, so every
+operation checks before it changes anything: tables, columns and
+indexes are only added when missing and only dropped when present.
+Migrations spell out what they create instead of reading it from the
+models, so they replay the same way after the models move on.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import (inspect, text, select, insert, Table, Column, Integer, String, Text, Boolean, Date, DateTime,
+                        MetaData, ForeignKey, UniqueConstraint, Index)
+
+from search import install_search_index
+from utils import parse_characters
+
+MIGRATIONS = []
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def migration(version, description):
+    """Register fn as migration number version"""
+    def register(fn):
+        assert not MIGRATIONS or version > MIGRATIONS[-1][0], 'migrations must be declared in order'
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+class Operations:
+    """Idempotent schema changes on one connection"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def has_table(self, table_name):
+        return inspect(self.connection).has_table(table_name)
+
+    def create_table(self, table):
+        """Create table (a Table spelled out by the migration) and its indexes if it is missing"""
+        if self.has_table(table.name):
+            return False
+        table.create(self.connection)
+        return True
+
+    def add_column(self, table_name, column):
+        """Add column (a Column spelled out by the migration) to an existing table if it is missing"""
+        existing = {c['name'] for c in inspect(self.connection).get_columns(table_name)}
+        if column.name in existing:
+            return False
+        column_type = column.type.compile(dialect=self.connection.dialect)
+        self.connection.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}'))
+        return True
+
+    def add_missing_columns(self, table):
+        """Add every nullable column of table that the existing table lacks"""
+        for column in table.columns:
+            if column.nullable:
+                self.add_column(table.name, column)
+
+    def has_index(self, table_name, index_name):
+        return any(index['name'] == index_name for index in inspect(self.connection).get_indexes(table_name))
+
+    def create_index(self, index_name, table_name, *column_names, unique=False):
+        """Create an index if it is missing"""
+        if self.has_index(table_name, index_name):
+            return False
+        unique_sql = 'UNIQUE ' if unique else ''
+        self.connection.execute(text(
+            f'CREATE {unique_sql}INDEX {index_name} ON {table_name} ({", ".join(column_names)})'))
+        return True
+
+    def drop_index(self, index_name, table_name):
+        """Drop an index if it exists"""
+        if not self.has_index(table_name, index_name):
+            return False
+        self.connection.execute(text(f'DROP INDEX {index_name}'))
+        return True
+
+    def execute(self, sql, **params):
+        return self.connection.execute(text(sql), params)
+
+
+def current_version(connection):
+    if not inspect(connection).has_table('schema_migrations'):
+        return 0
+    return connection.execute(text('SELECT max(version) FROM schema_migrations')).scalar() or 0
+
+
+@contextmanager
+def _migration_lock(engine):
+    """Serialize migrators (several workers or deploys starting at once) on PostgreSQL"""
+    if engine.dialect.name != 'postgresql':
+        yield
+        return
+    with engine.connect() as connection:
+        connection.execute(text('SELECT pg_advisory_lock(7262001)'))
+        try:
+            yield
+        finally:
+            connection.execute(text('SELECT pg_advisory_unlock(7262001)'))
+            connection.commit()
+
+
+def migrate(engine, target=None):
+    """Apply pending migrations up to target (default: all); returns the (version, description) applied"""
+    applied = []
+    with _migration_lock(engine):
+        with engine.begin() as connection:
+            schema_migrations.create(connection, checkfirst=True)
+        for version, description, fn in MIGRATIONS:
+            if target is not None and version > target:
+                break
+            with engine.begin() as connection:
+                if version <= current_version(connection):
+                    continue
+                fn(Operations(connection))
+                connection.execute(schema_migrations.insert().values(
+                    version=version, description=description, applied_at=datetime.utcnow()))
+            applied.append((version, description))
+    return applied
+
+
+@migration(1, 'Baseline: create missing tables and nullable columns')
+def baseline(op):
+    # The schema as it stood when migrations began; the listing indexes follow in migrations 3 and 4
+    metadata = MetaData()
+    tables = [
+        Table(
+            'user', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('username', String(80), unique=True, nullable=False),
+            Column('email', String(120), unique=True, nullable=False),
+            Column('password_hash', String(128)),
+            Column('role', String(20)),
+            Column('created_at', DateTime),
+            Column('last_login', DateTime),
+        ),
+        Table(
+            'call_sheet', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('title', String(200), nullable=False),
+            Column('date', Date, nullable=False),
+            Column('location', String(200), nullable=False),
+            Column('call_time', String(20), nullable=False),
+            Column('wrap_time', String(20), nullable=False),
+            Column('weather_contingency', Text),
+            Column('cast_notes', Text),
+            Column('crew_notes', Text),
+            Column('special_notes', Text),
+            Column('scenes', Text),
+            Column('created_at', DateTime),
+            Column('updated_at', DateTime),
+        ),
+        Table(
+            'blog_post', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('title', String(200), nullable=False),
+            Column('slug', String(200), unique=True, nullable=False),
+            Column('content', Text, nullable=False),
+            Column('excerpt', Text),
+            Column('featured_image', String(200)),
+            Column('published', Boolean),
+            Column('created_at', DateTime),
+            Column('updated_at', DateTime),
+        ),
+        Table(
+            'document', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('title', String(200), nullable=False),
+            Column('filename', String(200), nullable=False),
+            Column('filepath', String(300), nullable=False),
+            Column('document_type', String(50), nullable=False),
+            Column('file_size', Integer),
+            Column('mime_type', String(100)),
+            Column('content_hash', String(64)),
+            Column('thumbnail_path', String(300)),
+            Column('description', Text),
+            Column('created_at', DateTime),
+            Column('created_by', String(100)),
+        ),
+        Table(
+            'document_tag', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('document_id', Integer, ForeignKey('document.id', ondelete='CASCADE'), nullable=False),
+            Column('tag', String(30), nullable=False),
+            Column('created_at', DateTime, nullable=False),
+            UniqueConstraint('document_id', 'tag', name='uq_document_tag'),
+        ),
+        Table(
+            'contact', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('name', String(100), nullable=False),
+            Column('role', String(100), nullable=False),
+            Column('phone', String(20)),
+            Column('email', String(120)),
+            Column('emergency_contact', Boolean),
+            Column('department', String(50)),
+            Column('notes', Text),
+            Column('created_at', DateTime),
+        ),
+        Table(
+            'scene', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('scene_number', Integer, unique=True, nullable=False),
+            Column('title', String(200), nullable=False),
+            Column('location', String(200), nullable=False),
+            Column('time_of_day', String(50), nullable=False),
+            Column('scene_type', String(50), nullable=False),
+            Column('description', Text),
+            Column('characters', Text),
+            Column('estimated_duration', String(20)),
+            Column('status', String(20)),
+            Column('call_sheet_id', Integer, ForeignKey('call_sheet.id')),
+            Column('shot_count', Integer),
+            Column('notes', Text),
+            Column('created_at', DateTime),
+            Column('updated_at', DateTime),
+        ),
+        Table(
+            'announcement', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('title', String(200), nullable=False),
+            Column('content', Text, nullable=False),
+            Column('priority', String(20)),
+            Column('target_audience', String(50)),
+            Column('created_at', DateTime),
+            Column('expires_at', DateTime),
+            Column('created_by', String(100)),
+        ),
+        Table(
+            'shot', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('scene_id', Integer, ForeignKey('scene.id'), nullable=False),
+            Column('shot_number', Integer, nullable=False),
+            Column('setup', String(20)),
+            Column('heading', String(200)),
+            Column('location', String(200)),
+            Column('framing', String(100)),
+            Column('lens', String(50)),
+            Column('camera', String(100)),
+            Column('movement', String(200)),
+            Column('description', Text),
+            Column('notes', Text),
+            Column('status', String(20)),
+            Column('created_at', DateTime),
+            Column('updated_at', DateTime),
+            Index('ix_shot_scene_order', 'scene_id', 'shot_number', unique=True),
+        ),
+        Table(
+            'change_event', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('kind', String(20), nullable=False),
+            Column('action', String(10), nullable=False),
+            Column('ref_id', Integer),
+            Column('created_at', DateTime),
+        ),
+    ]
+    for table in tables:
+        if not op.create_table(table):
+            # Created before migrations existed, by whichever version of the app first ran
+            op.add_missing_columns(table)
+
+
+@migration(2, 'Full-text search index and triggers')
+def search_index(op):
+    install_search_index(op.connection)
+
+
+@migration(3, 'Indexes for the listing queries')
+def listing_indexes(op):
+    op.create_index('ix_call_sheet_date', 'call_sheet', 'date')
+    op.create_index('ix_document_type_created', 'document', 'document_type', 'created_at')
+    op.create_index('ix_document_created_at', 'document', 'created_at')
+    op.create_index('ix_blog_post_published_created', 'blog_post', 'published', 'created_at')
+    op.create_index('ix_contact_name', 'contact', 'name')
+    op.create_index('ix_scene_call_sheet', 'scene', 'call_sheet_id')
+    op.create_index('ix_document_tag_listing', 'document_tag', 'tag', 'created_at', 'document_id')
+    op.create_index('ix_change_event_kind', 'change_event', 'kind', 'id')
+    op.create_index('ix_change_event_created_at', 'change_event', 'created_at')
+
+
+@migration(4, 'Keyset pagination indexes ending in the primary key')
+def keyset_indexes(op):
+    op.create_index('ix_call_sheet_date_id', 'call_sheet', 'date', 'id')
+    op.create_index('ix_document_created_id', 'document', 'created_at', 'id')
+    op.create_index('ix_blog_post_published_created_id', 'blog_post', 'published', 'created_at', 'id')
+    op.drop_index('ix_call_sheet_date', 'call_sheet')
+    op.drop_index('ix_document_created_at', 'document')
+    op.drop_index('ix_blog_post_published_created', 'blog_post')
+
+
+@migration(5, 'Characters normalized out of scene.characters')
+def scene_characters(op):
+    metadata = MetaData()
+    Table('scene', metadata, Column('id', Integer, primary_key=True))
+    character = Table(
+        'character', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('name', String(100), nullable=False, unique=True),
+        Column('created_at', DateTime),
+    )
+    scene_character = Table(
+        'scene_character', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('scene_id', Integer, ForeignKey('scene.id', ondelete='CASCADE'), nullable=False),
+        Column('character_id', Integer, ForeignKey('character.id', ondelete='CASCADE'), nullable=False),
+        UniqueConstraint('scene_id', 'character_id', name='uq_scene_character'),
+        Index('ix_scene_character_character', 'character_id', 'scene_id'),
+    )
+    op.create_table(character)
+    op.create_table(scene_character)
+
+    # Names match case-insensitively, so "mac" in one scene and "Mac" in another are one character
+    character_ids = {name.casefold(): id for id, name in op.connection.execute(select(character.c.id, character.c.name))}
+    linked = set(op.connection.execute(select(scene_character.c.scene_id, scene_character.c.character_id)))
+    scenes = op.execute('SELECT id, characters FROM scene WHERE characters IS NOT NULL').all()
+    for scene_id, characters in scenes:
+        for name in parse_characters(characters):
+            if name.casefold() not in character_ids:
+                character_ids[name.casefold()] = op.connection.execute(
+                    insert(character).values(name=name, created_at=datetime.utcnow())).inserted_primary_key[0]
+            link = (scene_id, character_ids[name.casefold()])
+            if link not in linked:
+                op.connection.execute(insert(scene_character).values(scene_id=link[0], character_id=link[1]))
+                linked.add(link)
+
+
+@migration(6, 'Draft flag on call sheets written by the stripboard')
+def call_sheet_drafts(op):
+    op.add_column('call_sheet', Column('draft', Boolean))
+
+
+@migration(7, 'Background job queue')
+def job_queue(op):
+    job = Table(
+        'job', MetaData(),
+        Column('id', Integer, primary_key=True),
+        Column('kind', String(50), nullable=False),
+        Column('payload', Text, nullable=False),
+        Column('status', String(10), nullable=False),
+        Column('priority', Integer, nullable=False),
+        Column('attempts', Integer, nullable=False),
+        Column('max_attempts', Integer, nullable=False),
+        Column('dedupe_key', String(200)),
+        Column('run_at', DateTime, nullable=False),
+        Column('locked_by', String(100)),
+        Column('locked_at', DateTime),
+        Column('last_error', Text),
+        Column('created_at', DateTime),
+        Column('finished_at', DateTime),
+        Index('ix_job_ready', 'status', 'priority', 'run_at', 'id'),
+        Index('ix_job_dedupe', 'dedupe_key', 'status'),
+        Index('ix_job_kind_status', 'kind', 'status'),
+    )
+    op.create_table(job)
+
+
+@migration(8, 'Announcement deliveries and the contact department index')
+def notification_deliveries(op):
+    metadata = MetaData()
+    Table('announcement', metadata, Column('id', Integer, primary_key=True))
+    Table('contact', metadata, Column('id', Integer, primary_key=True))
+    notification_delivery = Table(
+        'notification_delivery', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('announcement_id', Integer, ForeignKey('announcement.id', ondelete='CASCADE'), nullable=False),
+        Column('contact_id', Integer, ForeignKey('contact.id', ondelete='SET NULL')),
+        Column('channel', String(10), nullable=False),
+        Column('address', String(200), nullable=False),
+        Column('status', String(10), nullable=False),
+        Column('error', Text),
+        Column('sent_at', DateTime, nullable=False),
+        UniqueConstraint('announcement_id', 'channel', 'address', name='uq_notification_delivery'),
+        Index('ix_notification_delivery_address', 'address', 'sent_at'),
+    )
+    op.create_table(notification_delivery)
+    op.create_index('ix_contact_department', 'contact', 'department')
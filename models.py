@@ -1,12 +1,15 @@
 """
 Database Models for Barnacle Films Inc.
+
+The only definition of the schema: app.py, the migrations and the CLI all
+import their models from here. db is bound to an app by create_app().
 """
 
 from datetime import datetime
+from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 
-# Import db from app to avoid circular imports
-from app import db
+db = SQLAlchemy()
 
 class User(db.Model):
     """User model for role-based access"""
@@ -26,6 +29,10 @@ class User(db.Model):
 
 class CallSheet(db.Model):
     """Call sheet model for production scheduling"""
+    __table_args__ = (
+        db.Index('ix_call_sheet_date_id', 'date', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     date = db.Column(db.Date, nullable=False)
@@ -37,14 +44,35 @@ class CallSheet(db.Model):
     crew_notes = db.Column(db.Text)
     special_notes = db.Column(db.Text)
     scenes = db.Column(db.Text)
+    draft = db.Column(db.Boolean, default=False)  # written by the stripboard, replaced on its next run
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'date': self.date.isoformat(),
+            'draft': bool(self.draft),
+            'location': self.location,
+            'call_time': self.call_time,
+            'wrap_time': self.wrap_time,
+            'scenes': self.scenes,
+            'cast_notes': self.cast_notes,
+            'crew_notes': self.crew_notes,
+            'special_notes': self.special_notes,
+            'weather_contingency': self.weather_contingency
+        }
+    
     def __repr__(self):
         return f'<CallSheet {self.title} - {self.date}>'
 
 class BlogPost(db.Model):
     """Blog post model for public site content"""
+    __table_args__ = (
+        db.Index('ix_blog_post_published_created_id', 'published', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     slug = db.Column(db.String(200), unique=True, nullable=False)
@@ -55,11 +83,26 @@ class BlogPost(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'slug': self.slug,
+            'excerpt': self.excerpt,
+            'featured_image': self.featured_image,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
     def __repr__(self):
         return f'<BlogPost {self.title}>'
 
 class Document(db.Model):
     """Document model for file uploads"""
+    __table_args__ = (
+        db.Index('ix_document_type_created', 'document_type', 'created_at'),
+        db.Index('ix_document_created_id', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     filename = db.Column(db.String(200), nullable=False)
@@ -67,15 +110,56 @@ class Document(db.Model):
     document_type = db.Column(db.String(50), nullable=False)  # script, sides, dailies, photo, document
     file_size = db.Column(db.Integer)
     mime_type = db.Column(db.String(100))
+    content_hash = db.Column(db.String(64))  # SHA-256 of the file, used as its ETag
+    thumbnail_path = db.Column(db.String(300))  # relative to static/, poster frame for videos
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_by = db.Column(db.String(100))
+    tags = db.relationship('DocumentTag', backref='document', lazy=True, cascade='all, delete-orphan')
     
+    @property
+    def tag_names(self):
+        return sorted(tag.tag for tag in self.tags)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'filename': self.filename,
+            'document_type': self.document_type,
+            'file_size': self.file_size,
+            'mime_type': self.mime_type,
+            'thumbnail_path': self.thumbnail_path,
+            'description': self.description,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'created_by': self.created_by
+        }
+
     def __repr__(self):
         return f'<Document {self.title}>'
 
+class DocumentTag(db.Model):
+    """Category tag on a document; listings walk the (tag, created_at) index instead of scanning titles"""
+    __table_args__ = (
+        db.Index('ix_document_tag_listing', 'tag', 'created_at', 'document_id'),
+        db.UniqueConstraint('document_id', 'tag', name='uq_document_tag'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id', ondelete='CASCADE'), nullable=False)
+    tag = db.Column(db.String(30), nullable=False)  # a document type, storyboard, location, character, reference, visual_reference
+    created_at = db.Column(db.DateTime, nullable=False)  # copy of Document.created_at so the index can order by it
+
+    def __repr__(self):
+        return f'<DocumentTag {self.document_id}: {self.tag}>'
+
 class Contact(db.Model):
     """Contact model for cast, crew, and vendor directory"""
+    __table_args__ = (
+        db.Index('ix_contact_name', 'name'),
+        db.Index('ix_contact_department', 'department'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     role = db.Column(db.String(100), nullable=False)
@@ -91,6 +175,10 @@ class Contact(db.Model):
 
 class Scene(db.Model):
     """Scene model for master scene breakdown"""
+    __table_args__ = (
+        db.Index('ix_scene_call_sheet', 'call_sheet_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     scene_number = db.Column(db.Integer, nullable=False, unique=True)
     title = db.Column(db.String(200), nullable=False)
@@ -98,7 +186,7 @@ class Scene(db.Model):
     time_of_day = db.Column(db.String(50), nullable=False)  # DAY, NIGHT, DAWN, DUSK
     scene_type = db.Column(db.String(50), nullable=False)  # INT, EXT, INT/EXT
     description = db.Column(db.Text)
-    characters = db.Column(db.Text)  # JSON string of character names
+    characters = db.Column(db.Text)  # character names as entered, e.g. "Dallas, Mac"; normalized into scene_character
     estimated_duration = db.Column(db.String(20))  # e.g., "2-3 minutes"
     status = db.Column(db.String(20), default='planned')  # planned, shot, in_progress, completed
     call_sheet_id = db.Column(db.Integer, db.ForeignKey('call_sheet.id'), nullable=True)
@@ -106,10 +194,35 @@ class Scene(db.Model):
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    cast = db.relationship('SceneCharacter', backref='scene', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Scene {self.scene_number}: {self.title}>'
 
+class Character(db.Model):
+    """Script character, one row per name across every scene"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    scenes = db.relationship('SceneCharacter', backref='character', lazy=True, cascade='all, delete-orphan')
+
+    def __repr__(self):
+        return f'<Character {self.name}>'
+
+class SceneCharacter(db.Model):
+    """Character appearing in a scene; cast lookups join through this instead of parsing Scene.characters"""
+    __table_args__ = (
+        db.UniqueConstraint('scene_id', 'character_id', name='uq_scene_character'),
+        db.Index('ix_scene_character_character', 'character_id', 'scene_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    scene_id = db.Column(db.Integer, db.ForeignKey('scene.id', ondelete='CASCADE'), nullable=False)
+    character_id = db.Column(db.Integer, db.ForeignKey('character.id', ondelete='CASCADE'), nullable=False)
+
+    def __repr__(self):
+        return f'<SceneCharacter {self.scene_id}: {self.character_id}>'
+
 class Announcement(db.Model):
     """Announcement model for crew communications"""
     id = db.Column(db.Integer, primary_key=True)
@@ -121,5 +234,143 @@ class Announcement(db.Model):
     expires_at = db.Column(db.DateTime)
     created_by = db.Column(db.String(100))
     
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'content': self.content,
+            'priority': self.priority,
+            'target_audience': self.target_audience,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'created_by': self.created_by
+        }
+    
     def __repr__(self):
         return f'<Announcement {self.title}>'
+
+class NotificationDelivery(db.Model):
+    """An announcement sent (or not) to one address; a retried fan-out skips every address that has a row"""
+    __table_args__ = (
+        db.UniqueConstraint('announcement_id', 'channel', 'address', name='uq_notification_delivery'),
+        db.Index('ix_notification_delivery_address', 'address', 'sent_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    announcement_id = db.Column(db.Integer, db.ForeignKey('announcement.id', ondelete='CASCADE'), nullable=False)
+    contact_id = db.Column(db.Integer, db.ForeignKey('contact.id', ondelete='SET NULL'))
+    channel = db.Column(db.String(10), nullable=False)  # email, sms
+    address = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.String(10), nullable=False)  # sent, limited (too many lately), failed (error says why)
+    error = db.Column(db.Text)
+    sent_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<NotificationDelivery {self.announcement_id} {self.channel} {self.address}: {self.status}>'
+
+class Shot(db.Model):
+    """Shot model for per-scene shot lists"""
+    __table_args__ = (
+        db.Index('ix_shot_scene_order', 'scene_id', 'shot_number', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    scene_id = db.Column(db.Integer, db.ForeignKey('scene.id'), nullable=False)
+    shot_number = db.Column(db.Integer, nullable=False)  # running order within the scene
+    setup = db.Column(db.String(20))  # e.g., "12A"
+    heading = db.Column(db.String(200))  # slugline the shot is grouped under
+    location = db.Column(db.String(200))
+    framing = db.Column(db.String(100))  # shot type, e.g., "Wide Establishing", "OTS Dallas"
+    lens = db.Column(db.String(50))
+    camera = db.Column(db.String(100))
+    movement = db.Column(db.String(200))
+    description = db.Column(db.Text)
+    notes = db.Column(db.Text)
+    status = db.Column(db.String(20), default='planned')  # planned, shot, cut
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'scene_id': self.scene_id,
+            'shot_number': self.shot_number,
+            'setup': self.setup,
+            'heading': self.heading,
+            'location': self.location,
+            'framing': self.framing,
+            'lens': self.lens,
+            'camera': self.camera,
+            'movement': self.movement,
+            'description': self.description,
+            'notes': self.notes,
+            'status': self.status
+        }
+
+    def __repr__(self):
+        return f'<Shot {self.scene_id}-{self.shot_number}: {self.framing}>'
+
+class ChangeEvent(db.Model):
+    """Committed changes to crew-facing data, replayed by the /api/stream push channel"""
+    __table_args__ = (
+        db.Index('ix_change_event_kind', 'kind', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # call_sheet, scene, announcement, document, blog_post
+    action = db.Column(db.String(10), nullable=False)  # create, update, delete
+    ref_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'action': self.action,
+            'ref_id': self.ref_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<ChangeEvent {self.id}: {self.action} {self.kind} {self.ref_id}>'
+
+class Job(db.Model):
+    """Background work queued for flask run-jobs: thumbnails, page renders, PDF exports, notifications"""
+    __table_args__ = (
+        db.Index('ix_job_ready', 'status', 'priority', 'run_at', 'id'),
+        db.Index('ix_job_dedupe', 'dedupe_key', 'status'),
+        db.Index('ix_job_kind_status', 'kind', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON arguments for the handler
+    status = db.Column(db.String(10), nullable=False, default='queued')  # queued, running, done, failed
+    priority = db.Column(db.Integer, nullable=False, default=2)  # 0 (urgent) runs first
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    dedupe_key = db.Column(db.String(200))  # one queued or running job per key
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # not before; retries back off
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'locked_by': self.locked_by,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<Job {self.id}: {self.kind} {self.status}>'
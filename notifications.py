@@ -0,0 +1,287 @@
+"""
+Crew notifications for Barnacle Films Inc.
+
+Announcements go out by email, and by SMS through an email-to-SMS
+gateway, over a small pool of SMTP connections kept open between sends.
+Recipients go in batches: one message with up to batch_size envelope
+recipients per SMTP transaction (its To: header names the crew list, so
+nobody sees anyone else's address), with the batches spread over every
+pooled connection at once. A token bucket keeps the recipients per
+second under the provider's limit.
+
+LocalSMTPServer stands in for a real server in development (flask
+smtp-sink) and in flask bench-notifications: it speaks enough SMTP for
+smtplib, hands over what it receives, and can add a delay per command
+to behave like a server across a network.
+"""
+
+import queue
+import re
+import smtplib
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email import message_from_bytes
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid, parseaddr
+
+SMS_LENGTH = 160
+LIST_ADDRESS = 'Barnacle Films Crew:;'  # an empty group: the recipients are all in the envelope
+
+
+class DeliveryFailed(Exception):
+    """Raised when some recipients could not be reached and are worth trying again"""
+
+
+def sms_address(phone, gateway_domain):
+    """Email-to-SMS address for a phone number, or None without a gateway or a full number"""
+    digits = re.sub(r'\D', '', phone or '')
+    if not gateway_domain or len(digits) < 10:
+        return None
+    return f'{digits}@{gateway_domain}'
+
+
+def compose(sender, subject, body, channel='email'):
+    """The one message every recipient of a channel gets; SMS is plain text cut to one segment"""
+    message = EmailMessage()
+    message['From'] = sender
+    message['To'] = LIST_ADDRESS
+    message['Date'] = formatdate(localtime=True)
+    # make_msgid() would otherwise look up this host's FQDN, which can stall on DNS
+    message['Message-ID'] = make_msgid(domain=parseaddr(sender)[1].rpartition('@')[2] or 'localhost')
+    if channel == 'sms':
+        text = f'{subject}: {body}' if body and body != subject else subject
+        message.set_content(text if len(text) <= SMS_LENGTH else text[:SMS_LENGTH - 1] + '…')
+    else:
+        message['Subject'] = subject
+        message.set_content(body)
+    return message
+
+
+class RateLimiter:
+    """Token bucket shared by threads; acquire(n) waits until n more sends fit under rate per second"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # A batch larger than the bucket borrows against the future instead of never fitting
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class SMTPPool:
+    """Up to size SMTP connections, opened on first use and kept between sends"""
+
+    def __init__(self, host, port, username=None, password=None, use_tls=False, size=4, timeout=10,
+                 rate=None, idle_seconds=60):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = size
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate) if rate else None
+        self.idle_seconds = idle_seconds
+        self._idle = queue.LifoQueue()  # (connection, last used)
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, local_hostname=socket.gethostname(), timeout=self.timeout)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password)
+        return smtp
+
+    @staticmethod
+    def _quit(smtp):
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    def _checkout(self):
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    smtp, used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                # Servers drop idle clients; a connection that sat a while is checked before it is trusted
+                if time.monotonic() - used < self.idle_seconds:
+                    return smtp
+                try:
+                    if smtp.noop()[0] == 250:
+                        return smtp
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._quit(smtp)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkin(self, smtp, healthy):
+        if healthy:
+            self._idle.put((smtp, time.monotonic()))
+        else:
+            self._quit(smtp)
+        self._slots.release()
+
+    def send(self, message, recipients):
+        """Send message to recipients in one transaction; returns {address: (code, reply)} of those refused"""
+        if self.limiter is not None:
+            self.limiter.acquire(len(recipients))
+        for attempt in (1, 2):
+            smtp = self._checkout()
+            try:
+                refused = smtp.send_message(message, to_addrs=recipients)
+            except smtplib.SMTPRecipientsRefused as e:
+                self._checkin(smtp, True)
+                return e.recipients
+            except smtplib.SMTPServerDisconnected:
+                self._checkin(smtp, False)
+                if attempt == 2:
+                    raise
+                continue  # closed by the server while it sat in the pool; once more on a new connection
+            except (smtplib.SMTPException, OSError):
+                self._checkin(smtp, False)
+                raise
+            self._checkin(smtp, True)
+            return refused
+
+    def close(self):
+        while True:
+            try:
+                smtp, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._quit(smtp)
+
+
+def fan_out(pool, sends, batch_size=50):
+    """Send each (key, message, recipients) in batches of at most batch_size over all of the pool's connections.
+
+    Yields (key, batch, refused, error) as each batch finishes: refused maps
+    the addresses the server rejected to its reply, error is whatever
+    stopped the whole batch (None if it went out).
+    """
+    # A small audience is split so it still goes out over every connection at once
+    total = sum(len(recipients) for _, _, recipients in sends)
+    batch_size = max(1, min(batch_size, -(-total // pool.size)))
+    batches = [(key, message, recipients[i:i + batch_size])
+               for key, message, recipients in sends
+               for i in range(0, len(recipients), batch_size)]
+    if not batches:
+        return
+    with ThreadPoolExecutor(max_workers=min(pool.size, len(batches)), thread_name_prefix='smtp') as executor:
+        futures = {executor.submit(pool.send, message, batch): (key, batch) for key, message, batch in batches}
+        for future in as_completed(futures):
+            key, batch = futures[future]
+            try:
+                yield key, batch, future.result(), None
+            except (smtplib.SMTPException, OSError) as e:
+                yield key, batch, {}, e
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, *lines):
+        self.wfile.write(''.join(f'{line}\r\n' for line in lines).encode('ascii'))
+
+    def handle(self):
+        server = self.server
+        self.reply('220 localhost Barnacle Films SMTP stand-in')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if server.delay:
+                time.sleep(server.delay)
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb == 'EHLO':
+                self.reply('250-localhost', '250-8BITMIME', '250 SIZE 10485760')
+            elif verb == 'HELO':
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                sender, recipients = parseaddr(command[10:])[1], []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = parseaddr(command[8:])[1]
+                if address in server.refuse:
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                if not recipients:
+                    self.reply('503 Need RCPT first')
+                    continue
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for line in iter(self.rfile.readline, b''):
+                    if line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(line[1:] if line.startswith(b'..') else line)
+                server.received(sender, recipients, b''.join(data))
+                sender, recipients = None, []
+                self.reply('250 OK queued')
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """SMTP stand-in on this machine; on_message(sender, recipients, message) gets every message it accepts"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, refuse=(), on_message=None):
+        super().__init__((host, port), _SMTPHandler)
+        self.delay = delay  # seconds before answering each command, as a remote server's round trip would
+        self.refuse = set(refuse)
+        self.on_message = on_message
+        self.messages = []
+        self._lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def received(self, sender, recipients, data):
+        message = message_from_bytes(data)
+        with self._lock:
+            self.messages.append((sender, recipients, message))
+        if self.on_message is not None:
+            self.on_message(sender, recipients, message)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='smtp-stand-in', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,68 @@
+"""
+Offline crew portal for Barnacle Films Inc.
+
+The service worker (static/js/service-worker.js, served as /sw.js) keeps
+what the crew needs on a set without signal in the browser's cache:
+today's call sheet, the schedule, contacts and the sides and script for
+the scenes being shot. What to keep is a manifest mapping each URL to a
+hash of its content. The worker downloads only the entries whose hash
+moved since its last sync and deletes the ones that left the manifest.
+
+Page hashes are built from change stamps and the release (the templates
+and static files of this deploy), so building the manifest never renders
+a page; document hashes are their content hashes.
+"""
+
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+RELEASE_SUFFIXES = ('.html', '.css', '.js')
+
+
+def short_hash(*parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:16]
+
+
+@lru_cache(maxsize=256)
+def _file_digest(path, mtime_ns, size):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()[:16]
+
+
+def file_digest(path):
+    """Content hash of a file, recomputed only when its size or mtime changes"""
+    stat = os.stat(path)
+    return _file_digest(path, stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=8)
+def release_digest(*folders):
+    """Hash of every template, stylesheet and script under folders; fixed for the life of the process"""
+    sha = hashlib.sha1()
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(RELEASE_SUFFIXES):
+                    path = os.path.join(root, name)
+                    sha.update(f'{os.path.relpath(path, folder)}={file_digest(path)};'.encode('utf-8'))
+    return sha.hexdigest()[:16]
+
+
+def manifest_version(entries):
+    """Version of a manifest ({url: hash}); equal versions mean nothing to download"""
+    return short_hash(*(f'{url}={digest}' for url, digest in sorted(entries.items())))
+
+
+def mentions(scene_numbers, names):
+    """Predicate for text that names one of the scenes (as a whole number) or characters"""
+    words = [str(number) for number in sorted(scene_numbers)] + [re.escape(name) for name in sorted(names)]
+    if not words:
+        return lambda text: False
+    pattern = re.compile(r'\b(?:' + '|'.join(words) + r')\b', re.IGNORECASE)
+    return lambda text: bool(text and pattern.search(text))
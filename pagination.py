@@ -0,0 +1,58 @@
+"""
+Keyset pagination for Barnacle Films Inc. listings.
+
+Pages are fetched with WHERE (sort key) < (last key seen) ORDER BY sort key
+LIMIT n, so every page is one index range scan however deep the reader
+scrolls, unlike OFFSET, which re-reads every row it skips. The last key
+of a page is handed back to the client as an opaque cursor.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import bindparam, tuple_
+
+
+def encode_cursor(values):
+    """Opaque cursor for a sort key (dates and datetimes as ISO strings)"""
+    plain = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(plain, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Sort key values from a cursor, converted to the columns' Python types; raises ValueError"""
+    try:
+        plain = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(plain, list) or len(plain) != len(columns):
+        raise ValueError('Invalid cursor')
+
+    values = []
+    for value, column in zip(plain, columns):
+        python_type = column.type.python_type
+        if python_type in (date, datetime) and isinstance(value, str):
+            value = python_type.fromisoformat(value)
+        elif not isinstance(value, python_type):
+            raise ValueError('Invalid cursor')
+        values.append(value)
+    return values
+
+
+def keyset_page(query, columns, key, cursor=None, limit=24, descending=True):
+    """One page of query ordered by columns (the last one unique) as (items, next_cursor).
+
+    key(item) returns an item's values for columns; next_cursor is None on
+    the last page.
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        bound = tuple_(*[bindparam(None, value, type_=column.type) for value, column in zip(values, columns)])
+        query = query.filter(tuple_(*columns) < bound if descending else tuple_(*columns) > bound)
+
+    query = query.order_by(None).order_by(*[column.desc() if descending else column.asc() for column in columns])
+    rows = query.limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = encode_cursor(key(items[-1])) if len(rows) > limit else None
+    return items, next_cursor
@@ -0,0 +1,189 @@
+"""
+Server-side PDF page rendering for Barnacle Films Inc.
+
+Pages are rasterized to WebP/PNG on a process pool and kept in a disk
+cache keyed by the document's content hash, page and width. Cache hits
+refresh the file's mtime, and the cache is trimmed back under its size
+budget least-recently-used first.
+"""
+
+import importlib.util
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+RENDER_WIDTHS = (480, 960, 1600)
+RENDER_FORMATS = {'webp': 'image/webp', 'png': 'image/png'}
+EVICT_INTERVAL = 30  # seconds between cache size checks
+
+
+class RenderUnavailable(Exception):
+    """Raised when PDF rendering is not installed on this server"""
+
+
+class RenderTimeout(Exception):
+    """Raised when a render does not finish in time (it keeps running in the pool)"""
+
+
+class UnreadablePDF(Exception):
+    """Raised when a file is not a PDF or is too damaged to open"""
+
+
+def snap_width(width):
+    """Smallest configured render width that covers the requested width"""
+    for candidate in RENDER_WIDTHS:
+        if width <= candidate:
+            return candidate
+    return RENDER_WIDTHS[-1]
+
+
+def _render_page(pdf_path, page_number, width, fmt, out_path):
+    """Rasterize one page to out_path (runs in a pool process)"""
+    import pymupdf
+    from PIL import Image
+
+    try:
+        with pymupdf.open(pdf_path, filetype='pdf') as pdf:
+            page = pdf[page_number - 1]
+            zoom = width / page.rect.width
+            pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+    except pymupdf.FileDataError as e:
+        raise UnreadablePDF(str(e)) from None
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    if fmt == 'webp':
+        image.save(tmp_path, format='WEBP', quality=80, method=4)
+    else:
+        image.save(tmp_path, format='PNG', optimize=True)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _read_page_sizes(pdf_path):
+    """Page sizes in points (runs in a pool process)"""
+    import pymupdf
+
+    try:
+        with pymupdf.open(pdf_path, filetype='pdf') as pdf:
+            return [[round(page.rect.width, 2), round(page.rect.height, 2)] for page in pdf]
+    except pymupdf.FileDataError as e:
+        raise UnreadablePDF(str(e)) from None
+
+
+class PageRenderCache:
+    """Disk cache of rendered PDF pages backed by a lazily started process pool"""
+
+    def __init__(self, root, max_bytes, max_workers=2):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._last_evict = 0.0
+
+    @staticmethod
+    def available():
+        return importlib.util.find_spec('pymupdf') is not None
+
+    def _pool(self):
+        if not self.available():
+            raise RenderUnavailable('PDF rendering requires PyMuPDF')
+        with self._lock:
+            # Started on first use so each gunicorn worker owns its own pool
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _document_dir(self, content_hash):
+        return os.path.join(self.root, content_hash[:2], content_hash)
+
+    def _submit(self, key, fn, *args):
+        """Submit fn to the pool, sharing one future between concurrent callers of the same key"""
+        with self._lock:
+            future = self._inflight.get(key)
+        if future is None:
+            pool = self._pool()
+            with self._lock:
+                future = self._inflight.get(key)
+                if future is None:
+                    future = self._inflight[key] = pool.submit(fn, *args)
+                    future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return future
+
+    def _run(self, key, fn, *args, timeout=None):
+        """Run fn on the pool (see _submit) and wait for its result"""
+        future = self._submit(key, fn, *args)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            raise RenderTimeout(f'Render timed out after {timeout}s')
+
+    def page_sizes(self, pdf_path, content_hash, timeout=30):
+        """[width, height] of every page, cached next to the rendered pages"""
+        info_path = os.path.join(self._document_dir(content_hash), 'info.json')
+        try:
+            with open(info_path) as f:
+                return json.load(f)['page_sizes']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        sizes = self._run(info_path, _read_page_sizes, pdf_path, timeout=timeout)
+        os.makedirs(os.path.dirname(info_path), exist_ok=True)
+        with open(f'{info_path}.{os.getpid()}.tmp', 'w') as f:
+            json.dump({'page_sizes': sizes}, f)
+        os.replace(f'{info_path}.{os.getpid()}.tmp', info_path)
+        return sizes
+
+    def page(self, pdf_path, content_hash, page_number, width, fmt, timeout=60):
+        """Path of the rendered page image, rendering it on a cache miss"""
+        out_path = os.path.join(self._document_dir(content_hash), f'{page_number}-{width}.{fmt}')
+        try:
+            os.utime(out_path)
+            return out_path
+        except FileNotFoundError:
+            pass
+
+        self._run(out_path, _render_page, pdf_path, page_number, width, fmt, out_path, timeout=timeout)
+        self.maybe_evict()
+        return out_path
+
+    def maybe_evict(self):
+        now = time.monotonic()
+        if now - self._last_evict >= EVICT_INTERVAL:
+            self._last_evict = now
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used files until the cache is back under budget"""
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            removed += 1
+        return removed
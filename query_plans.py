@@ -0,0 +1,56 @@
+"""
+Query plan checks for Barnacle Films Inc.
+
+Captures the SELECTs a block of code runs and asks the database how it
+would execute each one, flagging full table scans. SQLite is asked with
+EXPLAIN QUERY PLAN; PostgreSQL with EXPLAIN and sequential scans disabled,
+since on small tables it would rather scan than use a perfectly good
+index.
+"""
+
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# "SCAN scene" is a full scan; "SCAN scene USING INDEX ..." walks an index in order
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+@contextmanager
+def capture_selects(engine):
+    """Collect (statement, parameters) of every distinct SELECT run on engine inside the block"""
+    captured = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')) and not executemany:
+            captured.setdefault(statement, parameters)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain(connection, statement, parameters):
+    """Plan lines for statement"""
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+        return [row[-1] for row in rows]
+    # Lasts until the end of the connection's current transaction
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    rows = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters)
+    return [row[0] for row in rows]
+
+
+def full_scans(connection, statement, parameters):
+    """Tables statement reads with a full scan"""
+    pattern = SQLITE_FULL_SCAN if connection.dialect.name == 'sqlite' else POSTGRES_FULL_SCAN
+    tables = []
+    for line in explain(connection, statement, parameters):
+        match = pattern.search(line.strip())
+        if match:
+            tables.append(match.group(1))
+    return tables
@@ -0,0 +1,177 @@
+"""
+Per-request profiling for Barnacle Films Inc.
+
+When switched on, each request records its wall time, how many SQL
+statements it ran and how long they took, its slowest statements with
+their parameters, and its template render time. Profiles go into a
+fixed-size ring buffer per worker that the /debug console reads.
+
+Statements are grouped by shape (the SQL text with IN lists collapsed).
+A shape that runs repeat_threshold times or more in one request is
+flagged as a likely N+1: a query issued once per row of an earlier one.
+With server_timing on, each profiled response also carries its totals in
+a Server-Timing header, which browser dev tools and the load test read.
+"""
+
+import random
+import re
+import statistics
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+# "IN (?, ?, ?)" (SQLite) or "IN (%(id_1_1)s, %(id_1_2)s)" (PostgreSQL) of any length
+_IN_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s)\s*,)+\s*(?:\?|%\(\w+\)s)\s*\)')
+PARAMETERS_MAX_CHARS = 300
+
+
+def query_shape(statement):
+    """statement with whitespace normalized and IN lists collapsed, so per-row repeats compare equal"""
+    return _IN_LIST.sub('(?)', ' '.join(statement.split()))
+
+
+class RequestProfiler:
+    """Ring buffer of recent request profiles, filled from Flask and SQLAlchemy hooks"""
+
+    def __init__(self, capacity=200, sample_rate=1.0, slow_statements=5, repeat_threshold=5,
+                 skip_prefixes=('/static/', '/debug'), server_timing=False):
+        self.profiles = deque(maxlen=capacity)
+        self.sample_rate = sample_rate
+        self.slow_statements = slow_statements
+        self.repeat_threshold = repeat_threshold
+        self.skip_prefixes = tuple(skip_prefixes)
+        self.server_timing = server_timing
+        self._lock = threading.Lock()
+
+    def install(self, app, engine):
+        """Profile app's requests and the statements they run on engine"""
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        before_render_template.connect(self._template_started, app)
+        template_rendered.connect(self._template_finished, app)
+        event.listen(engine, 'before_cursor_execute', self._statement_started)
+        event.listen(engine, 'after_cursor_execute', self._statement_finished)
+
+    @staticmethod
+    def _current():
+        return g.get('_profile') if has_request_context() else None
+
+    def _start(self):
+        if request.path.startswith(self.skip_prefixes) or random.random() >= self.sample_rate:
+            return
+        g._profile = {'started': time.perf_counter(), 'statements': [], 'template_ms': 0.0,
+                      'templates': [], 'template_starts': []}
+
+    def _statement_started(self, conn, cursor, statement, parameters, context, executemany):
+        if self._current() is not None:
+            conn.info.setdefault('profile_starts', []).append(time.perf_counter())
+
+    def _statement_finished(self, conn, cursor, statement, parameters, context, executemany):
+        profile = self._current()
+        if profile is not None and conn.info.get('profile_starts'):
+            elapsed = (time.perf_counter() - conn.info['profile_starts'].pop()) * 1000
+            profile['statements'].append((statement, parameters, elapsed))
+
+    def _template_started(self, sender, template, context, **extra):
+        profile = self._current()
+        if profile is not None:
+            profile['template_starts'].append(time.perf_counter())
+
+    def _template_finished(self, sender, template, context, **extra):
+        profile = self._current()
+        if profile is not None and profile['template_starts']:
+            elapsed = (time.perf_counter() - profile['template_starts'].pop()) * 1000
+            # An outer render_template already counts the time of any it calls
+            if not profile['template_starts']:
+                profile['template_ms'] += elapsed
+            profile['templates'].append(template.name)
+
+    def _finish(self, response):
+        profile = g.get('_profile')
+        if profile is None:
+            return response
+        details = {
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'route': request.url_rule.rule if request.url_rule else None,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+        }
+        if response.is_streamed and not response.direct_passthrough:
+            # A streamed template renders, and queries, after this; its profile is taken when the
+            # response closes, too late for a Server-Timing header
+            response.call_on_close(lambda: self._record(profile, details))
+            return response
+        g.pop('_profile')
+        summary = self._record(profile, details)
+        if self.server_timing:
+            response.headers['Server-Timing'] = (
+                f"app;dur={summary['wall_ms']}, db;dur={summary['sql_ms']};desc=\"{summary['sql_count']} queries\", "
+                f"tpl;dur={summary['template_ms']}")
+        return response
+
+    def _record(self, profile, details):
+        summary = self._summarize(profile, details)
+        with self._lock:
+            self.profiles.append(summary)
+        return summary
+
+    def _summarize(self, profile, details):
+        statements = profile['statements']
+        shapes = {}
+        for statement, _, elapsed in statements:
+            entry = shapes.setdefault(query_shape(statement), [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+        slowest = sorted(statements, key=lambda item: item[2], reverse=True)[:self.slow_statements]
+        repeated = sorted(((count, total, shape) for shape, (count, total) in shapes.items()
+                           if count >= self.repeat_threshold), reverse=True)
+        return {
+            'at': datetime.utcnow().isoformat(timespec='seconds'),
+            **details,
+            'wall_ms': round((time.perf_counter() - profile['started']) * 1000, 2),
+            'sql_count': len(statements),
+            'sql_ms': round(sum(elapsed for _, _, elapsed in statements), 2),
+            'template_ms': round(profile['template_ms'], 2),
+            'templates': profile['templates'],
+            'slowest': [{'ms': round(elapsed, 3), 'statement': ' '.join(statement.split()),
+                         'parameters': repr(parameters)[:PARAMETERS_MAX_CHARS]}
+                        for statement, parameters, elapsed in slowest],
+            'repeated': [{'count': count, 'ms': round(total, 3), 'shape': shape} for count, total, shape in repeated],
+        }
+
+    def recent(self, limit=None):
+        """Profiles newest first"""
+        with self._lock:
+            profiles = list(self.profiles)
+        profiles.reverse()
+        return profiles[:limit] if limit else profiles
+
+    def routes(self):
+        """Per-route summary of the buffer, slowest median first"""
+        by_route = {}
+        for profile in self.recent():
+            by_route.setdefault((profile['method'], profile['route'] or profile['path']), []).append(profile)
+        summary = []
+        for (method, route), profiles in by_route.items():
+            summary.append({
+                'method': method,
+                'route': route,
+                'requests': len(profiles),
+                'median_ms': round(statistics.median(p['wall_ms'] for p in profiles), 2),
+                'max_ms': max(p['wall_ms'] for p in profiles),
+                'median_sql_count': statistics.median(p['sql_count'] for p in profiles),
+                'median_sql_ms': round(statistics.median(p['sql_ms'] for p in profiles), 2),
+                'median_template_ms': round(statistics.median(p['template_ms'] for p in profiles), 2),
+                'n_plus_one': sum(1 for p in profiles if p['repeated']),
+            })
+        summary.sort(key=lambda row: row['median_ms'], reverse=True)
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self.profiles.clear()
@@ -0,0 +1,157 @@
+"""
+Full-text search for the Barnacle Films crew portal.
+
+Scenes, call sheets, contacts and documents are indexed into a single
+search_index table: an FTS5 virtual table on SQLite, a tsvector column
+with a GIN index on PostgreSQL. Database triggers keep it current row by
+row, so writes through the ORM, the CLI or plain SQL are all indexed.
+
+Each source row maps to one index row whose key is id * 8 + kind code,
+which lets triggers replace entries by primary key instead of scanning.
+"""
+
+import re
+
+from markupsafe import escape
+from sqlalchemy import text
+
+# kind -> (code, source table, title expression, body columns); "{row}" is the row alias
+SEARCH_SOURCES = {
+    'scene': (1, 'scene', "'Scene ' || CAST({row}.scene_number AS TEXT) || ': ' || {row}.title",
+              ('location', 'characters', 'description', 'notes')),
+    'call_sheet': (2, 'call_sheet', '{row}.title',
+                   ('location', 'scenes', 'cast_notes', 'crew_notes', 'special_notes', 'weather_contingency')),
+    'contact': (3, 'contact', '{row}.name', ('role', 'department', 'notes')),
+    'document': (4, 'document', '{row}.title', ('description', 'filename')),
+}
+KIND_CODES = 8
+SNIPPET_START, SNIPPET_END = '\x02', '\x03'
+
+
+def _entry(kind, row, dialect):
+    """SQL expressions for the (rowid, kind, ref_id, title, body) of one index row"""
+    code, _, title, columns = SEARCH_SOURCES[kind]
+    if dialect == 'sqlite':
+        # No concat_ws before SQLite 3.44
+        body = 'trim(' + " || ' ' || ".join(f"coalesce({row}.{c}, '')" for c in columns) + ')'
+    else:
+        body = "concat_ws(' ', " + ', '.join(f'{row}.{c}' for c in columns) + ')'
+    return f'{row}.id * {KIND_CODES} + {code}', f"'{kind}'", f'{row}.id', title.format(row=row), body
+
+
+def _sqlite_statements():
+    yield ("CREATE VIRTUAL TABLE search_index USING fts5("
+           "kind UNINDEXED, ref_id UNINDEXED, title, body, tokenize='porter unicode61')")
+    for kind, (code, table, _, _) in SEARCH_SOURCES.items():
+        key, kind_sql, ref_id, title, body = _entry(kind, 'NEW', 'sqlite')
+        insert = (f'INSERT INTO search_index(rowid, kind, ref_id, title, body) '
+                  f'VALUES ({key}, {kind_sql}, {ref_id}, {title}, {body});')
+        delete = f'DELETE FROM search_index WHERE rowid = OLD.id * {KIND_CODES} + {code};'
+        yield f'CREATE TRIGGER search_{table}_ai AFTER INSERT ON {table} BEGIN {insert} END'
+        yield f'CREATE TRIGGER search_{table}_ad AFTER DELETE ON {table} BEGIN {delete} END'
+        yield f'CREATE TRIGGER search_{table}_au AFTER UPDATE ON {table} BEGIN {delete} {insert} END'
+
+
+def _postgresql_statements():
+    yield ("CREATE TABLE search_index ("
+           "rowid BIGINT PRIMARY KEY, kind VARCHAR(20) NOT NULL, ref_id INTEGER NOT NULL, "
+           "title TEXT, body TEXT, "
+           "document tsvector GENERATED ALWAYS AS ("
+           "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+           "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED)")
+    yield 'CREATE INDEX ix_search_index_document ON search_index USING GIN (document)'
+    for kind, (code, table, _, _) in SEARCH_SOURCES.items():
+        key, kind_sql, ref_id, title, body = _entry(kind, 'NEW', 'postgresql')
+        yield (f"CREATE OR REPLACE FUNCTION search_index_{table}() RETURNS trigger AS $$ BEGIN "
+               f"IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+               f"DELETE FROM search_index WHERE rowid = OLD.id * {KIND_CODES} + {code}; END IF; "
+               f"IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+               f"INSERT INTO search_index(rowid, kind, ref_id, title, body) "
+               f"VALUES ({key}, {kind_sql}, {ref_id}, {title}, {body}); END IF; "
+               f"RETURN NULL; END $$ LANGUAGE plpgsql")
+        yield (f'CREATE TRIGGER search_index_{table} AFTER INSERT OR UPDATE OR DELETE ON {table} '
+               f'FOR EACH ROW EXECUTE FUNCTION search_index_{table}()')
+
+
+def search_index_exists(connection):
+    if connection.dialect.name == 'sqlite':
+        sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+    else:
+        sql = "SELECT 1 FROM information_schema.tables WHERE table_name = 'search_index'"
+    return connection.execute(text(sql)).first() is not None
+
+
+def install_search_index(connection):
+    """Create the index and its triggers (if missing) and fill it from the source tables"""
+    if search_index_exists(connection):
+        return False
+    statements = _sqlite_statements if connection.dialect.name == 'sqlite' else _postgresql_statements
+    for statement in statements():
+        connection.execute(text(statement))
+    rebuild_search_index(connection)
+    return True
+
+
+def rebuild_search_index(connection):
+    """Re-read every source row into the index"""
+    connection.execute(text('DELETE FROM search_index'))
+    for kind, (_, table, _, _) in SEARCH_SOURCES.items():
+        key, kind_sql, ref_id, title, body = _entry(kind, table, connection.dialect.name)
+        connection.execute(text(
+            f'INSERT INTO search_index(rowid, kind, ref_id, title, body) '
+            f'SELECT {key}, {kind_sql}, {ref_id}, {title}, {body} FROM {table}'
+        ))
+
+
+def _fts5_query(query):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+    terms = re.findall(r'\w+', query, re.UNICODE)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _highlight(snippet):
+    """HTML-escape a snippet and turn the match markers into <mark> tags"""
+    return str(escape(snippet or '')).replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+
+
+def search(connection, query, kinds=None, limit=20, offset=0):
+    """Ranked matches for query as (total, [dict(kind, id, title, snippet, score)])"""
+    params = {'limit': limit, 'offset': offset}
+    kind_filter = ''
+    if kinds:
+        kinds = [kind for kind in kinds if kind in SEARCH_SOURCES]
+        if not kinds:
+            return 0, []
+        kind_filter = ' AND kind IN (' + ', '.join(f':kind{i}' for i in range(len(kinds))) + ')'
+        params.update({f'kind{i}': kind for i, kind in enumerate(kinds)})
+
+    if connection.dialect.name == 'sqlite':
+        params['query'] = _fts5_query(query)
+        if not params['query']:
+            return 0, []
+        where = 'search_index MATCH :query' + kind_filter
+        rows_sql = (f"SELECT kind, ref_id, title, "
+                    f"snippet(search_index, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16) AS snippet, "
+                    f"bm25(search_index, 0, 0, 10.0, 1.0) AS score "
+                    f"FROM search_index WHERE {where} ORDER BY score LIMIT :limit OFFSET :offset")
+    else:
+        params['query'] = query
+        where = "document @@ websearch_to_tsquery('english', :query)" + kind_filter
+        rows_sql = (f"SELECT kind, ref_id, title, "
+                    f"ts_headline('english', concat_ws(' ', title, body), "
+                    f"websearch_to_tsquery('english', :query), "
+                    f"'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxWords=24, MinWords=8') AS snippet, "
+                    f"-ts_rank_cd(document, websearch_to_tsquery('english', :query)) AS score "
+                    f"FROM search_index WHERE {where} ORDER BY score LIMIT :limit OFFSET :offset")
+
+    total = connection.execute(text(f'SELECT count(*) FROM search_index WHERE {where}'), params).scalar()
+    results = [
+        {'kind': row.kind, 'id': row.ref_id, 'title': row.title,
+         'snippet': _highlight(row.snippet), 'score': round(-row.score, 4)}
+        for row in connection.execute(text(rows_sql), params)
+    ]
+    return total, results
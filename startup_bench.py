@@ -0,0 +1,52 @@
+"""
+Startup benchmark for Barnacle Films Inc.
+
+Times what a freshly started worker pays before it can answer: importing
+app, create_app(), and the first and second request (the difference is
+the one-time cost the first visitor waits through). Every run is a new
+interpreter, so nothing is already imported or cached.
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+
+PHASES = ('import_ms', 'create_app_ms', 'first_request_ms', 'second_request_ms')
+
+_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+client = application.test_client()
+status = client.get(sys.argv[1]).status_code
+first = time.perf_counter()
+client.get(sys.argv[1])
+second = time.perf_counter()
+print(json.dumps({
+    'status': status,
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first - created) * 1000,
+    'second_request_ms': (second - first) * 1000,
+}))
+'''
+
+
+def probe(root, path='/'):
+    """One cold start in a new interpreter; raises RuntimeError if it fails"""
+    result = subprocess.run([sys.executable, '-c', _PROBE, path], cwd=root, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'probe failed')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(root, path='/', runs=5):
+    """Median of each phase over runs cold starts, plus the first request's status"""
+    samples = [probe(root, path) for _ in range(runs)]
+    medians = {phase: round(statistics.median(sample[phase] for sample in samples), 1) for phase in PHASES}
+    medians['status'] = samples[-1]['status']
+    return medians
@@ -16,17 +16,38 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Set up mobile optimizations
     setupMobileOptimizations();
+    
+    // Portal-wide search box
+    initializeSearch();
+    
+    // Keep today's call sheet, schedule, contacts and sides for use without signal
+    setupOfflineCache();
 });
 
-function initializeCrewFeatures() {
-    // Auto-refresh weather data every 5 minutes
-    if (document.getElementById('weather-widget')) {
-        setInterval(updateWeatherWidget, 300000);
+function setupOfflineCache() {
+    if (!('serviceWorker' in navigator)) {
+        return;
     }
-    
-    // Auto-refresh countdown every minute
-    if (document.getElementById('countdown')) {
-        setInterval(updateCountdownWidget, 60000);
+    navigator.serviceWorker.register('/sw.js')
+        .then(() => requestOfflineSync(false))
+        .catch(error => console.warn('Offline cache unavailable:', error));
+    window.addEventListener('online', () => requestOfflineSync(true));
+}
+
+function requestOfflineSync(force) {
+    // The worker throttles unforced syncs and only downloads what changed
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.ready.then(registration => {
+            registration.active.postMessage({type: 'sync', force: force});
+        });
+    }
+}
+
+function initializeCrewFeatures() {
+    // Widgets pinned to a location (call sheets) are not covered by the stream's weather
+    const weatherWidget = document.getElementById('weather-widget');
+    if (weatherWidget && weatherWidget.dataset.location) {
+        updateWeatherWidget();
     }
     
     // Initialize emergency contact quick dial
@@ -36,15 +57,109 @@ function initializeCrewFeatures() {
     setupCallSheetNotifications();
 }
 
+// Pages that display each kind of change pushed by /api/stream
+const STREAM_PAGES = {
+    call_sheet: ['/crew/dashboard', '/crew/callsheets', '/crew/schedule'],
+    scene: ['/crew/scenes', '/crew/shotlist', '/crew/schedule'],
+    announcement: ['/crew/dashboard'],
+    contact: ['/crew/contacts'],
+    document: ['/crew/documents', '/crew/scripts', '/crew/storyboards', '/crew/dailies', '/crew/gallery']
+};
+const STREAM_LABELS = {
+    call_sheet: 'Call sheets',
+    scene: 'Scenes',
+    announcement: 'Announcements',
+    contact: 'Contacts',
+    document: 'Documents'
+};
+let pollingTimers = null;
+
 function setupRealTimeUpdates() {
-    // Update dashboard data every 30 seconds
+    // Changes are pushed over Server-Sent Events; polling is only the fallback
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    
+    const stream = new EventSource('/api/stream');
+    stream.addEventListener('open', stopPolling);
+    stream.addEventListener('error', () => {
+        // EventSource retries dropped connections itself and only gives up
+        // for good (CLOSED) on a non-stream response such as a 401
+        if (stream.readyState === EventSource.CLOSED) {
+            startPolling();
+        }
+    });
+    
+    stream.addEventListener('weather', e => renderWeather(JSON.parse(e.data)));
+    stream.addEventListener('countdown', e => renderCountdown(JSON.parse(e.data)));
+    stream.addEventListener('reset', () => showReloadNotice('This page may be out of date.'));
+    
+    Object.keys(STREAM_PAGES).forEach(kind => {
+        stream.addEventListener(kind, e => handleStreamChange(kind, JSON.parse(e.data)));
+    });
+}
+
+function handleStreamChange(kind, change) {
+    requestOfflineSync(true);
+    
+    if (kind === 'call_sheet' && document.getElementById('countdown')) {
+        updateCountdownWidget();
+    }
+    
+    const path = window.location.pathname;
+    if (STREAM_PAGES[kind].some(prefix => path.startsWith(prefix))) {
+        if (kind === 'announcement' && change.action === 'create') {
+            showReloadNotice('New announcement posted.');
+        } else {
+            showReloadNotice(`${STREAM_LABELS[kind]} updated.`);
+        }
+    }
+}
+
+function showReloadNotice(message) {
+    // One notice at a time, however many changes arrive
+    if (document.getElementById('stream-reload-notice')) {
+        return;
+    }
+    showNotification(`${message} <a href="#" id="stream-reload-notice" class="alert-link">Reload</a>`, 'info');
+    document.getElementById('stream-reload-notice').addEventListener('click', e => {
+        e.preventDefault();
+        window.location.reload();
+    });
+}
+
+function startPolling() {
+    if (pollingTimers) {
+        return;
+    }
+    pollingTimers = [];
+    
     if (window.location.pathname.includes('/crew/dashboard')) {
-        setInterval(updateDashboardData, 30000);
+        // Update dashboard data every 30 seconds (weather and countdown included)
+        pollingTimers.push(setInterval(updateDashboardData, 30000));
+    } else {
+        // Auto-refresh weather data every 5 minutes
+        if (document.getElementById('weather-widget')) {
+            pollingTimers.push(setInterval(updateWeatherWidget, 300000));
+        }
+        
+        // Auto-refresh countdown every minute
+        if (document.getElementById('countdown')) {
+            pollingTimers.push(setInterval(updateCountdownWidget, 60000));
+        }
     }
     
     // Update schedule data every minute
     if (window.location.pathname.includes('/crew/schedule')) {
-        setInterval(updateScheduleData, 60000);
+        pollingTimers.push(setInterval(updateScheduleData, 60000));
+    }
+}
+
+function stopPolling() {
+    if (pollingTimers) {
+        pollingTimers.forEach(clearInterval);
+        pollingTimers = null;
     }
 }
 
@@ -92,41 +207,58 @@ function setupMobileOptimizations() {
 
 // Weather widget functionality
 async function updateWeatherWidget() {
+    const widget = document.getElementById('weather-widget');
+    const location = widget && widget.dataset.location;
     try {
-        const weatherData = await fetch('/api/weather');
-        const data = await weatherData.json();
-        
-        const widget = document.getElementById('weather-widget');
-        if (widget) {
-            widget.innerHTML = `
-                <div class="text-center">
-                    <div class="fs-4 text-primary">${data.temperature}</div>
-                    <div class="small text-muted">${data.condition}</div>
-                    <div class="small text-muted">${data.location}</div>
-                    <div class="small text-muted">Updated: ${data.updated}</div>
-                </div>
-            `;
-        }
+        const url = location ? `/api/weather?location=${encodeURIComponent(location)}` : '/api/weather';
+        const weatherData = await fetch(url);
+        renderWeather(weatherData.ok ? await weatherData.json() : null);
     } catch (error) {
         console.error('Weather update failed:', error);
+        renderWeather(null);
     }
 }
 
+function renderWeather(data) {
+    const widget = document.getElementById('weather-widget');
+    if (!widget || (data && widget.dataset.location && data.location !== widget.dataset.location)) {
+        return;
+    }
+    if (!data) {
+        widget.innerHTML = `
+            <div class="text-center text-muted">
+                <p>Weather unavailable</p>
+            </div>
+        `;
+        return;
+    }
+    widget.innerHTML = `
+        <div class="text-center">
+            <div class="fs-4 text-primary">${escapeHtml(data.temperature)}</div>
+            <div class="small text-muted">${escapeHtml(data.condition)}</div>
+            <div class="small text-muted">${escapeHtml(data.location)}</div>
+            <div class="small text-muted">Updated: ${escapeHtml(data.updated)}${data.stale ? ' (stale)' : ''}</div>
+        </div>
+    `;
+}
+
 // Countdown widget functionality
 async function updateCountdownWidget() {
     try {
         const countdownData = await fetch('/api/countdown');
-        const data = await countdownData.json();
-        
-        const countdown = document.getElementById('countdown');
-        if (countdown) {
-            countdown.textContent = data.countdown;
-        }
+        renderCountdown(await countdownData.json());
     } catch (error) {
         console.error('Countdown update failed:', error);
     }
 }
 
+function renderCountdown(data) {
+    const countdown = document.getElementById('countdown');
+    if (countdown) {
+        countdown.textContent = data.countdown;
+    }
+}
+
 // Emergency contact functionality
 function initializeEmergencyContacts() {
     const emergencyButtons = document.querySelectorAll('.emergency-contact');
@@ -164,37 +296,197 @@ function setupCallSheetNotifications() {
 }
 
 // File upload handling
+// Files are sent in checksummed chunks so a dropped connection resumes
+// where it left off instead of restarting the transfer.
+const UPLOAD_PARALLEL_CHUNKS = 3;
+const UPLOAD_MAX_RETRIES = 8;
+
 async function handleFileUpload(form) {
-    const formData = new FormData(form);
     const submitButton = form.querySelector('button[type="submit"]');
     const originalText = submitButton.textContent;
+    const fileInput = form.querySelector('input[type="file"]');
+    const file = fileInput && fileInput.files[0];
+    
+    if (!file) {
+        showNotification('Choose a file to upload', 'warning');
+        return;
+    }
     
     // Show loading state
     submitButton.textContent = 'Uploading...';
     submitButton.disabled = true;
     
     try {
-        const response = await fetch('/upload', {
-            method: 'POST',
-            body: formData
+        await uploadFileInChunks(file, {
+            title: form.querySelector('[name="title"]')?.value,
+            type: form.querySelector('[name="type"]')?.value,
+            description: form.querySelector('[name="description"]')?.value
+        }, percent => {
+            submitButton.textContent = `Uploading... ${percent}%`;
         });
         
-        const result = await response.json();
-        
-        if (result.success) {
-            showNotification('File uploaded successfully!', 'success');
-            form.reset();
-        } else {
-            showNotification(result.error || 'Upload failed', 'error');
-        }
+        showNotification('File uploaded successfully!', 'success');
+        form.reset();
     } catch (error) {
-        showNotification('Upload failed: ' + error.message, 'error');
+        showNotification('Upload failed: ' + error.message, 'danger');
     } finally {
         submitButton.textContent = originalText;
         submitButton.disabled = false;
     }
 }
 
+async function uploadFileInChunks(file, fields, onProgress) {
+    const resumeKey = `upload:${file.name}:${file.size}:${file.lastModified}`;
+    let upload = null;
+    
+    // Resume an interrupted upload of the same file if the server still has it
+    const savedId = localStorage.getItem(resumeKey);
+    if (savedId) {
+        const response = await fetch(`/api/uploads/${savedId}`);
+        if (response.ok) {
+            upload = await response.json();
+        }
+    }
+    
+    if (!upload) {
+        const response = await fetch('/api/uploads', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({...fields, filename: file.name, size: file.size})
+        });
+        upload = await response.json();
+        if (!response.ok) {
+            throw new Error(upload.error || 'Could not start upload');
+        }
+        localStorage.setItem(resumeKey, upload.upload_id);
+    }
+    
+    const received = new Set(upload.received);
+    const pending = [];
+    for (let index = 0; index < upload.chunk_count; index++) {
+        if (!received.has(index)) {
+            pending.push(index);
+        }
+    }
+    
+    const reportProgress = () => onProgress(Math.floor(100 * received.size / upload.chunk_count));
+    reportProgress();
+    
+    const worker = async () => {
+        while (pending.length) {
+            const index = pending.shift();
+            const start = index * upload.chunk_size;
+            await sendChunk(upload.upload_id, index, file.slice(start, start + upload.chunk_size));
+            received.add(index);
+            reportProgress();
+        }
+    };
+    await Promise.all(Array.from({length: UPLOAD_PARALLEL_CHUNKS}, worker));
+    
+    const response = await fetch(`/api/uploads/${upload.upload_id}/complete`, {method: 'POST'});
+    const result = await response.json();
+    if (!response.ok) {
+        throw new Error(result.error || 'Could not finish upload');
+    }
+    localStorage.removeItem(resumeKey);
+    return result;
+}
+
+async function sendChunk(uploadId, index, blob) {
+    const body = await blob.arrayBuffer();
+    const digest = await crypto.subtle.digest('SHA-256', body);
+    const checksum = Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+    
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const response = await fetch(`/api/uploads/${uploadId}/chunks/${index}`, {
+                method: 'PUT',
+                headers: {'Content-Type': 'application/octet-stream', 'X-Chunk-SHA256': checksum},
+                body
+            });
+            if (response.ok) {
+                return;
+            }
+            // Client errors other than a corrupted chunk will not fix themselves
+            if (response.status < 500 && response.status !== 422) {
+                throw new Error((await response.json()).error || `Chunk ${index} rejected`);
+            }
+        } catch (error) {
+            if (!(error instanceof TypeError) || attempt >= UPLOAD_MAX_RETRIES) {
+                throw error;
+            }
+        }
+        if (attempt >= UPLOAD_MAX_RETRIES) {
+            throw new Error(`Chunk ${index} failed after ${attempt + 1} attempts`);
+        }
+        
+        // Wait out flaky set Wi-Fi: back off, and hold until the browser is online
+        await new Promise(resolve => setTimeout(resolve, Math.min(30000, 1000 * 2 ** attempt)));
+        if (!navigator.onLine) {
+            await new Promise(resolve => window.addEventListener('online', resolve, {once: true}));
+        }
+    }
+}
+
+// Search
+const SEARCH_KIND_LABELS = {scene: 'Scene', call_sheet: 'Call Sheet', contact: 'Contact', document: 'Document'};
+
+function initializeSearch() {
+    const input = document.getElementById('crewSearch');
+    const results = document.getElementById('crewSearchResults');
+    if (!input || !results) {
+        return;
+    }
+    
+    let timer = null;
+    let controller = null;
+    
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(async () => {
+            const query = input.value.trim();
+            if (controller) {
+                controller.abort();
+            }
+            if (query.length < 2) {
+                results.classList.remove('show');
+                return;
+            }
+            
+            controller = new AbortController();
+            try {
+                const response = await fetch(`/api/search?q=${encodeURIComponent(query)}&per_page=8`,
+                                             {signal: controller.signal});
+                const data = await response.json();
+                results.innerHTML = data.results.length ? data.results.map(result => `
+                    <a class="dropdown-item text-wrap" href="${result.url}">
+                        <span class="badge bg-secondary me-1">${SEARCH_KIND_LABELS[result.kind]}</span>
+                        <strong>${escapeHtml(result.title)}</strong>
+                        <div class="small text-muted">${result.snippet}</div>
+                    </a>`).join('') : '<span class="dropdown-item-text text-muted">No matches</span>';
+                results.classList.add('show');
+            } catch (error) {
+                if (error.name !== 'AbortError') {
+                    console.error('Search failed:', error);
+                }
+            }
+        }, 200);
+    });
+    
+    input.form.addEventListener('submit', e => e.preventDefault());
+    document.addEventListener('click', e => {
+        if (!input.form.contains(e.target)) {
+            results.classList.remove('show');
+        }
+    });
+}
+
+function escapeHtml(value) {
+    const div = document.createElement('div');
+    div.textContent = value || '';
+    return div.innerHTML;
+}
+
 // Drag and drop file handling
 function handleDragOver(e) {
     e.preventDefault();
@@ -221,9 +513,18 @@ function handleFileDrop(e) {
 
 // Dashboard data updates
 async function updateDashboardData() {
-    // Update any dynamic dashboard content
-    await updateWeatherWidget();
-    await updateCountdownWidget();
+    // One request covers the whole dashboard; the browser revalidates it
+    // with If-None-Match, so an unchanged dashboard is a bodyless 304
+    try {
+        const response = await fetch('/api/dashboard');
+        const data = await response.json();
+        if (data.weather) {
+            renderWeather(data.weather);
+        }
+        renderCountdown(data.countdown);
+    } catch (error) {
+        console.error('Dashboard update failed:', error);
+    }
 }
 
 // Schedule data updates
@@ -283,5 +584,6 @@ window.CrewPortal = {
     quickCall,
     quickEmail,
     quickSMS,
-    handleFileUpload
+    handleFileUpload,
+    uploadFileInChunks
 };
@@ -0,0 +1,66 @@
+/**
+ * Infinite scroll for Barnacle Films Inc. lists
+ * Loads the next keyset page when the "Load more" link comes into view;
+ * without JavaScript the link still goes to the next page.
+ */
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('[data-infinite-scroll]').forEach(setupInfiniteScroll);
+});
+
+function setupInfiniteScroll(sentinel) {
+    const list = document.querySelector(sentinel.dataset.list);
+    const link = sentinel.querySelector('a');
+    if (!list || !('IntersectionObserver' in window)) {
+        return;
+    }
+
+    let loading = false;
+
+    async function loadMore() {
+        if (loading) {
+            return;
+        }
+        loading = true;
+        try {
+            const response = await fetch(sentinel.dataset.nextUrl, {headers: {'Accept': 'application/json'}});
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            const data = await response.json();
+            list.insertAdjacentHTML('beforeend', data.html);
+
+            if (!data.next_cursor) {
+                observer.disconnect();
+                sentinel.remove();
+                return;
+            }
+            sentinel.dataset.nextUrl = withCursor(sentinel.dataset.nextUrl, data.next_cursor);
+            link.href = withCursor(link.href, data.next_cursor);
+
+            // Still in view (short pages, tall screens): keep going
+            observer.unobserve(sentinel);
+            observer.observe(sentinel);
+        } catch (error) {
+            // Leave the link in place so the reader can page on by hand
+            console.error('Loading more failed:', error);
+            observer.disconnect();
+        } finally {
+            loading = false;
+        }
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadMore();
+        }
+    }, {rootMargin: '600px 0px'});
+
+    observer.observe(sentinel);
+}
+
+function withCursor(url, cursor) {
+    const next = new URL(url, window.location.href);
+    next.searchParams.set('cursor', cursor);
+    return next.pathname + next.search;
+}
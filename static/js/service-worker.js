@@ -0,0 +1,170 @@
+/**
+ * Service worker for the Barnacle Films Inc. crew portal.
+ * Keeps today's call sheet, the schedule, contacts and the sides and script
+ * for scheduled scenes in Cache Storage, synced from /api/offline/manifest
+ * by content hash, and answers from there when the signal is weak or gone.
+ * Served as /sw.js so its scope covers documents as well as /crew/ pages.
+ */
+
+const PRECACHE = 'barnacle-offline-v1';
+const RUNTIME = 'barnacle-runtime-v1';
+const MANIFEST_URL = '/api/offline/manifest';
+const OFFLINE_PAGE = '/crew/offline';
+// Past this the kept copy is shown instead of waiting on a bar of signal
+const NETWORK_TIMEOUT_MS = 3000;
+const SYNC_INTERVAL_MS = 60000;
+const SYNC_CONCURRENCY = 3;
+// Stylesheets, scripts and fonts the pages load from CDNs, kept as they are used
+const CDN_HOSTS = ['cdn.jsdelivr.net', 'cdnjs.cloudflare.com', 'fonts.googleapis.com', 'fonts.gstatic.com'];
+
+let syncing = null;
+let lastSync = 0;
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', event => {
+    // Drop the caches of older versions of this worker
+    event.waitUntil(caches.keys()
+        .then(names => Promise.all(names
+            .filter(name => name.startsWith('barnacle-') && name !== PRECACHE && name !== RUNTIME)
+            .map(name => caches.delete(name))))
+        .then(() => self.clients.claim()));
+});
+
+self.addEventListener('message', event => {
+    // Pages ask for a sync on load, when the connection returns and when the stream reports a change
+    if (event.data && event.data.type === 'sync') {
+        event.waitUntil(sync(event.data.force));
+    }
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+
+    if (url.origin !== self.location.origin) {
+        if (CDN_HOSTS.includes(url.hostname)) {
+            event.respondWith(staleWhileRevalidate(request));
+        }
+        return;
+    }
+    if (url.pathname === '/crew/logout') {
+        // Nothing from the portal stays on a device after logging out
+        event.waitUntil(caches.delete(PRECACHE));
+        return;
+    }
+    if (url.pathname.startsWith('/static/') || url.pathname.startsWith('/download/')) {
+        event.respondWith(keptFirst(request));
+    } else if (request.mode === 'navigate' && url.pathname.startsWith('/crew/')) {
+        event.respondWith(networkFirst(request));
+    }
+    // Everything else, /api/ included, goes straight to the network
+});
+
+function sync(force) {
+    // One sync at a time, and at most one a minute unless something is known to have changed
+    if (!syncing && (force || Date.now() - lastSync > SYNC_INTERVAL_MS)) {
+        lastSync = Date.now();
+        syncing = syncManifest()
+            .catch(error => console.warn('Offline sync failed:', error))
+            .finally(() => { syncing = null; });
+    }
+    return syncing || Promise.resolve();
+}
+
+async function syncManifest() {
+    const cache = await caches.open(PRECACHE);
+    const kept = await cache.match(MANIFEST_URL);
+    const previous = kept ? await kept.json() : {version: null, entries: {}};
+
+    const response = await fetch(`${MANIFEST_URL}?since=${encodeURIComponent(previous.version || '')}`,
+                                 {cache: 'no-store'});
+    if (!response.ok) {
+        return;  // 304: nothing changed; 401: logged out
+    }
+    const manifest = await response.json();
+
+    // Only entries whose content hash moved are downloaded again
+    const queue = Object.keys(manifest.entries).filter(url => previous.entries[url] !== manifest.entries[url]);
+    const failed = [];
+    const download = async () => {
+        while (queue.length) {
+            const url = queue.shift();
+            if (!(await keep(cache, url))) {
+                failed.push(url);
+            }
+        }
+    };
+    await Promise.all(Array.from({length: SYNC_CONCURRENCY}, download));
+
+    const removed = Object.keys(previous.entries).filter(url => !(url in manifest.entries));
+    await Promise.all(removed.map(url => cache.delete(url)));
+
+    // Failed entries keep the hash of the copy still cached (if any), so the next sync retries them
+    failed.forEach(url => {
+        if (url in previous.entries) {
+            manifest.entries[url] = previous.entries[url];
+        } else {
+            delete manifest.entries[url];
+        }
+    });
+    if (failed.length) {
+        manifest.version = null;
+    }
+    await cache.put(MANIFEST_URL, new Response(JSON.stringify(manifest),
+                                               {headers: {'Content-Type': 'application/json'}}));
+}
+
+async function keep(cache, url) {
+    try {
+        const response = await fetch(url, {cache: 'no-cache'});
+        // A redirect is the login page after the session expired; never keep it in place of the page
+        if (!response.ok || response.redirected) {
+            return false;
+        }
+        await cache.put(url, response);
+        return true;
+    } catch (error) {
+        return false;
+    }
+}
+
+async function keptFirst(request) {
+    // Kept files are replaced whenever their hash changes, so a kept copy is current as of the last sync;
+    // downloads are kept without ?inline=1 and serve both
+    const cached = await caches.match(request, {cacheName: PRECACHE, ignoreSearch: true});
+    return cached || fetch(request);
+}
+
+async function networkFirst(request) {
+    const cached = await caches.match(request, {cacheName: PRECACHE});
+    const offline = () => cached || caches.match(OFFLINE_PAGE, {cacheName: PRECACHE})
+        .then(page => page || Response.error());
+    if (!navigator.onLine) {
+        return offline();
+    }
+
+    const network = fetch(request).catch(offline);
+    if (!cached) {
+        return network;
+    }
+    const timeout = new Promise(resolve => setTimeout(() => resolve(cached), NETWORK_TIMEOUT_MS));
+    return Promise.race([network, timeout]);
+}
+
+async function staleWhileRevalidate(request) {
+    const cache = await caches.open(RUNTIME);
+    const cached = await cache.match(request);
+    const network = fetch(request)
+        .then(response => {
+            if (response.ok || response.type === 'opaque') {
+                cache.put(request, response.clone());
+            }
+            return response;
+        })
+        .catch(() => cached || Response.error());
+    return cached || network;
+}
@@ -0,0 +1,158 @@
+"""
+Static asset pipeline for Barnacle Films Inc.
+
+Stylesheets and scripts under static/css and static/js are minified,
+named after a hash of their content and stored with gzip and brotli
+copies under static/dist, next to a manifest mapping each source to its
+built name. url_for('static', ...) resolves to the built names. A built
+file never changes, so it is served with a year-long immutable
+Cache-Control in the best encoding the client accepts: repeat visits
+make no asset requests and nothing is compressed per request.
+
+Built files keep their directory (css/, js/) under dist, so stylesheets
+must not use url()s that climb out of it. Minifying needs rcssmin and
+rjsmin and brotli copies need Brotli; without them files are copied as
+they are and only gzipped.
+"""
+
+import gzip
+import hashlib
+import importlib.util
+import json
+import mimetypes
+import os
+
+from flask import request, send_file
+
+SOURCE_FOLDERS = ('css', 'js')
+MANIFEST = 'manifest.json'
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+
+def _minify(name, text):
+    if name.endswith('.css') and importlib.util.find_spec('rcssmin'):
+        import rcssmin
+        return rcssmin.cssmin(text)
+    if name.endswith('.js') and importlib.util.find_spec('rjsmin'):
+        import rjsmin
+        return rjsmin.jsmin(text)
+    return text
+
+
+def _compress(encoding, data):
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if importlib.util.find_spec('brotli'):
+        import brotli
+        return brotli.compress(data, quality=11)
+    return None
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class StaticAssets:
+    """Built copies of the static stylesheets and scripts, and how to send them"""
+
+    def __init__(self, static_folder, folder='dist', max_age=365 * 24 * 3600):
+        self.static_folder = static_folder
+        self.folder = folder
+        self.max_age = max_age
+        self.assets = {}  # source name -> {'file': built name, 'source': source hash, 'encodings': [...]}
+        self._built = {}  # built name -> encodings
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.static_folder, self.folder, MANIFEST)
+
+    def _current(self, entry, digest):
+        return (entry is not None and entry['source'] == digest and all(
+            os.path.isfile(os.path.join(self.static_folder, entry['file'] + suffix))
+            for suffix in [''] + [ENCODINGS[encoding] for encoding in entry['encodings']]))
+
+    def build(self):
+        """Build every source that changed since the last build; returns how many were built"""
+        try:
+            with open(self.manifest_path) as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = {}
+
+        assets, built = {}, 0
+        for source_folder in SOURCE_FOLDERS:
+            for root, dirs, files in os.walk(os.path.join(self.static_folder, source_folder)):
+                dirs.sort()
+                for filename in sorted(files):
+                    if not filename.endswith(('.css', '.js')):
+                        continue
+                    path = os.path.join(root, filename)
+                    name = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                    with open(path, 'rb') as f:
+                        raw = f.read()
+                    digest = hashlib.sha256(raw).hexdigest()
+                    if self._current(previous.get(name), digest):
+                        assets[name] = previous[name]
+                        continue
+
+                    data = _minify(name, raw.decode('utf-8')).encode('utf-8')
+                    stem, extension = os.path.splitext(name)
+                    file = f'{self.folder}/{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}'
+                    out_path = os.path.join(self.static_folder, file)
+                    _write(out_path, data)
+                    encodings = []
+                    for encoding, suffix in ENCODINGS.items():
+                        compressed = _compress(encoding, data)
+                        if compressed is not None and len(compressed) < len(data):
+                            _write(out_path + suffix, compressed)
+                            encodings.append(encoding)
+                    assets[name] = {'file': file, 'source': digest, 'encodings': encodings}
+                    built += 1
+
+        if assets != previous:
+            _write(self.manifest_path, json.dumps(assets, indent=2, sort_keys=True).encode('utf-8'))
+        self.assets = assets
+        self._built = {entry['file']: entry['encodings'] for entry in assets.values()}
+        return built
+
+    def clean(self):
+        """Delete built files the manifest no longer names; returns how many"""
+        keep = {MANIFEST}
+        for entry in self.assets.values():
+            keep.add(entry['file'][len(self.folder) + 1:])
+            keep.update(entry['file'][len(self.folder) + 1:] + ENCODINGS[e] for e in entry['encodings'])
+        removed = 0
+        out = os.path.join(self.static_folder, self.folder)
+        for root, _, files in os.walk(out):
+            for filename in files:
+                path = os.path.join(root, filename)
+                if os.path.relpath(path, out).replace(os.sep, '/') not in keep:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+    def url_filename(self, filename):
+        """The built name to link to for a static filename (the filename itself if it is not built)"""
+        entry = self.assets.get(filename)
+        return entry['file'] if entry else filename
+
+    def send(self, filename):
+        """Response for a built file in the best encoding the client accepts, or None if filename is not one"""
+        encodings = self._built.get(filename)
+        if encodings is None:
+            return None
+        path = os.path.join(self.static_folder, filename)
+        encoding = next((e for e in encodings if request.accept_encodings[e]), None)
+        response = send_file(path + ENCODINGS[encoding] if encoding else path,
+                             mimetype=mimetypes.guess_type(filename)[0], conditional=True, max_age=self.max_age)
+        if encoding:
+            response.content_encoding = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
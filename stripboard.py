@@ -0,0 +1,356 @@
+"""
+Stripboard scheduling for Barnacle Films Inc.
+
+Every scene is a strip: where it shoots, day or night, which characters
+it needs and how many hours it takes. plan() deals the strips out into
+shoot days, first greedily (grouped by shift, location and cast) and then
+by local search that moves single strips, swaps pairs between days and
+reorders whole days until its time budget runs out.
+
+A plan's cost adds up shoot days, company moves (every location past the
+first within a day), cast days (each character's first to last day, since
+holding days are paid), overtime past the daily hour cap and days that
+mix day and night work. Each move is scored from only the days and
+characters it touches, which keeps a re-plan of a thousand scenes within
+a couple of seconds; passing the previous plan as initial starts the
+search from there instead of from scratch.
+"""
+
+import math
+import random
+import re
+import time
+from collections import Counter
+
+DEFAULT_WEIGHTS = {
+    'day': 100,             # each shoot day
+    'company_move': 60,     # each extra location within a day
+    'cast_day': 10,         # each day from a character's first to last day
+    'overtime_hour': 1000,  # each hour past the daily cap, high enough to act as a hard limit
+    'mixed_shift': 500,     # a day holding both day and night scenes
+}
+NIGHT_TIMES = ('NIGHT', 'EVENING')
+
+DURATION = re.compile(r'(\d+(?:\.\d+)?)(?:\s*(?:-|–|to)\s*(\d+(?:\.\d+)?))?\s*([a-z]*)', re.IGNORECASE)
+
+
+def parse_duration(text, default=1.0):
+    """Screen minutes in an estimated duration: "2-3 minutes" (the middle of a range), "90 seconds", "1.5 min" """
+    match = DURATION.search(text or '')
+    if not match:
+        return default
+    low = float(match.group(1))
+    high = float(match.group(2) or low)
+    minutes = (low + high) / 2
+    unit = match.group(3).lower()
+    if unit.startswith('s'):
+        minutes /= 60
+    elif unit.startswith('h'):
+        minutes *= 60
+    return minutes
+
+
+class Strip:
+    """One scene on the board"""
+
+    __slots__ = ('id', 'label', 'location', 'night', 'exterior', 'cast', 'hours')
+
+    def __init__(self, id, location, hours, time_of_day='DAY', scene_type='INT', cast=(), label=None):
+        self.id = id
+        self.label = label if label is not None else str(id)
+        self.location = location
+        self.hours = hours
+        self.night = (time_of_day or '').upper() in NIGHT_TIMES
+        self.exterior = 'EXT' in (scene_type or '').upper()
+        self.cast = frozenset(cast)
+
+    def __repr__(self):
+        return f'<Strip {self.label}>'
+
+
+class ShootDay:
+    """A planned day: its strips in shooting order"""
+
+    def __init__(self, number, strips):
+        # Exteriors first while there is light, then one location at a time
+        self.number = number
+        self.strips = sorted(strips, key=lambda strip: (not strip.exterior, strip.location, strip.label))
+        self.hours = sum(strip.hours for strip in strips)
+        hours_at = Counter()
+        for strip in strips:
+            hours_at[strip.location] += strip.hours
+        self.locations = [location for location, _ in hours_at.most_common()]
+        self.night = sum(strip.night for strip in strips) * 2 > len(strips)
+        self.cast = sorted(set().union(*(strip.cast for strip in strips)))
+
+    def to_dict(self):
+        return {
+            'day': self.number,
+            'hours': round(self.hours, 2),
+            'shift': 'night' if self.night else 'day',
+            'locations': self.locations,
+            'cast': self.cast,
+            'strips': [strip.id for strip in self.strips],
+            'labels': [strip.label for strip in self.strips]
+        }
+
+
+class Stripboard:
+    """Result of plan(): the shoot days in order and what they cost"""
+
+    def __init__(self, days, day_hours, weights, iterations):
+        self.days = days
+        self.day_hours = day_hours
+        self.weights = weights
+        self.iterations = iterations
+
+    def cast_days(self):
+        """{character: (first day number, last day number)}"""
+        spans = {}
+        for day in self.days:
+            for name in day.cast:
+                first, _ = spans.get(name, (day.number, day.number))
+                spans[name] = (first, day.number)
+        return spans
+
+    def summary(self):
+        spans = self.cast_days()
+        summary = {
+            'days': len(self.days),
+            'company_moves': sum(len(day.locations) - 1 for day in self.days),
+            'cast_days': sum(last - first + 1 for first, last in spans.values()),
+            'overtime_hours': round(sum(max(0.0, day.hours - self.day_hours) for day in self.days), 2),
+            'mixed_shift_days': sum(1 for day in self.days if len({strip.night for strip in day.strips}) > 1),
+        }
+        w = self.weights
+        summary['cost'] = round(
+            w['day'] * summary['days'] + w['company_move'] * summary['company_moves']
+            + w['cast_day'] * summary['cast_days'] + w['overtime_hour'] * summary['overtime_hours']
+            + w['mixed_shift'] * summary['mixed_shift_days'], 2)
+        return summary
+
+    def to_dict(self):
+        return {
+            'summary': self.summary(),
+            'iterations': self.iterations,
+            'cast_days': {name: {'first': first, 'last': last} for name, (first, last) in self.cast_days().items()},
+            'days': [day.to_dict() for day in self.days]
+        }
+
+
+class _Board:
+    """Mutable assignment of strips to days with per-day and per-character running totals"""
+
+    def __init__(self, strips, day_hours, weights, groups):
+        self.strips = strips
+        self.day_hours = day_hours
+        self.weights = weights
+        self.load(groups)
+
+    def load(self, groups):
+        groups = [group for group in groups if group]
+        self.day_of = [0] * len(self.strips)
+        self.members = [set() for _ in groups]
+        self.hours = [0.0] * len(groups)
+        self.nights = [0] * len(groups)
+        self.locations = [Counter() for _ in groups]
+        self.cast_days = {}  # character -> Counter of day -> strips
+        self.spans = {}  # character -> (first day, last day), except for those in stale
+        self.stale = set()
+        for day, group in enumerate(groups):
+            for index in group:
+                self.add(index, day)
+        self.empty_days = 0
+        self.cost = (sum(self.day_cost(day) for day in range(len(groups)))
+                     + sum(self.cast_cost(name) for name in self.cast_days))
+
+    def add(self, index, day):
+        strip = self.strips[index]
+        self.day_of[index] = day
+        self.members[day].add(index)
+        self.hours[day] += strip.hours
+        self.nights[day] += strip.night
+        self.locations[day][strip.location] += 1
+        for name in strip.cast:
+            self.cast_days.setdefault(name, Counter())[day] += 1
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = (day, day)
+            elif day < span[0] or day > span[1]:
+                self.spans[name] = (min(span[0], day), max(span[1], day))
+
+    def remove(self, index):
+        strip = self.strips[index]
+        day = self.day_of[index]
+        self.members[day].discard(index)
+        self.hours[day] -= strip.hours
+        self.nights[day] -= strip.night
+        locations = self.locations[day]
+        locations[strip.location] -= 1
+        if not locations[strip.location]:
+            del locations[strip.location]
+        for name in strip.cast:
+            days = self.cast_days[name]
+            days[day] -= 1
+            if not days[day]:
+                del days[day]
+                if not days:
+                    del self.spans[name]
+                    self.stale.discard(name)
+                elif day in self.spans[name]:
+                    self.stale.add(name)
+
+    def day_cost(self, day):
+        size = len(self.members[day])
+        if not size:
+            return 0.0
+        w = self.weights
+        return (w['day'] + w['company_move'] * (len(self.locations[day]) - 1)
+                + w['overtime_hour'] * max(0.0, self.hours[day] - self.day_hours)
+                + (w['mixed_shift'] if 0 < self.nights[day] < size else 0))
+
+    def cast_cost(self, name):
+        if name in self.stale:
+            # Only recomputed when a strip left the character's first or last day
+            days = self.cast_days[name]
+            self.spans[name] = (min(days), max(days))
+            self.stale.discard(name)
+        span = self.spans.get(name)
+        return self.weights['cast_day'] * (span[1] - span[0] + 1) if span else 0.0
+
+    def apply(self, moves):
+        """Move strips ((index, day) pairs) and return the change in cost"""
+        days = set()
+        names = set()
+        for index, day in moves:
+            days.add(day)
+            days.add(self.day_of[index])
+            names.update(self.strips[index].cast)
+        before = sum(self.day_cost(day) for day in days) + sum(self.cast_cost(name) for name in names)
+        before_empty = sum(1 for day in days if not self.members[day])
+        for index, day in moves:
+            self.remove(index)
+            self.add(index, day)
+        after = sum(self.day_cost(day) for day in days) + sum(self.cast_cost(name) for name in names)
+        self.cost += after - before
+        self.empty_days += sum(1 for day in days if not self.members[day]) - before_empty
+        return after - before
+
+    def groups(self, day_of=None):
+        """Strip indexes per day in day order, leaving out empty days"""
+        groups = [[] for _ in self.members]
+        for index, day in enumerate(self.day_of if day_of is None else day_of):
+            groups[day].append(index)
+        return [group for group in groups if group]
+
+
+def _greedy_groups(strips, day_hours):
+    """Fill days in (shift, location, cast) order, starting a new day when full or when the shift changes"""
+    order = sorted(range(len(strips)), key=lambda i: (strips[i].night, strips[i].location,
+                                                        sorted(strips[i].cast), strips[i].label))
+    groups = []
+    hours = 0.0
+    for index in order:
+        strip = strips[index]
+        if not groups or hours + strip.hours > day_hours or strips[groups[-1][0]].night != strip.night:
+            groups.append([])
+            hours = 0.0
+        groups[-1].append(index)
+        hours += strip.hours
+    return groups
+
+
+def plan(strips, day_hours=10.0, initial=None, time_limit=1.5, max_iterations=None, weights=None, seed=0):
+    """Plan strips into shoot days and return a Stripboard.
+
+    initial is a previous plan as lists of strip ids per day; strips it
+    does not mention are added to whichever day they cost least on.
+    The search stops after time_limit seconds or max_iterations moves.
+    """
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    strips = list(strips)
+    if not strips:
+        return Stripboard([], day_hours, weights, 0)
+    rng = random.Random(seed)
+
+    if initial:
+        position = {strip.id: index for index, strip in enumerate(strips)}
+        groups = [[position[id] for id in day if id in position] for day in initial]
+        placed = {index for group in groups for index in group}
+        unplaced = [index for index in range(len(strips)) if index not in placed]
+        # New strips start on days of their own, then join whichever day they cost least on
+        board = _Board(strips, day_hours, weights, groups + [[index] for index in unplaced])
+        for index in unplaced:
+            home = board.day_of[index]
+            best_day, best_delta = home, 0.0
+            for day in range(len(board.members)):
+                if day != home:
+                    delta = board.apply([(index, day)])
+                    if delta < best_delta:
+                        best_day, best_delta = day, delta
+                    board.apply([(index, home)])
+            if best_day != home:
+                board.apply([(index, best_day)])
+        board.load(board.groups())
+    else:
+        board = _Board(strips, day_hours, weights, _greedy_groups(strips, day_hours))
+
+    # Strips sharing a location or a character, to aim moves at days where they can help
+    by_location = {}
+    by_name = {}
+    for index, strip in enumerate(strips):
+        by_location.setdefault(strip.location, []).append(index)
+        for name in strip.cast:
+            by_name.setdefault(name, []).append(index)
+
+    # Kept as groups rather than day numbers, which compaction renumbers
+    best_cost, best_groups = board.cost, board.groups()
+    start = time.monotonic()
+    temperature = start_temperature = weights['company_move']
+    iterations = 0
+    while max_iterations is None or iterations < max_iterations:
+        if iterations % 128 == 0:
+            elapsed = time.monotonic() - start
+            if elapsed >= time_limit:
+                break
+            temperature = start_temperature * (1 - elapsed / time_limit) + 1e-3
+        iterations += 1
+        day_count = len(board.members)
+
+        index = rng.randrange(len(strips))
+        strip = strips[index]
+        if strip.cast and rng.random() < 0.3:
+            partner = rng.choice(by_name[rng.choice(tuple(strip.cast))])
+        else:
+            partner = rng.choice(by_location[strip.location])
+        roll = rng.random()
+        if roll < 0.5:
+            # Move one strip next to a strip it shares something with (or anywhere)
+            target = board.day_of[partner] if rng.random() < 0.8 else rng.randrange(day_count)
+            moves = [(index, target)]
+        elif roll < 0.8:
+            # Swap two strips between days
+            other = partner if rng.random() < 0.5 else rng.randrange(len(strips))
+            moves = [(index, board.day_of[other]), (other, board.day_of[index])]
+        else:
+            # Swap two whole days in the running order
+            a, b = board.day_of[index], rng.randrange(day_count)
+            moves = [(i, b) for i in board.members[a]] + [(i, a) for i in board.members[b]]
+        if all(board.day_of[i] == day for i, day in moves):
+            continue
+
+        undo = [(i, board.day_of[i]) for i, _ in moves]
+        delta = board.apply(moves)
+        if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+            if board.empty_days * 20 > day_count:
+                # Emptied days still count toward cast spans; close the gaps once they add up
+                board.load(board.groups())
+            if board.cost < best_cost - 1e-9:
+                best_cost, best_groups = board.cost, board.groups()
+        else:
+            board.apply(undo)
+
+    days = [ShootDay(number, [strips[index] for index in group])
+            for number, group in enumerate(best_groups, 1)]
+    return Stripboard(days, day_hours, weights, iterations)
+
@@ -0,0 +1,232 @@
+"""
+Synthetic production data for Barnacle Films Inc.
+
+Bulk-loads a feature-sized production (scenes with cast and shots, call
+sheets, documents with tags, contacts, announcements and blog posts) for
+benchmarks and load tests. Everything is drawn from one seeded random
+generator, so the same seed and start date always give the same rows.
+Rows go in with multi-row INSERTs rather than the ORM, so the ORM hooks
+are bypassed and the generator fills in what they would: scene_character
+rows, document tags and shot counts.
+"""
+
+import random
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import func, insert, select
+
+from utils import classify_document
+
+DEFAULT_COUNTS = {
+    'scenes': 2000,
+    'documents': 20000,
+    'contacts': 300,
+    'call_sheets': 120,
+    'announcements': 200,
+    'blog_posts': 60,
+}
+SHOTS_PER_SCENE = (2, 12)
+CAST_PER_SCENE = (1, 5)
+CHARACTERS = 60
+SCHEDULED_SHARE = 0.7  # the rest are left off call sheets for the stripboard
+BATCH_SIZE = 1000
+
+LOCATIONS = ("Bole's Residency", 'Marsh Edge', 'Boat Dock', 'Tall Grass Field', 'Farmhouse Kitchen',
+             'Farmhouse Porch', 'Barn Loft', 'County Road', 'General Store', 'Church Hall', 'Sheriff Office',
+             'Diner', 'Motel Room 6', 'Gas Station', 'Water Tower', 'Old Mill', 'Cattail Creek', 'Boathouse',
+             'Cemetery', 'School Gym', 'Hospital Corridor', 'Pickup Truck', 'Levee Road', 'Bait Shop',
+             'Radio Station', 'Hunting Blind', 'Root Cellar', 'Lighthouse', 'Ferry Landing', 'Pump House')
+TIMES_OF_DAY = ('DAY', 'DAY', 'DAY', 'NIGHT', 'NIGHT', 'DAWN', 'DUSK', 'EVENING')
+SCENE_TYPES = ('INT', 'EXT', 'EXT', 'INT/EXT')
+FIRST_NAMES = ('Mac', 'Dallas', 'June', 'Harlan', 'Ivy', 'Royce', 'Delia', 'Amos', 'Wren', 'Cyrus', 'Lottie',
+               'Boone', 'Maeve', 'Otis', 'Greer', 'Silas', 'Nell', 'Virgil', 'Tess', 'Lyle', 'Opal', 'Hank',
+               'Birdie', 'Cole', 'Fern', 'Jasper', 'Mabel', 'Rhett', 'Sadie', 'Tuck')
+LAST_NAMES = ('Bole', 'Carver', 'Delacroix', 'Easley', 'Fontaine', 'Greaves', 'Hollis', 'Ingram', 'Jessup',
+              'Keel', 'Landry', 'Marchand', 'Noble', 'Oakes', 'Pruitt', 'Quade', 'Rourke', 'Sutter', 'Thibodeaux')
+DEPARTMENTS = ('cast', 'camera', 'sound', 'grip', 'electric', 'art', 'production', 'wardrobe', 'makeup',
+               'locations', 'transport', 'catering', 'vendor')
+FRAMINGS = ('Wide Establishing', 'Wide', 'Medium', 'Medium Close', 'Close Up', 'Extreme Close Up', 'Two Shot',
+            'OTS', 'Insert', 'POV', 'Aerial')
+LENSES = ('18mm', '25mm', '35mm', '50mm', '85mm', '100mm Macro', '24-70mm', '70-200mm')
+CAMERAS = ('A Cam - RED KOMODO', 'B Cam - BMPCC4K', 'Drone')
+MOVEMENTS = ('Static', 'Handheld', 'Dolly In', 'Dolly Out', 'Pan Left', 'Pan Right', 'Tilt Up', 'Crane Down',
+             'Steadicam Follow', 'Slider')
+# document_type -> (share of documents, file extension, MIME type, typical size in bytes)
+DOCUMENT_KINDS = {
+    'dailies': (0.45, 'mov', 'video/quicktime', 2_000_000_000),
+    'photo': (0.25, 'jpg', 'image/jpeg', 4_000_000),
+    'sides': (0.10, 'pdf', 'application/pdf', 400_000),
+    'document': (0.18, 'pdf', 'application/pdf', 2_000_000),
+    'script': (0.02, 'pdf', 'application/pdf', 1_500_000),
+}
+DOCUMENT_SUBJECTS = ('Storyboard', 'Location Scout', 'Character Reference', 'Lookbook', 'Continuity', 'Budget',
+                     'Schedule', 'Crew List', 'Release Form', 'Insurance', 'Permit', 'Props List', 'Moodboard')
+WORDS = ('marsh', 'grass', 'father', 'son', 'storm', 'boat', 'lantern', 'silence', 'creature', 'tracks', 'fog',
+         'radio', 'shotgun', 'truck', 'supper', 'porch', 'water', 'reeds', 'night', 'memory', 'engine', 'mud')
+
+
+def _sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def _scaled(counts, scale):
+    return {name: max(1, round(count * scale)) for name, count in counts.items()}
+
+
+def _insert(session, table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        session.execute(insert(table), rows[start:start + BATCH_SIZE])
+
+
+def _next_id(session, table, column='id'):
+    return (session.scalar(select(func.max(table.c[column]))) or 0) + 1
+
+
+def generate_production(session, models, seed=1, start=None, scale=1.0, counts=None):
+    """Add a synthetic production through session and return how many rows went into each table.
+
+    models maps table names to the app's model classes. Ids continue after
+    the existing rows, so this also works on a database that is not empty.
+    """
+    rng = random.Random(seed)
+    counts = _scaled(counts or DEFAULT_COUNTS, scale)
+    tables = {name: model.__table__ for name, model in models.items()}
+    if start is None:
+        start = datetime.now().date() - timedelta(weeks=8)
+    start -= timedelta(days=start.weekday())  # shoot weeks start on a Monday
+    now = datetime.combine(start, time(9))
+    written = {}
+
+    # Call sheets: six shoot days a week from start
+    sheet_id = _next_id(session, tables['call_sheet'])
+    sheets, day = [], start
+    for i in range(counts['call_sheets']):
+        while day.weekday() == 6:
+            day += timedelta(days=1)
+        night = rng.random() < 0.2
+        sheets.append({
+            'id': sheet_id + i, 'title': f'Day {i + 1} - {rng.choice(LOCATIONS)}', 'date': day,
+            'location': rng.choice(LOCATIONS), 'call_time': '6:00 PM' if night else '7:00 AM',
+            'wrap_time': '5:00 AM' if night else '7:00 PM', 'weather_contingency': _sentence(rng, 8),
+            'cast_notes': _sentence(rng), 'crew_notes': _sentence(rng), 'special_notes': _sentence(rng, 30),
+            'scenes': None, 'draft': False, 'created_at': now, 'updated_at': now,
+        })
+        day += timedelta(days=1)
+    today = datetime.now().date()
+
+    # Characters, a few leads in most scenes and a long tail of day players
+    character_id = _next_id(session, tables['character'])
+    names = set(session.scalars(select(tables['character'].c.name)))
+    characters = []
+    while len(characters) < CHARACTERS:
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        if name not in names:
+            names.add(name)
+            characters.append({'id': character_id + len(characters), 'name': name, 'created_at': now})
+    weights = [1 / (rank + 1) for rank in range(len(characters))]
+
+    # Scenes with their cast and shots
+    scene_id = _next_id(session, tables['scene'])
+    scene_number = _next_id(session, tables['scene'], 'scene_number')
+    shot_id = _next_id(session, tables['shot'])
+    scenes, cast, shots = [], [], []
+    scheduled = round(counts['scenes'] * SCHEDULED_SHARE)
+    for i in range(counts['scenes']):
+        sheet = sheets[i * len(sheets) // scheduled] if i < scheduled else None
+        picked = {}
+        while len(picked) < rng.randint(*CAST_PER_SCENE):
+            character = rng.choices(characters, weights)[0]
+            picked[character['id']] = character['name']
+        shot_total = rng.randint(*SHOTS_PER_SCENE)
+        location = sheet['location'] if sheet else rng.choice(LOCATIONS)
+        status = 'completed' if sheet and sheet['date'] < today else 'planned'
+        scenes.append({
+            'id': scene_id + i, 'scene_number': scene_number + i, 'title': _sentence(rng, 4).rstrip('.'),
+            'location': location, 'time_of_day': rng.choice(TIMES_OF_DAY), 'scene_type': rng.choice(SCENE_TYPES),
+            'description': _sentence(rng, 40), 'characters': ', '.join(picked.values()),
+            'estimated_duration': f'{rng.randint(1, 4)} minutes', 'status': status,
+            'call_sheet_id': sheet['id'] if sheet else None, 'shot_count': shot_total,
+            'notes': _sentence(rng) if rng.random() < 0.3 else None, 'created_at': now, 'updated_at': now,
+        })
+        cast += [{'scene_id': scene_id + i, 'character_id': id} for id in picked]
+        for number in range(1, shot_total + 1):
+            shots.append({
+                'id': shot_id + len(shots), 'scene_id': scene_id + i, 'shot_number': number,
+                'setup': f'{scene_number + i}{chr(64 + number)}',
+                'heading': f"{scenes[-1]['scene_type']}. {location.upper()} - {scenes[-1]['time_of_day']}",
+                'location': location, 'framing': rng.choice(FRAMINGS), 'lens': rng.choice(LENSES),
+                'camera': rng.choice(CAMERAS), 'movement': rng.choice(MOVEMENTS), 'description': _sentence(rng),
+                'notes': None, 'status': 'shot' if status == 'completed' else 'planned',
+                'created_at': now, 'updated_at': now,
+            })
+    for sheet in sheets:
+        numbers = [str(scene['scene_number']) for scene in scenes if scene['call_sheet_id'] == sheet['id']]
+        sheet['scenes'] = f"Scenes {', '.join(numbers)}" if numbers else None
+
+    # Documents, uploaded across the production, with the tags the upload path would give them
+    document_id = _next_id(session, tables['document'])
+    kinds = list(DOCUMENT_KINDS)
+    shares = [DOCUMENT_KINDS[kind][0] for kind in kinds]
+    span = max((sheets[-1]['date'] - start).days, 1) * 86400
+    documents, tags = [], []
+    for i in range(counts['documents']):
+        kind = rng.choices(kinds, shares)[0]
+        _, extension, mime_type, size = DOCUMENT_KINDS[kind]
+        subject = rng.choice(DOCUMENT_SUBJECTS) if kind in ('photo', 'document') else kind.title()
+        title = f'{subject} {scene_number + rng.randrange(counts["scenes"])}-{i}'
+        filename = f"{title.lower().replace(' ', '_')}.{extension}"
+        created_at = now + timedelta(seconds=rng.randrange(span))
+        documents.append({
+            'id': document_id + i, 'title': title, 'filename': filename,
+            'filepath': f'uploads/{kind}/{document_id + i}_{filename}', 'document_type': kind,
+            'file_size': int(size * rng.uniform(0.2, 1.5)), 'mime_type': mime_type,
+            'content_hash': f'{rng.getrandbits(256):064x}', 'thumbnail_path': None,
+            'description': _sentence(rng) if rng.random() < 0.5 else None, 'created_at': created_at,
+            'created_by': rng.choice(('Director', 'DIT', 'Script Supervisor', 'Producer', 'Art Department')),
+        })
+        tags += [{'document_id': document_id + i, 'tag': tag, 'created_at': created_at}
+                 for tag in sorted(classify_document(title, filename, kind))]
+
+    contacts = []
+    for i in range(counts['contacts']):
+        department = DEPARTMENTS[0] if i < CHARACTERS else rng.choice(DEPARTMENTS)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        contacts.append({
+            'name': f'{first} {last}', 'role': characters[i]['name'] if i < CHARACTERS else department.title(),
+            'phone': f'(555) {rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+            'email': f'{first}.{last}{i}@example.com'.lower(), 'emergency_contact': rng.random() < 0.05,
+            'department': department, 'notes': _sentence(rng) if rng.random() < 0.2 else None, 'created_at': now,
+        })
+
+    announcements = []
+    for i in range(counts['announcements']):
+        created_at = now + timedelta(seconds=rng.randrange(span))
+        announcements.append({
+            'title': _sentence(rng, 5).rstrip('.'), 'content': _sentence(rng, 40),
+            'priority': rng.choice(('low', 'normal', 'normal', 'high', 'urgent')),
+            'target_audience': rng.choice(('all', 'all', 'cast', 'crew') + DEPARTMENTS[1:4]),
+            'created_at': created_at,
+            'expires_at': created_at + timedelta(days=rng.randint(1, 14)) if rng.random() < 0.5 else None,
+            'created_by': rng.choice(('Producer', '1st AD', 'Director', 'UPM')),
+        })
+
+    post_slug = _next_id(session, tables['blog_post'])
+    blog_posts = []
+    for i in range(counts['blog_posts']):
+        created_at = now + timedelta(seconds=rng.randrange(span))
+        title = _sentence(rng, 6).rstrip('.')
+        blog_posts.append({
+            'title': title, 'slug': f"{title.lower().replace(' ', '-')}-{post_slug + i}",
+            'content': '\n\n'.join(_sentence(rng, 60) for _ in range(6)), 'excerpt': _sentence(rng, 25),
+            'featured_image': None, 'published': rng.random() < 0.8, 'created_at': created_at,
+            'updated_at': created_at,
+        })
+
+    for name, rows in (('call_sheet', sheets), ('character', characters), ('scene', scenes),
+                       ('scene_character', cast), ('shot', shots), ('document', documents),
+                       ('document_tag', tags), ('contact', contacts), ('announcement', announcements),
+                       ('blog_post', blog_posts)):
+        _insert(session, tables[name], rows)
+        written[name] = len(rows)
+    session.commit()
+    return written
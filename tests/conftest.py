@@ -0,0 +1,31 @@
+import pytest
+
+from app import create_app, db
+from migrations import migrate
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on its own migrated SQLite database, with every cache under tmp_path"""
+    app = create_app('testing',
+                     SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}",
+                     ASSET_FINGERPRINTS=False,
+                     UPLOAD_SESSION_FOLDER=str(tmp_path / 'upload_sessions'),
+                     PAGE_CACHE_FOLDER=str(tmp_path / 'page_cache'),
+                     CALL_SHEET_PDF_FOLDER=str(tmp_path / 'call_sheet_pdfs'),
+                     FRAGMENT_CACHE_FOLDER=str(tmp_path / 'fragment_cache'))
+    with app.app_context():
+        migrate(db.engine)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    """Test client logged in to the crew portal"""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['crew_logged_in'] = True
+    return client
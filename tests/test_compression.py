@@ -0,0 +1,55 @@
+import gzip
+import json
+
+import pytest
+
+from compression import available_encodings
+
+
+@pytest.fixture
+def dashboard(app, client):
+    app.extensions['compression'].min_size = 0
+    with app.app_context():
+        # The weather is part of the ETag; fetched on first use, it would change it between requests
+        app.extensions['weather_service'].current(app.config['WEATHER_DEFAULT_LOCATION'], wait=5)
+    return lambda **headers: client.get('/api/dashboard', headers=headers)
+
+
+def test_each_encoding_has_its_own_etag(dashboard):
+    identity = dashboard()
+    gzipped = dashboard(**{'Accept-Encoding': 'gzip'})
+    assert identity.headers.get('Content-Encoding') is None
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+
+    tag, weak = identity.get_etag()
+    assert not weak
+    assert gzipped.get_etag() == (f'{tag}-gzip', False)
+    assert 'Accept-Encoding' in gzipped.vary
+
+
+@pytest.mark.parametrize('encoding', available_encodings())
+def test_revalidating_an_encoded_response(dashboard, encoding):
+    response = dashboard(**{'Accept-Encoding': encoding})
+    etag = response.headers['ETag']
+
+    revalidated = dashboard(**{'Accept-Encoding': encoding, 'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+
+
+def test_identity_etag_does_not_match_an_encoded_one(dashboard):
+    identity = dashboard()
+    tag, _ = identity.get_etag()
+    assert dashboard(**{'If-None-Match': identity.headers['ETag']}).status_code == 304
+    assert dashboard(**{'If-None-Match': f'"{tag}-deflate"'}).status_code == 200
+
+
+def test_offline_manifest_revalidates_in_any_encoding(app, client):
+    app.extensions['compression'].min_size = 0
+    response = client.get('/api/offline/manifest', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.get_etag()[0] == json.loads(gzip.decompress(response.data))['version'] + '-gzip'
+
+    revalidated = client.get('/api/offline/manifest',
+                             headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
@@ -0,0 +1,45 @@
+import pymupdf
+import pytest
+
+from app import db
+from models import Document
+
+
+@pytest.fixture
+def uploaded(app, tmp_path):
+    """Add a document whose file is the given bytes under a throwaway static folder; returns its id"""
+    static = tmp_path / 'static'
+    app.static_folder = str(static)
+
+    def add(filename, data):
+        (static / 'documents').mkdir(parents=True, exist_ok=True)
+        (static / 'documents' / filename).write_bytes(data)
+        with app.app_context():
+            document = Document(title=filename, filename=filename, document_type='document',
+                                filepath=f'documents/{filename}')
+            db.session.add(document)
+            db.session.commit()
+            return document.id
+    return add
+
+
+def test_pages_of_a_pdf(client, uploaded):
+    pdf = pymupdf.open()
+    pdf.new_page(width=612, height=792)
+    pdf.new_page(width=612, height=792)
+    doc_id = uploaded('two_pages.pdf', pdf.tobytes())
+
+    response = client.get(f'/api/documents/{doc_id}/pages')
+    assert response.status_code == 200
+    assert response.json['page_count'] == 2
+
+    response = client.get(f'/api/documents/{doc_id}/pages/2?width=480&format=png')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+
+
+@pytest.mark.parametrize('data', [b'Production bible\n\nPlain text, not a PDF.\n', b'%PDF-1.7\n\x00\x01garbage'])
+def test_unreadable_pdf_is_unprocessable(client, uploaded, data):
+    doc_id = uploaded('not_really.pdf', data)
+    assert client.get(f'/api/documents/{doc_id}/pages').status_code == 422
+    assert client.get(f'/api/documents/{doc_id}/pages/1').status_code == 422
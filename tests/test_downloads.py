@@ -0,0 +1,108 @@
+import pytest
+
+from app import db
+from downloads import resolve_ranges
+from models import Document
+
+DATA = bytes(range(256)) * 4  # 1024 bytes
+
+
+@pytest.fixture
+def url(app, tmp_path):
+    """Download URL of a 1KB text document under a throwaway static folder"""
+    static = tmp_path / 'static'
+    (static / 'documents').mkdir(parents=True)
+    (static / 'documents' / 'sides.txt').write_bytes(DATA)
+    app.static_folder = str(static)
+    with app.app_context():
+        document = Document(title='Sides', filename='sides.txt', document_type='sides',
+                            filepath='documents/sides.txt', mime_type='text/plain')
+        db.session.add(document)
+        db.session.commit()
+        return f'/download/{document.id}'
+
+
+def byteranges(response):
+    """(Content-Range, body) of each part of a multipart/byteranges response"""
+    boundary = response.mimetype_params['boundary'].encode()
+    parts = []
+    for part in response.data.split(b'--' + boundary)[1:-1]:
+        head, body = part.split(b'\r\n\r\n', 1)
+        headers = dict(line.split(': ', 1) for line in head.decode('latin-1').strip().split('\r\n'))
+        parts.append((headers['Content-Range'], body.removesuffix(b'\r\n')))
+    return parts
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', [(0, 100)]),
+    ('bytes=-100', [(924, 1024)]),
+    ('bytes=1000-', [(1000, 1024)]),
+    ('bytes=1000-5000', [(1000, 1024)]),
+    ('bytes=0-99,100-199,300-399', [(0, 200), (300, 400)]),
+    ('bytes=0-999,-100', [(0, 1024)]),
+    ('bytes=0-99,50-149', None),
+    ('bytes=2000-', []),
+    ('items=0-9', None),
+    ('bytes=' + ','.join(f'{n * 2}-{n * 2}' for n in range(33)), None),
+])
+def test_resolve_ranges(header, expected):
+    assert resolve_ranges(header, len(DATA)) == expected
+
+
+def test_whole_file(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == DATA
+    assert response.accept_ranges == 'bytes'
+    assert response.get_etag()[1] is False  # strong
+
+
+def test_single_range(client, url):
+    response = client.get(url, headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 100-199/1024'
+    assert response.content_length == 100
+    assert response.data == DATA[100:200]
+
+
+def test_multiple_ranges(client, url):
+    response = client.get(url, headers={'Range': 'bytes=0-9,-10'})
+    assert response.status_code == 206
+    assert response.mimetype == 'multipart/byteranges'
+    assert response.content_length == len(response.data)
+    assert byteranges(response) == [('bytes 0-9/1024', DATA[:10]), ('bytes 1014-1023/1024', DATA[-10:])]
+
+
+def test_unsatisfiable_range(client, url):
+    response = client.get(url, headers={'Range': 'bytes=5000-6000'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == 'bytes */1024'
+
+
+def test_if_range(client, url):
+    etag = client.get(url).headers['ETag']
+
+    response = client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': etag})
+    assert response.status_code == 206
+    assert response.data == DATA[:10]
+
+    response = client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert response.data == DATA
+
+
+def test_if_none_match(client, url):
+    etag = client.get(url).headers['ETag']
+
+    response = client.get(url, headers={'If-None-Match': etag, 'Range': 'bytes=0-9'})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert client.get(url, headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_head_with_range(client, url):
+    response = client.head(url, headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 100-199/1024'
+    assert response.content_length == 100
+    assert response.data == b''
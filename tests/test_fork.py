@@ -0,0 +1,34 @@
+import gc
+import os
+import weakref
+
+from app import create_app, db, forked_apps
+
+
+def test_forked_child_opens_its_own_connections(app):
+    with app.app_context():
+        db.session.execute(db.text('SELECT 1'))
+        db.session.remove()
+        assert db.engine.pool.checkedin() == 1
+
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            os.write(write, str(db.engine.pool.checkedin()).encode())
+            os._exit(0)
+        os.close(write)
+        inherited = os.read(read, 16)
+        os.close(read)
+        os.waitpid(pid, 0)
+        assert inherited == b'0'
+        assert db.engine.pool.checkedin() == 1
+
+
+def test_apps_are_not_kept_alive_for_forking(tmp_path):
+    app = create_app('testing', SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'test.db'}", ASSET_FINGERPRINTS=False)
+    assert app in forked_apps
+    ref = weakref.ref(app)
+    del app
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,207 @@
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import db
+from jobs import JobQueue, JobWorker
+from models import Job
+
+
+class Handlers(dict):
+    """Job handlers that record every run: 'record' always succeeds, 'flaky' always raises"""
+
+    def __init__(self):
+        super().__init__(record=self.record, flaky=self.flaky)
+        self.runs = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, n):
+        with self._lock:
+            self.runs[n] += 1
+
+    def flaky(self, n):
+        self.record(n)
+        raise RuntimeError(f'flaky job {n}')
+
+
+@pytest.fixture
+def handlers():
+    return Handlers()
+
+
+@pytest.fixture
+def make_queue(app, handlers):
+    """A JobQueue on the app's database with the recording handlers and no wait before retries by default"""
+    def make(**options):
+        options = dict(dict(lease_seconds=60, retry_seconds=0, max_retry_seconds=0), **options)
+        return JobQueue(db, Job, handlers, **options)
+    return make
+
+
+def enqueue(app, queue, kind, n, **options):
+    with app.app_context():
+        job = queue.enqueue(kind, {'n': n}, **options)
+        db.session.commit()
+        return job.id
+
+
+def job(app, job_id):
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        db.session.expunge(job)
+        return job
+
+
+def expire_lease(app, queue, job_id):
+    with app.app_context():
+        db.session.execute(update(Job).where(Job.id == job_id)
+                           .values(locked_at=datetime.utcnow() - queue.lease - timedelta(seconds=1)))
+        db.session.commit()
+
+
+def test_each_job_is_claimed_by_one_worker(app, handlers, make_queue):
+    queue = make_queue()
+    ids = [enqueue(app, queue, 'record', n) for n in range(40)]
+
+    counts = JobWorker(app, queue, concurrency=4).run(burst=True)
+
+    assert counts == {'done': 40, 'retried': 0, 'failed': 0}
+    assert handlers.runs == Counter(range(40))
+    assert {job(app, job_id).status for job_id in ids} == {'done'}
+    with app.app_context():
+        assert queue.claim('late') is None
+
+
+def test_claim_takes_the_most_urgent_due_job(app, make_queue):
+    queue = make_queue()
+    later = enqueue(app, queue, 'record', 0, delay=60)
+    low = enqueue(app, queue, 'record', 1, priority='low')
+    urgent = enqueue(app, queue, 'record', 2, priority='urgent')
+
+    with app.app_context():
+        assert queue.claim('w') == (urgent, 'record', {'n': 2})
+        assert queue.claim('w') == (low, 'record', {'n': 1})
+        assert queue.claim('w') is None
+    assert job(app, later).status == 'queued'
+
+
+@pytest.mark.parametrize('attempts, low, high', [(1, 15, 30), (2, 30, 60), (4, 120, 240), (10, 1800, 3600)])
+def test_backoff_doubles_up_to_the_cap(make_queue, attempts, low, high):
+    queue = make_queue(retry_seconds=30, max_retry_seconds=3600)
+    delays = [queue.backoff(attempts) for _ in range(50)]
+    assert all(low <= delay <= high for delay in delays)
+    assert len(set(delays)) > 1  # jittered
+
+
+def test_failed_job_waits_out_its_backoff(app, handlers, make_queue):
+    queue = make_queue(retry_seconds=30, max_retry_seconds=3600)
+    job_id = enqueue(app, queue, 'flaky', 0)
+
+    before = datetime.utcnow()
+    counts = JobWorker(app, queue, concurrency=1).run(burst=True)
+
+    failed = job(app, job_id)
+    assert counts == {'done': 0, 'retried': 1, 'failed': 0}
+    assert handlers.runs[0] == 1
+    assert (failed.status, failed.attempts, failed.locked_by) == ('queued', 1, None)
+    assert 'flaky job 0' in failed.last_error
+    assert before + timedelta(seconds=15) <= failed.run_at <= datetime.utcnow() + timedelta(seconds=30)
+
+
+def test_retried_until_max_attempts_then_failed(app, handlers, make_queue):
+    queue = make_queue()
+    job_id = enqueue(app, queue, 'flaky', 0, max_attempts=3)
+
+    counts = JobWorker(app, queue, concurrency=1).run(burst=True)
+
+    failed = job(app, job_id)
+    assert counts == {'done': 0, 'retried': 2, 'failed': 1}
+    assert handlers.runs[0] == 3
+    assert (failed.status, failed.attempts) == ('failed', 3)
+    assert failed.finished_at is not None
+
+    with app.app_context():
+        assert queue.retry(job_id)
+        assert not queue.retry(job_id)  # queued now, not failed
+    assert (job(app, job_id).status, job(app, job_id).attempts) == ('queued', 0)
+
+
+def test_job_is_requeued_once_its_lease_runs_out(app, handlers, make_queue):
+    queue = make_queue()
+    job_id = enqueue(app, queue, 'record', 0)
+    with app.app_context():
+        assert queue.claim('dead worker')[0] == job_id
+
+    counts = JobWorker(app, queue, concurrency=1).run(burst=True)
+    assert counts['done'] == 0  # still within its lease
+    assert job(app, job_id).status == 'running'
+
+    expire_lease(app, queue, job_id)
+    counts = JobWorker(app, queue, concurrency=1).run(burst=True)
+
+    done = job(app, job_id)
+    assert counts['done'] == 1
+    assert handlers.runs[0] == 1
+    assert (done.status, done.attempts) == ('done', 2)
+
+
+def test_stale_job_out_of_attempts_is_failed(app, handlers, make_queue):
+    queue = make_queue()
+    job_id = enqueue(app, queue, 'record', 0, max_attempts=1)
+    with app.app_context():
+        queue.claim('dead worker')
+    expire_lease(app, queue, job_id)
+
+    with app.app_context():
+        assert queue.requeue_stale() == 1
+    failed = job(app, job_id)
+    assert (failed.status, failed.last_error) == ('failed', 'Worker stopped before finishing the job')
+    assert handlers.runs[0] == 0
+
+
+def test_dedupe_key_returns_the_active_job(app, make_queue):
+    queue = make_queue()
+    first = enqueue(app, queue, 'record', 0, dedupe_key='thumbnail:1')
+    assert enqueue(app, queue, 'record', 1, dedupe_key='thumbnail:1') == first
+    other = enqueue(app, queue, 'record', 2, dedupe_key='thumbnail:2')
+    assert other != first
+
+    with app.app_context():
+        assert queue.claim('w')[0] == first
+    assert enqueue(app, queue, 'record', 3, dedupe_key='thumbnail:1') == first  # running counts too
+
+    with app.app_context():
+        queue.complete(first, 'w')
+    again = enqueue(app, queue, 'record', 4, dedupe_key='thumbnail:1')
+    assert again not in (first, other)
+    with app.app_context():
+        assert Job.query.filter_by(dedupe_key='thumbnail:1').count() == 2
+
+
+def test_worker_past_its_lease_cannot_finish_the_job(app, make_queue):
+    queue = make_queue()
+    job_id = enqueue(app, queue, 'record', 0)
+    with app.app_context():
+        queue.claim('slow worker')
+    expire_lease(app, queue, job_id)
+    with app.app_context():
+        queue.requeue_stale()
+        assert queue.claim('new worker')[0] == job_id
+
+        queue.complete(job_id, 'slow worker')
+        queue.fail(job_id, 'slow worker', 'too late')
+    running = job(app, job_id)
+    assert (running.status, running.locked_by, running.last_error) == (
+        'running', 'new worker', 'Worker stopped before finishing the job')
+
+    with app.app_context():
+        queue.complete(job_id, 'new worker')
+    assert job(app, job_id).status == 'done'
+
+
+def test_unknown_kind_is_refused(app, make_queue):
+    with app.app_context(), pytest.raises(ValueError):
+        make_queue().enqueue('missing')
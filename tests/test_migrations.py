@@ -0,0 +1,51 @@
+from sqlalchemy import create_engine, inspect
+
+from migrations import migrate, current_version, MIGRATIONS
+from models import db
+
+
+def schema(engine):
+    """Columns, indexes, unique constraints and foreign keys of every table but schema_migrations and search"""
+    inspector = inspect(engine)
+    tables = {}
+    for table in inspector.get_table_names():
+        if table == 'schema_migrations' or table.startswith('search'):
+            continue
+        tables[table] = {
+            'columns': {c['name']: (str(c['type']), c['nullable']) for c in inspector.get_columns(table)},
+            'indexes': {i['name']: (tuple(i['column_names']), bool(i['unique'])) for i in inspector.get_indexes(table)},
+            'unique': sorted(tuple(u['column_names']) for u in inspector.get_unique_constraints(table)),
+            'foreign_keys': sorted((tuple(f['constrained_columns']), f['referred_table'],
+                                    f['options'].get('ondelete')) for f in inspector.get_foreign_keys(table)),
+        }
+    return tables
+
+
+def test_migrations_build_the_schema_the_models_describe(tmp_path):
+    migrated = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    applied = migrate(migrated)
+    assert [version for version, _ in applied] == [version for version, _, _ in MIGRATIONS]
+
+    created = create_engine(f"sqlite:///{tmp_path / 'created.db'}")
+    db.metadata.create_all(created)
+    assert schema(migrated) == schema(created)
+
+
+def test_migrate_is_a_no_op_once_applied(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    migrate(engine)
+    assert migrate(engine) == []
+    with engine.connect() as connection:
+        assert current_version(connection) == MIGRATIONS[-1][0]
+
+
+def test_baseline_does_not_read_the_models(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    migrate(engine, target=1)
+    inspector = inspect(engine)
+    assert not inspector.has_table('job')
+    assert not inspector.has_table('scene_character')
+    assert 'draft' not in {c['name'] for c in inspector.get_columns('call_sheet')}
+
+    migrate(engine, target=6)
+    assert 'draft' in {c['name'] for c in inspect(engine).get_columns('call_sheet')}
@@ -0,0 +1,94 @@
+import pytest
+
+from app import db, announcement_job, notify_crew
+from models import Contact, NotificationDelivery
+from notifications import LocalSMTPServer, SMTPPool, DeliveryFailed
+
+REFUSED = 'crew3@example.com'
+
+
+@pytest.fixture
+def smtp(app):
+    """A local debugging SMTP server refusing REFUSED, with the app's pool pointed at it"""
+    server = LocalSMTPServer(refuse={REFUSED}).start()
+    app.config['NOTIFY_BATCH_SIZE'] = 5
+    app.extensions['smtp_pool'] = SMTPPool('127.0.0.1', server.port, size=2)
+    yield server
+    app.extensions['smtp_pool'].close()
+    server.stop()
+
+
+@pytest.fixture
+def announcement_id(app):
+    """A normal-priority announcement to everyone: 12 contacts, 11 addresses (two differ only in case)"""
+    with app.app_context():
+        for n in range(12):
+            email = 'CREW0@example.com' if n == 11 else f'crew{n}@example.com'
+            db.session.add(Contact(name=f'Crew {n}', role='Grip', email=email, department='grip'))
+        announcement = notify_crew('Call time moved to 6:00 AM', title='Call time change')
+        db.session.commit()
+        return announcement.id
+
+
+def deliveries(announcement_id):
+    return {row.address: row for row in NotificationDelivery.query.filter_by(announcement_id=announcement_id)}
+
+
+def received(server):
+    return sorted(address for _, recipients, _ in server.messages for address in recipients)
+
+
+def test_delivered_in_batches_once_per_address(app, smtp, announcement_id):
+    with app.app_context():
+        announcement_job(announcement_id)
+        rows = deliveries(announcement_id)
+
+    assert smtp.messages
+    assert all(len(recipients) <= 5 for _, recipients, _ in smtp.messages)
+    assert received(smtp) == sorted(f'crew{n}@example.com' for n in range(11) if n != 3)
+    assert smtp.messages[0][2]['Subject'] == 'Call time change'
+    assert len(rows) == 11
+    assert {address for address, row in rows.items() if row.status == 'sent'} == set(received(smtp))
+
+
+def test_refused_recipients_are_recorded_as_failed(app, smtp, announcement_id):
+    with app.app_context():
+        announcement_job(announcement_id)  # a 5xx refusal is not worth retrying the job for
+        row = deliveries(announcement_id)[REFUSED]
+
+    assert row.status == 'failed'
+    assert row.error.startswith('550')
+
+
+def test_rerun_sends_only_what_failed(app, smtp, announcement_id):
+    with app.app_context():
+        announcement_job(announcement_id)
+        first = received(smtp)
+        smtp.refuse.clear()
+        smtp.messages.clear()
+
+        announcement_job(announcement_id)
+        assert received(smtp) == [REFUSED]
+        assert deliveries(announcement_id)[REFUSED].status == 'sent'
+
+        smtp.messages.clear()
+        announcement_job(announcement_id)
+        assert smtp.messages == []
+    assert REFUSED not in first
+
+
+def test_retry_after_the_server_was_down(app, smtp, announcement_id):
+    down = LocalSMTPServer()
+    down.server_close()  # a port nothing listens on
+    app.extensions['smtp_pool'] = SMTPPool('127.0.0.1', down.port, size=2)
+    with app.app_context():
+        with pytest.raises(DeliveryFailed):
+            announcement_job(announcement_id)
+        assert {row.status for row in deliveries(announcement_id).values()} == {'failed'}
+        assert smtp.messages == []
+
+        app.extensions['smtp_pool'] = SMTPPool('127.0.0.1', smtp.port, size=2)
+        smtp.refuse.clear()
+        announcement_job(announcement_id)
+        assert {row.status for row in deliveries(announcement_id).values()} == {'sent'}
+    assert received(smtp) == sorted(f'crew{n}@example.com' for n in range(11))
@@ -0,0 +1,18 @@
+from app import db, route_query_plans
+from models import (CallSheet, Character, Scene, SceneCharacter, Shot, Document, DocumentTag, Contact, Announcement,
+                    BlogPost)
+from synthetic_data import generate_production
+
+
+def test_route_queries_use_indexes(app):
+    # Only the queries matter here; a route that fails afterwards is some other test's business
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    with app.app_context():
+        models = {model.__tablename__: model for model in (CallSheet, Character, Scene, SceneCharacter, Shot, Document,
+                                                           DocumentTag, Contact, Announcement, BlogPost)}
+        generate_production(db.session, models, scale=0.02)
+        plans, skipped = route_query_plans()
+
+    assert skipped == ['/api/uploads/<upload_id>']  # upload sessions are files, not rows
+    assert len(plans) > 30
+    assert {statement: tables for statement, tables in plans.items() if tables} == {}
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from app import db
+from models import Scene
+from utils import parse_shot_records
+
+
+@pytest.fixture
+def scene_id(app):
+    with app.app_context():
+        scene = Scene(scene_number=12, title='Marsh at dusk', location='Marsh Edge', time_of_day='DUSK',
+                      scene_type='EXT')
+        db.session.add(scene)
+        db.session.commit()
+        return scene.id
+
+
+def test_parse_json_and_csv():
+    assert parse_shot_records(json.dumps({'shots': [{'shot_number': '2', 'framing': ' Wide '}]})) == [
+        {'shot_number': 2, 'framing': 'Wide'}]
+    assert parse_shot_records(b'scene_number,shot_number,lens\n12,1,35mm\n', 'csv') == [
+        {'scene_number': 12, 'shot_number': 1, 'lens': '35mm'}]
+
+
+@pytest.mark.parametrize('body', [
+    '[1]',
+    '["shot"]',
+    '7',
+    '{"shots": {"shot_number": 1}}',
+    '[{"shot_number": [1]}]',
+    '[{"shot_number": {"n": 1}}]',
+    '[{"shot_number": 1, "scene_number": [12]}]',
+    '[{"shot_number": 1, "lens": ["35mm"]}]',
+    '[{"shot_number": "one"}]',
+    '[{"framing": "Wide"}]',
+    'not json',
+])
+def test_bad_shot_lists_are_rejected(client, scene_id, body):
+    response = client.post(f'/api/scenes/{scene_id}/shots', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert 'error' in response.json
+
+
+def test_shot_list_upload(client, scene_id):
+    response = client.post(f'/api/scenes/{scene_id}/shots', json=[{'shot_number': 1, 'framing': 'Wide'},
+                                                                {'shot_number': 2, 'framing': 'OTS Dallas'}])
+    assert response.status_code == 201
+    assert response.json['shot_count'] == 2
@@ -0,0 +1,57 @@
+import os
+import runpy
+
+from app import db
+from config import Config
+from events import StreamSlots
+from models import ChangeEvent
+
+
+def test_stream_requires_crew_login(app):
+    assert app.test_client().get('/api/stream').status_code == 401
+
+
+def test_stream_runs_past_the_snapshot(app, client):
+    app.config.update(SSE_STREAM_SECONDS=3, SSE_KEEPALIVE_SECONDS=0.2)
+    response = client.get('/api/stream')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+
+    # The body is read after the request context is gone, as a server would read it
+    chunks = (chunk.decode('utf-8') for chunk in response.response)
+    received = ''
+    while 'event: ready' not in received:
+        received += next(chunks)
+    with app.app_context():
+        db.session.add(ChangeEvent(kind='call_sheet', action='update', ref_id=1))
+        db.session.commit()
+    received += ''.join(chunks)
+    response.close()
+
+    assert 'event: countdown' in received
+    assert ': keepalive' in received
+    assert 'event: call_sheet' in received
+
+
+def test_streams_past_the_cap_are_turned_away(app, client):
+    app.extensions['stream_slots'] = StreamSlots(2)
+    first = client.get('/api/stream')
+    second = client.get('/api/stream')
+    assert (first.status_code, second.status_code) == (200, 200)
+
+    refused = client.get('/api/stream')
+    assert refused.status_code == 503
+    assert refused.headers['Retry-After'] == str(app.config['SSE_STREAM_SECONDS'])
+
+    # A stream closed by the server gives its slot back, read or not
+    first.close()
+    third = client.get('/api/stream')
+    assert third.status_code == 200
+    second.close()
+    third.close()
+    assert client.get('/api/stream').status_code == 200
+
+
+def test_gunicorn_has_a_thread_per_stream_and_more_for_requests():
+    settings = runpy.run_path(os.path.join(os.path.dirname(__file__), os.pardir, 'gunicorn.conf.py'))
+    assert settings['threads'] > Config.SSE_MAX_STREAMS
@@ -0,0 +1,78 @@
+import random
+import time
+
+import pytest
+
+from stripboard import DEFAULT_WEIGHTS, Stripboard, ShootDay, Strip, _greedy_groups, parse_duration, plan
+
+
+@pytest.mark.parametrize('text, minutes', [
+    ('2 minutes', 2.0),
+    ('2-3 minutes', 2.5),
+    ('2 – 4 min', 3.0),
+    ('1 to 2 mins', 1.5),
+    ('1.5 min', 1.5),
+    ('90 seconds', 1.5),
+    ('1 hour', 60.0),
+    ('3', 3.0),
+    ('about half a page', 1.0),
+    ('', 1.0),
+    (None, 1.0),
+])
+def test_parse_duration(text, minutes):
+    assert parse_duration(text) == pytest.approx(minutes)
+
+
+def test_parse_duration_default():
+    assert parse_duration('TBD', default=0.5) == 0.5
+
+
+def make_strips(count, seed=0):
+    """A random board over a dozen locations and a cast of twenty"""
+    rng = random.Random(seed)
+    locations = [f'Location {n}' for n in range(12)]
+    cast = [f'Actor {n}' for n in range(20)]
+    return [Strip(n, rng.choice(locations), rng.choice((0.5, 1, 1.5, 2, 3)),
+                  rng.choice(('DAY', 'DAY', 'NIGHT')), rng.choice(('INT', 'EXT')),
+                  rng.sample(cast, rng.randint(0, 4)))
+            for n in range(count)]
+
+
+def cost_of(strips, groups, weights=None):
+    days = [ShootDay(number, [strips[index] for index in group]) for number, group in enumerate(groups, 1)]
+    return Stripboard(days, 10.0, dict(DEFAULT_WEIGHTS, **(weights or {})), 0).summary()['cost']
+
+
+def placed(stripboard):
+    return sorted(strip_id for day in stripboard.days for strip_id in day.to_dict()['strips'])
+
+
+@pytest.mark.parametrize('weights', [None, {'company_move': 600}, {'company_move': 2000}])
+@pytest.mark.parametrize('seed', range(4))
+def test_plan_never_costs_more_than_the_greedy_seed(seed, weights):
+    # A fixed number of moves within a long time limit keeps the search hot, with many uphill moves and compactions
+    strips = make_strips(80, seed)
+    stripboard = plan(strips, max_iterations=3000, time_limit=60, weights=weights, seed=seed)
+
+    assert placed(stripboard) == list(range(80))
+    assert stripboard.summary()['cost'] <= cost_of(strips, _greedy_groups(strips, 10.0), weights)
+
+
+def test_replan_never_costs_more_than_the_previous_plan():
+    strips = make_strips(150)
+    previous = plan(strips, time_limit=0.2)
+    initial = [day.to_dict()['strips'] for day in previous.days]
+
+    stripboard = plan(strips, initial=initial, time_limit=0.2, seed=1)
+    assert placed(stripboard) == list(range(150))
+    assert stripboard.summary()['cost'] <= previous.summary()['cost']
+
+
+def test_plan_keeps_to_its_time_limit():
+    strips = make_strips(1200)
+    started = time.monotonic()
+    stripboard = plan(strips, time_limit=0.5)
+
+    assert time.monotonic() - started < 1.5
+    assert stripboard.iterations > 0
+    assert placed(stripboard) == list(range(1200))
@@ -0,0 +1,138 @@
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+
+from app import db
+from models import Document
+from uploads import ChunkedUpload, UploadError
+
+CHUNK_SIZE = 16
+DATA = bytes(range(50))  # three full chunks and a short one
+
+
+@pytest.fixture
+def uploads(app, tmp_path):
+    """Small chunks, with finished uploads landing under tmp_path instead of static/"""
+    app.static_folder = str(tmp_path / 'static')
+    app.config['UPLOAD_FOLDER'] = str(tmp_path / 'static' / 'uploads')
+    app.config['UPLOAD_CHUNK_SIZE'] = CHUNK_SIZE
+    return app
+
+
+def start(client, data=DATA):
+    response = client.post('/api/uploads', json={'filename': 'notes.txt', 'size': len(data), 'title': 'Notes'})
+    assert response.status_code == 201
+    return response.get_json()['upload_id']
+
+
+def put_chunk(client, upload_id, index, body, checksum=None):
+    checksum = checksum or hashlib.sha256(body).hexdigest()
+    return client.put(f'/api/uploads/{upload_id}/chunks/{index}', data=body,
+                      headers={'X-Chunk-SHA256': checksum})
+
+
+def chunk(index, data=DATA):
+    return data[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+
+
+def received(client, upload_id):
+    return client.get(f'/api/uploads/{upload_id}').get_json()['received']
+
+
+def test_checksum_mismatch_is_rejected(uploads, client):
+    upload_id = start(client)
+    response = put_chunk(client, upload_id, 0, chunk(0), checksum=hashlib.sha256(b'other').hexdigest())
+
+    assert response.status_code == 422
+    assert response.get_json()['error'] == 'Checksum mismatch on chunk 0'
+    assert received(client, upload_id) == []
+
+
+@pytest.mark.parametrize('index, body', [(0, DATA[:CHUNK_SIZE - 1]), (0, DATA[:CHUNK_SIZE + 1]), (3, DATA[:CHUNK_SIZE])])
+def test_wrong_chunk_length_is_rejected(uploads, client, index, body):
+    upload_id = start(client)
+    response = put_chunk(client, upload_id, index, body)
+
+    assert response.status_code == 400
+    assert 'expected' in response.get_json()['error']
+    assert received(client, upload_id) == []
+
+
+def test_resume_after_a_missing_chunk(uploads, client):
+    upload_id = start(client)
+    for index in (0, 2, 3):
+        assert put_chunk(client, upload_id, index, chunk(index)).status_code == 200
+
+    response = client.post(f'/api/uploads/{upload_id}/complete')
+    assert response.status_code == 409
+    assert received(client, upload_id) == [0, 2, 3]
+
+    assert put_chunk(client, upload_id, 1, chunk(1)).status_code == 200
+    assert client.post(f'/api/uploads/{upload_id}/complete').status_code == 201
+
+
+def test_corrupt_resend_keeps_the_received_chunk(uploads, app, client):
+    upload_id = start(client)
+    assert put_chunk(client, upload_id, 1, chunk(1)).status_code == 200
+
+    corrupt = bytes(CHUNK_SIZE)
+    assert put_chunk(client, upload_id, 1, corrupt, checksum=hashlib.sha256(chunk(1)).hexdigest()).status_code == 422
+    assert put_chunk(client, upload_id, 1, corrupt[:-1]).status_code == 400
+    assert received(client, upload_id) == [1]
+
+    upload = ChunkedUpload(app.config['UPLOAD_SESSION_FOLDER'], upload_id)
+    with open(upload.data_path, 'rb') as f:
+        f.seek(CHUNK_SIZE)
+        assert f.read(CHUNK_SIZE) == chunk(1)
+    assert sorted(os.listdir(upload.chunks_path)) == ['1']
+
+
+def test_assembled_upload_becomes_a_document(uploads, app, client):
+    upload_id = start(client)
+    for index in reversed(range(4)):
+        assert put_chunk(client, upload_id, index, chunk(index)).status_code == 200
+    assert put_chunk(client, upload_id, 2, chunk(2)).status_code == 200  # a resend of a good chunk is harmless
+
+    response = client.post(f'/api/uploads/{upload_id}/complete')
+    assert response.status_code == 201
+
+    with app.app_context():
+        document = db.session.get(Document, response.get_json()['document_id'])
+        assert document.title == 'Notes'
+        assert document.file_size == len(DATA)
+        with open(os.path.join(app.static_folder, document.filepath), 'rb') as f:
+            assert f.read() == DATA
+    assert not os.path.exists(os.path.join(app.config['UPLOAD_SESSION_FOLDER'], upload_id))
+    assert client.post(f'/api/uploads/{upload_id}/complete').status_code == 404
+
+
+def test_only_one_concurrent_complete_wins(tmp_path):
+    upload = ChunkedUpload.create(str(tmp_path / 'sessions'), 'notes.txt', len(DATA), CHUNK_SIZE)
+    for index in range(4):
+        upload.write_chunk(index, io.BytesIO(chunk(index)), hashlib.sha256(chunk(index)).hexdigest())
+
+    barrier = threading.Barrier(4)
+    outcomes = []
+
+    def complete(n):
+        session = ChunkedUpload(upload.root, upload.upload_id)
+        barrier.wait()
+        try:
+            session.assemble(str(tmp_path / 'done' / f'{n}.txt'))
+            outcomes.append(201)
+        except UploadError as error:
+            outcomes.append(error.status)
+
+    threads = [threading.Thread(target=complete, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == [201, 409, 409, 409]
+    [finished] = os.listdir(tmp_path / 'done')
+    assert (tmp_path / 'done' / finished).read_bytes() == DATA
+
@@ -0,0 +1,49 @@
+"""
+Background thumbnail generation for Barnacle Films Inc.
+
+Thumbnail jobs and the backfill command hand files to a process pool; each
+pool job hashes the file and renders its content-addressed thumbnail with
+utils.generate_thumbnail, so the request thread never decodes media.
+"""
+
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from utils import file_sha256, generate_thumbnail
+
+
+def _thumbnail_job(source_path, size, output_dir):
+    """Hash a file and render its thumbnail (runs in a pool process)"""
+    content_hash = file_sha256(source_path)
+    return content_hash, generate_thumbnail(source_path, size, output_dir, content_hash)
+
+
+class ThumbnailGenerator:
+    """Process pool that renders thumbnails into output_dir"""
+
+    def __init__(self, output_dir, size, max_workers=2):
+        self.output_dir = output_dir
+        self.size = tuple(size)
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            # Started on first use so each gunicorn worker owns its own pool
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def submit(self, source_path):
+        """Queue one file; the future resolves to (content_hash, thumbnail_path or None)"""
+        return self._pool().submit(_thumbnail_job, source_path, self.size, self.output_dir)
+
+    def run_batch(self, source_paths):
+        """Render many files in parallel, yielding (source_path, result, error) as each finishes"""
+        futures = {self.submit(path): path for path in source_paths}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
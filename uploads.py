@@ -0,0 +1,181 @@
+"""
+Chunked, resumable uploads for Barnacle Films Inc.
+
+Each upload session is a directory holding the preallocated target file,
+a meta.json describing it and one marker file per verified chunk. Any
+worker can accept any chunk, and a dropped connection only costs the chunk
+that was in flight.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+COPY_BUFFER_SIZE = 64 * 1024
+SESSION_MAX_AGE = 48 * 60 * 60  # seconds before an abandoned session is purged
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadError(Exception):
+    """Raised when an upload request is rejected"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class ChunkedUpload:
+    """A resumable upload session stored on disk"""
+
+    def __init__(self, root, upload_id):
+        self.root = root
+        self.upload_id = upload_id
+        self.path = os.path.join(root, upload_id)
+        self.data_path = os.path.join(self.path, 'data.part')
+        self.chunks_path = os.path.join(self.path, 'chunks')
+        self._meta = None
+
+    @classmethod
+    def create(cls, root, filename, size, chunk_size, **meta):
+        """Start a new session and preallocate the target file"""
+        purge_stale_uploads(root)
+
+        upload = cls(root, uuid.uuid4().hex)
+        os.makedirs(upload.chunks_path)
+        with open(upload.data_path, 'wb') as f:
+            f.truncate(size)
+
+        meta.update(filename=filename, size=size, chunk_size=chunk_size, created=time.time())
+        with open(os.path.join(upload.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        upload._meta = meta
+        return upload
+
+    @classmethod
+    def load(cls, root, upload_id):
+        """Open an existing session or raise a 404 UploadError"""
+        upload = cls(root, upload_id)
+        if not _UPLOAD_ID.match(upload_id):
+            raise UploadError('Upload session not found', 404)
+        try:
+            upload.meta
+        except FileNotFoundError:
+            raise UploadError('Upload session not found', 404)
+        return upload
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            with open(os.path.join(self.path, 'meta.json')) as f:
+                self._meta = json.load(f)
+        return self._meta
+
+    @property
+    def chunk_count(self):
+        return -(-self.meta['size'] // self.meta['chunk_size'])
+
+    def chunk_length(self, index):
+        """Expected byte length of a chunk (the last one may be short)"""
+        start = index * self.meta['chunk_size']
+        return min(self.meta['chunk_size'], self.meta['size'] - start)
+
+    def received_chunks(self):
+        return sorted(int(name) for name in os.listdir(self.chunks_path) if name.isdigit())
+
+    def status(self):
+        return {
+            'upload_id': self.upload_id,
+            'filename': self.meta['filename'],
+            'size': self.meta['size'],
+            'chunk_size': self.meta['chunk_size'],
+            'chunk_count': self.chunk_count,
+            'received': self.received_chunks()
+        }
+
+    def write_chunk(self, index, stream, checksum):
+        """Stream one chunk in, verifying its length and SHA-256.
+
+        The chunk is written to a file of its own and only copied to its
+        offset in the target file once it checks out, so a corrupt or
+        truncated chunk, even a bad resend of one already received, never
+        touches the target file and is simply sent again.
+        """
+        if not 0 <= index < self.chunk_count:
+            raise UploadError(f'Chunk index {index} out of range')
+        if not checksum:
+            raise UploadError('Missing X-Chunk-SHA256 header')
+
+        expected = self.chunk_length(index)
+        digest = hashlib.sha256()
+        written = 0
+        part_path = os.path.join(self.chunks_path, f'{index}.{uuid.uuid4().hex}.part')
+        try:
+            with open(part_path, 'wb') as f:
+                while written <= expected:
+                    block = stream.read(min(COPY_BUFFER_SIZE, expected + 1 - written))
+                    if not block:
+                        break
+                    digest.update(block)
+                    f.write(block)
+                    written += len(block)
+
+            if written != expected:
+                raise UploadError(f'Chunk {index} is {written} bytes, expected {expected}')
+            if digest.hexdigest() != checksum.strip().lower():
+                raise UploadError(f'Checksum mismatch on chunk {index}', 422)
+
+            try:
+                with open(part_path, 'rb') as source, open(self.data_path, 'r+b') as target:
+                    target.seek(index * self.meta['chunk_size'])
+                    shutil.copyfileobj(source, target, COPY_BUFFER_SIZE)
+            except FileNotFoundError:
+                raise UploadError('Upload is already complete', 409)
+        finally:
+            try:
+                os.remove(part_path)
+            except FileNotFoundError:
+                pass
+
+        marker = os.path.join(self.chunks_path, str(index))
+        with open(marker + '.tmp', 'w') as f:
+            f.write(digest.hexdigest())
+        os.replace(marker + '.tmp', marker)
+
+    def assemble(self, destination):
+        """Move the completed file to its destination and drop the session.
+
+        Completion is claimed by renaming the target file, which only one
+        of several concurrent callers can do; the others get a 409.
+        """
+        claimed_path = os.path.join(self.path, 'data.complete')
+        try:
+            missing = self.chunk_count - len(self.received_chunks())
+            if missing:
+                raise UploadError(f'{missing} chunk(s) still missing', 409)
+            os.rename(self.data_path, claimed_path)
+        except FileNotFoundError:
+            raise UploadError('Upload is already complete', 409)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.move(claimed_path, destination)
+        self.discard()
+
+    def discard(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def purge_stale_uploads(root, max_age=SESSION_MAX_AGE):
+    """Remove sessions that have not received a chunk for max_age seconds"""
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        chunks = os.path.join(path, 'chunks')
+        if _UPLOAD_ID.match(name) and os.path.isdir(chunks) and os.path.getmtime(chunks) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
@@ -3,28 +3,63 @@ Utility functions for Barnacle Films Inc.
 """
 
 import os
+import csv
+import hashlib
+import io
+import re
+import shutil
+import subprocess
 from datetime import datetime, timedelta
 from flask import current_app
 import json
 
+DOCUMENT_TYPES = ('script', 'sides', 'dailies', 'photo', 'document')
+
+# Every document is tagged with its type plus whichever of these its title or filename mentions
+TAG_PATTERNS = {
+    'storyboard': re.compile(r'\bstory[\s_-]?boards?\b', re.IGNORECASE),
+    'location': re.compile(r'\b(locations?|scout(ing)?)\b', re.IGNORECASE),
+    'character': re.compile(r'\bcharacters?\b', re.IGNORECASE),
+    'reference': re.compile(r'\b(references?|refs?|lookbook|mood[\s_-]?board)\b', re.IGNORECASE),
+}
+VISUAL_REFERENCE_TAGS = ('location', 'character', 'reference')
+DOCUMENT_TAGS = DOCUMENT_TYPES + tuple(TAG_PATTERNS) + ('visual_reference',)
+
+SHOT_FIELDS = ('scene_number', 'shot_number', 'setup', 'heading', 'location', 'framing',
+               'lens', 'camera', 'movement', 'description', 'notes', 'status')
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
-def get_weather_data(location="Bole's Residency"):
-    """Get weather data for shoot location"""
-    # This is a placeholder - in production you'd use a real weather API
-    # For now, return mock data
-    return {
-        'location': location,
-        'temperature': '72°F',
-        'condition': 'Partly Cloudy',
-        'humidity': '65%',
-        'wind': '8 mph NW',
-        'forecast': 'Good conditions for outdoor shooting',
-        'updated': datetime.now().strftime('%I:%M %p')
-    }
+def classify_document(title, filename, document_type):
+    """Tags for a document: its type, keyword tags, and visual_reference for any visual reference tag"""
+    # Filenames often use _ as a separator, which \b treats as part of a word
+    text = f"{title or ''} {os.path.splitext(filename or '')[0].replace('_', ' ')}"
+    tags = {document_type}
+    tags.update(tag for tag, pattern in TAG_PATTERNS.items() if pattern.search(text))
+    if tags.intersection(VISUAL_REFERENCE_TAGS):
+        tags.add('visual_reference')
+    return tags
+
+def parse_characters(value):
+    """Character names from a scene's characters field, a JSON list or "Dallas, Mac" style text, in order"""
+    if not value or not value.strip():
+        return []
+    try:
+        names = json.loads(value)
+    except ValueError:
+        names = None
+    if not isinstance(names, list):
+        names = re.split(r'[,;\n]', value)
+
+    unique = {}
+    for name in names:
+        name = ' '.join(str(name).split())
+        if name:
+            unique.setdefault(name.casefold(), name)
+    return list(unique.values())
 
 def format_countdown(target_date):
     """Format countdown to target date"""
@@ -56,6 +91,14 @@ def format_file_size(size_bytes):
     
     return f"{size_bytes:.1f} {size_names[i]}"
 
+def file_sha256(filepath, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
 def get_file_extension(filename):
     """Get file extension from filename"""
     return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
@@ -75,16 +118,114 @@ def is_document_file(filename):
     doc_extensions = {'pdf', 'doc', 'docx', 'txt', 'rtf'}
     return get_file_extension(filename) in doc_extensions
 
-def generate_thumbnail(filepath, size=(300, 200)):
-    """Generate thumbnail for image/video files"""
-    # This would use PIL or similar to generate thumbnails
-    # For now, return the original filepath
-    return filepath
+def has_preview(filename):
+    """Check if a thumbnail can be generated for the file"""
+    return is_image_file(filename) or is_video_file(filename) or get_file_extension(filename) == 'pdf'
+
+def _load_preview_image(filepath, size):
+    """Open the image, first video frame or first PDF page that represents a file"""
+    from PIL import Image, ImageOps
+
+    if is_image_file(filepath):
+        image = Image.open(filepath)
+        image.draft('RGB', size)  # lets JPEG decode at a reduced scale
+        return ImageOps.exif_transpose(image)
+
+    if is_video_file(filepath):
+        ffmpeg = shutil.which('ffmpeg')
+        if not ffmpeg:
+            return None
+        # Poster frame one second in (falling back to the first frame for very short clips)
+        for offset in ('1', '0'):
+            frame = subprocess.run(
+                [ffmpeg, '-v', 'error', '-ss', offset, '-i', filepath, '-frames:v', '1',
+                 '-f', 'image2pipe', '-vcodec', 'png', '-'],
+                capture_output=True, timeout=60
+            ).stdout
+            if frame:
+                return Image.open(io.BytesIO(frame))
+        return None
+
+    if get_file_extension(filepath) == 'pdf':
+        try:
+            import pymupdf
+        except ImportError:
+            return None
+        with pymupdf.open(filepath) as pdf:
+            page = pdf[0]
+            zoom = min(size[0] / page.rect.width, size[1] / page.rect.height) * 2
+            pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    return None
+
+def generate_thumbnail(filepath, size=(300, 200), output_dir=None, content_hash=None):
+    """Generate a WebP thumbnail (a poster frame for videos) and return its path.
+
+    Output is content-addressed by the source file's SHA-256, so identical
+    files share one thumbnail and an existing one is never rendered twice.
+    Returns None for files with no preview.
+    """
+    if output_dir is None:
+        output_dir = os.path.join(current_app.static_folder, 'thumbnails')
+    from PIL import Image
+
+    content_hash = content_hash or file_sha256(filepath)
+    width, height = size
+    thumb_path = os.path.join(output_dir, content_hash[:2], f'{content_hash}-{width}x{height}.webp')
+    if os.path.exists(thumb_path):
+        return thumb_path
+
+    image = _load_preview_image(filepath, size)
+    if image is None:
+        return None
+
+    image.thumbnail(size, Image.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+    tmp_path = f'{thumb_path}.{os.getpid()}.tmp'
+    image.save(tmp_path, format='WEBP', quality=75, method=4)
+    os.replace(tmp_path, thumb_path)
+    return thumb_path
+
+def parse_shot_records(data, fmt='json'):
+    """Parse a bulk shot list upload (JSON array or CSV with a header row) into dicts"""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+
+    if fmt == 'csv':
+        rows = list(csv.DictReader(io.StringIO(data)))
+    else:
+        rows = json.loads(data)
+        if isinstance(rows, dict):
+            rows = rows.get('shots', [])
+        if not isinstance(rows, list):
+            raise ValueError('Expected a JSON array of shots (or an object with a "shots" array)')
 
-def send_notification(message, priority='normal'):
-    """Send notification to crew (placeholder for future implementation)"""
-    # This could integrate with email, SMS, or push notification services
-    print(f"NOTIFICATION [{priority.upper()}]: {message}")
+    records = []
+    for i, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise ValueError(f'Row {i}: each shot must be an object')
+        record = {}
+        for field in SHOT_FIELDS:
+            value = row.get(field)
+            if isinstance(value, str):
+                value = value.strip()
+            if value in (None, ''):
+                continue
+            if isinstance(value, (list, dict)):
+                raise ValueError(f'Row {i}: {field} must be a single value')
+            record[field] = value
+        try:
+            record['shot_number'] = int(record['shot_number'])
+            if 'scene_number' in record:
+                record['scene_number'] = int(record['scene_number'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'Row {i}: shot_number and scene_number must be integers')
+        records.append(record)
+    return records
 
 def validate_crew_access():
     """Validate crew member access (placeholder for future implementation)"""
@@ -0,0 +1,239 @@
+"""
+Weather for Barnacle Films Inc. shoot locations.
+
+Providers fetch current conditions for a location; WeatherService sits in
+front of one and is the only thing the app talks to. It keeps a TTL cache
+per location, refreshes entries on a small thread pool (concurrent misses
+for one location share a single upstream call), stops calling a failing
+provider for a while and keeps serving the last good data meanwhile, and
+prefetches the locations of upcoming shoots in the background. Readers
+never wait on the provider unless they ask to.
+"""
+
+import hashlib
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+
+
+class WeatherUnavailable(Exception):
+    """Raised by providers when conditions cannot be fetched"""
+
+
+class WeatherProvider:
+    """Interface for weather sources: fetch(location) returns a conditions dict"""
+
+    def fetch(self, location):
+        raise NotImplementedError
+
+
+class FakeWeatherProvider(WeatherProvider):
+    """Fixed conditions for every location, for development and tests"""
+
+    def __init__(self, conditions=None):
+        self.conditions = conditions or {
+            'temperature': '72°F',
+            'condition': 'Partly Cloudy',
+            'humidity': '65%',
+            'wind': '8 mph NW',
+            'forecast': 'Good conditions for outdoor shooting'
+        }
+
+    def fetch(self, location):
+        return dict(self.conditions)
+
+
+# WMO weather interpretation codes used by Open-Meteo
+WMO_CONDITIONS = {
+    0: 'Clear', 1: 'Mostly Clear', 2: 'Partly Cloudy', 3: 'Overcast', 45: 'Fog', 48: 'Freezing Fog',
+    51: 'Light Drizzle', 53: 'Drizzle', 55: 'Heavy Drizzle', 61: 'Light Rain', 63: 'Rain', 65: 'Heavy Rain',
+    71: 'Light Snow', 73: 'Snow', 75: 'Heavy Snow', 80: 'Showers', 81: 'Showers', 82: 'Heavy Showers',
+    95: 'Thunderstorm', 96: 'Thunderstorm', 99: 'Thunderstorm'
+}
+COMPASS = ('N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW')
+
+
+class OpenMeteoProvider(WeatherProvider):
+    """Current conditions from api.open-meteo.com (no API key needed).
+
+    Shoot locations are names like "Bole's Residency", so they are mapped to
+    coordinates through the coordinates dict, falling back to default.
+    """
+
+    URL = 'https://api.open-meteo.com/v1/forecast'
+
+    def __init__(self, default, coordinates=None, timeout=5):
+        self.default = default
+        self.coordinates = coordinates or {}
+        self.timeout = timeout
+
+    def fetch(self, location):
+        latitude, longitude = self.coordinates.get(location, self.default)
+        query = urllib.parse.urlencode({
+            'latitude': latitude,
+            'longitude': longitude,
+            'current': 'temperature_2m,relative_humidity_2m,weather_code,wind_speed_10m,wind_direction_10m',
+            'temperature_unit': 'fahrenheit',
+            'wind_speed_unit': 'mph'
+        })
+        try:
+            with urllib.request.urlopen(f'{self.URL}?{query}', timeout=self.timeout) as response:
+                current = json.load(response)['current']
+        except (OSError, ValueError, KeyError) as e:
+            raise WeatherUnavailable(str(e))
+
+        condition = WMO_CONDITIONS.get(current.get('weather_code'), 'Unknown')
+        return {
+            'temperature': f"{round(current['temperature_2m'])}°F",
+            'condition': condition,
+            'humidity': f"{current['relative_humidity_2m']}%",
+            'wind': f"{round(current['wind_speed_10m'])} mph {COMPASS[round(current['wind_direction_10m'] / 45) % 8]}",
+            'forecast': condition
+        }
+
+
+class CircuitBreaker:
+    """Stops calls after failure_threshold consecutive failures, then allows one trial per reset_timeout"""
+
+    def __init__(self, failure_threshold=3, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Half-open: let this call through, and restart the wait if it fails
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+
+class WeatherService:
+    """Cached, coalesced and circuit-broken access to a WeatherProvider"""
+
+    def __init__(self, provider, ttl=600, max_stale=6 * 3600, breaker=None,
+                 upcoming_locations=None, prefetch_interval=None, logger=None):
+        self.provider = provider
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.breaker = breaker or CircuitBreaker()
+        self.upcoming_locations = upcoming_locations  # callable returning locations to keep warm
+        self.prefetch_interval = prefetch_interval or ttl / 2
+        self.logger = logger
+        self._entries = {}  # location -> (conditions, fetched_at monotonic)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._prefetcher = None
+
+    def _pool(self):
+        with self._lock:
+            # Started on first use so each gunicorn worker owns its own threads
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='weather')
+            if self._prefetcher is None and self.upcoming_locations is not None:
+                self._prefetcher = threading.Thread(target=self._prefetch_loop, name='weather-prefetch', daemon=True)
+                self._prefetcher.start()
+            return self._executor
+
+    def _fetch(self, location):
+        if not self.breaker.allow():
+            return
+        try:
+            data = self.provider.fetch(location)
+        except Exception as e:
+            self.breaker.failure()
+            if self.logger:
+                self.logger.warning('Weather fetch for %r failed: %s', location, e)
+            return
+        self.breaker.success()
+        data['location'] = location
+        data['updated'] = datetime.now().strftime('%I:%M %p')
+        with self._lock:
+            self._entries[location] = (data, time.monotonic())
+
+    def refresh(self, location):
+        """Start a background fetch for location unless one is already running; returns its future"""
+        executor = self._pool()
+        with self._lock:
+            future = self._inflight.get(location)
+            if future is None:
+                future = self._inflight[location] = executor.submit(self._fetch, location)
+                future.add_done_callback(lambda _: self._inflight.pop(location, None))
+            return future
+
+    def current(self, location, wait=0):
+        """Cached conditions for location, or None if there are none yet.
+
+        Stale entries are returned as they are (flagged 'stale') while a
+        refresh runs in the background; wait is how many seconds to block
+        for that refresh when there is nothing cached at all.
+        """
+        with self._lock:
+            entry = self._entries.get(location)
+        age = time.monotonic() - entry[1] if entry else None
+
+        if entry is None or age >= self.ttl:
+            future = self.refresh(location)
+            if entry is None and wait:
+                try:
+                    future.result(timeout=wait)
+                except FutureTimeout:
+                    pass
+                with self._lock:
+                    entry = self._entries.get(location)
+                age = 0 if entry else None
+
+        if entry is None or age >= self.max_stale:
+            return None
+        return dict(entry[0], stale=age >= self.ttl)
+
+    def stamp(self, location):
+        """Digest of the cached conditions for location, equal across workers that hold the same data"""
+        with self._lock:
+            entry = self._entries.get(location)
+        if entry is None:
+            return 'none'
+        conditions = {key: value for key, value in entry[0].items() if key != 'updated'}
+        conditions['stale'] = time.monotonic() - entry[1] >= self.ttl
+        return hashlib.sha1(json.dumps(conditions, sort_keys=True).encode()).hexdigest()[:12]
+
+    def prefetch(self, locations):
+        for location in set(locations):
+            with self._lock:
+                entry = self._entries.get(location)
+            if entry is None or time.monotonic() - entry[1] >= self.ttl:
+                self.refresh(location)
+
+    def _prefetch_loop(self):
+        while True:
+            try:
+                self.prefetch(self.upcoming_locations())
+            except Exception:
+                if self.logger:
+                    self.logger.exception('Weather prefetch failed')
+            time.sleep(self.prefetch_interval)